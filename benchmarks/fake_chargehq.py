@@ -0,0 +1,358 @@
+"""Local fake of the ChargeHQ push API with fault injection.
+
+Accepts the ``apiKey``/``tsms``/``siteMeters`` payload posted by
+``EnergyPosterApiClient``, validates it, and can be told to misbehave:
+add latency, answer with 5xx or 429, reset connections or hang.
+
+Run it standalone to point a Home Assistant instance at it:
+
+    python benchmarks/fake_chargehq.py --port 8099 --latency 50 --error-rate 0.1
+
+Faults can be changed while it runs by posting JSON to ``/_faults``, e.g.
+``curl -d '{"outage": true}' http://127.0.0.1:8099/_faults``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from dataclasses import asdict, dataclass, field, fields
+import json
+import math
+import random
+from typing import Any
+
+from aiohttp import web
+
+PUSH_PATH = "/api/public/push-solar-data"
+FAULTS_PATH = "/_faults"
+STATS_PATH = "/_stats"
+
+REQUIRED_METERS = ("consumption_kw", "production_kw", "net_import_kw")
+OPTIONAL_METERS = ("imported_kwh", "exported_kwh")
+
+# Largest allowed difference between net_import_kw and consumption_kw minus
+# production_kw, to allow for rounding, when that is checked
+NET_IMPORT_TOLERANCE = 0.01
+
+
+@dataclass
+class FaultConfig:
+    """Faults injected into responses.
+
+    Rates are probabilities between 0 and 1 and are applied in the order
+    hang, reset, rate limit, error, so they add up.
+    """
+
+    # Added to every response, in milliseconds
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    # Answer with error_status
+    error_rate: float = 0.0
+    error_status: int = 503
+    # Answer 429 with a Retry-After header
+    rate_limit_rate: float = 0.0
+    retry_after: int = 30
+    # Drop the connection without answering
+    reset_rate: float = 0.0
+    # Never answer until the client gives up
+    hang_rate: float = 0.0
+    # Answer every post with error_status
+    outage: bool = False
+
+    def update(self, values: dict[str, Any]) -> None:
+        """Change some of the faults.
+
+        Raises:
+            ValueError: If a value is for an unknown fault.
+        """
+        names = {config_field.name for config_field in fields(self)}
+        for name, value in values.items():
+            if name not in names:
+                raise ValueError(f"Unknown fault: {name}")
+            setattr(self, name, type(getattr(self, name))(value))
+
+
+@dataclass
+class ServerStats:
+    """Counters of requests received by the fake server."""
+
+    requests: int = 0
+    accepted: int = 0
+    invalid: int = 0
+    bytes_received: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    resets: int = 0
+    hangs: int = 0
+    statuses: Counter[int] = field(default_factory=Counter)
+    posts_by_key: Counter[str] = field(default_factory=Counter)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters as JSON serialisable data."""
+        data = asdict(self)
+        data["statuses"] = {str(status): count for status, count in self.statuses.items()}
+        data["keys"] = len(self.posts_by_key)
+        del data["posts_by_key"]
+        return data
+
+
+def validate_payload(
+    payload: Any, api_key: str | None = None, check_net_import: bool = False
+) -> str | None:
+    """Check a push payload.
+
+    Args:
+        payload: The decoded request body.
+        api_key: The API key every post must use, or None to accept any.
+        check_net_import: Whether net_import_kw must equal consumption_kw
+            minus production_kw. Formulas legitimately break this, e.g. net
+            import read from a signed grid meter, so only check it when no
+            formulas are configured.
+
+    Returns:
+        A description of the first problem found, or None if it is valid.
+    """
+    if not isinstance(payload, dict):
+        return "payload is not an object"
+
+    key = payload.get("apiKey")
+    if not isinstance(key, str) or not key:
+        return "apiKey missing"
+    if api_key is not None and key != api_key:
+        return "apiKey not recognised"
+
+    tsms = payload.get("tsms")
+    if not isinstance(tsms, int) or isinstance(tsms, bool) or tsms <= 0:
+        return "tsms must be a positive integer"
+
+    meters = payload.get("siteMeters")
+    if not isinstance(meters, dict):
+        return "siteMeters missing"
+
+    for name, value in meters.items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return f"siteMeters.{name} is not a number"
+        if not math.isfinite(value):
+            return f"siteMeters.{name} is not finite"
+        if name not in REQUIRED_METERS + OPTIONAL_METERS and not (
+            name.endswith(("_min_kw", "_max_kw"))
+        ):
+            return f"siteMeters.{name} is not a known field"
+
+    for name in REQUIRED_METERS:
+        if name not in meters:
+            return f"siteMeters.{name} missing"
+
+    if check_net_import:
+        expected = meters["consumption_kw"] - meters["production_kw"]
+        if abs(meters["net_import_kw"] - expected) > NET_IMPORT_TOLERANCE:
+            return "net_import_kw does not match consumption_kw - production_kw"
+
+    return None
+
+
+class FakeChargeHQServer:
+    """Local server that accepts posts like the ChargeHQ push API."""
+
+    path = PUSH_PATH
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        faults: FaultConfig | None = None,
+        api_key: str | None = None,
+        seed: int | None = None,
+        check_net_import: bool = False,
+    ) -> None:
+        """Initialise the server.
+
+        Args:
+            host: Address to listen on.
+            port: Port to listen on, 0 picks a free port.
+            faults: Faults to inject, none by default.
+            api_key: The API key every post must use, or None to accept any.
+            seed: Seed for the fault injection, for reproducible runs.
+            check_net_import: Whether to reject payloads whose net import is
+                not consumption minus production; leave off when posting
+                from formulas.
+        """
+        self._host = host
+        self._port = port
+        self._api_key = api_key
+        self._check_net_import = check_net_import
+        self._random = random.Random(seed)
+        self._runner: web.AppRunner | None = None
+        self._hanging: set[asyncio.Future[None]] = set()
+        self.faults = faults or FaultConfig()
+        self.stats = ServerStats()
+        self.url = ""
+
+    async def start(self) -> str:
+        """Start the server and return the URL to post to."""
+        app = web.Application()
+        app.router.add_post(self.path, self._handle_post)
+        app.router.add_head(self.path, self._handle_head)
+        app.router.add_post(FAULTS_PATH, self._handle_faults)
+        app.router.add_get(STATS_PATH, self._handle_stats)
+
+        self._runner = web.AppRunner(app, access_log=None, handler_cancellation=True)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{self._host}:{port}{self.path}"
+        return self.url
+
+    async def stop(self) -> None:
+        """Release hanging requests and stop the server."""
+        for future in self._hanging:
+            future.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_head(self, request: web.Request) -> web.Response:
+        """Answer the connection pre-warm request."""
+        return web.Response()
+
+    async def _handle_faults(self, request: web.Request) -> web.Response:
+        """Change the injected faults."""
+        try:
+            self.faults.update(await request.json())
+        except (ValueError, TypeError) as err:
+            return web.json_response({"error": str(err)}, status=400)
+        return web.json_response(asdict(self.faults))
+
+    async def _handle_stats(self, request: web.Request) -> web.Response:
+        """Return the request counters."""
+        return web.json_response(self.stats.as_dict())
+
+    async def _handle_post(self, request: web.Request) -> web.StreamResponse:
+        """Validate a post, inject faults and acknowledge it."""
+        stats = self.stats
+        stats.requests += 1
+
+        # aiohttp decompresses gzip bodies; count the bytes on the wire
+        body = await request.read()
+        stats.bytes_received += request.content_length or len(body)
+
+        faults = self.faults
+        if faults.latency_ms or faults.latency_jitter_ms:
+            delay = faults.latency_ms + self._random.uniform(0, faults.latency_jitter_ms)
+            await asyncio.sleep(delay / 1000)
+
+        roll = self._random.random()
+        if roll < faults.hang_rate:
+            stats.hangs += 1
+            future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+            self._hanging.add(future)
+            try:
+                await future
+            finally:
+                self._hanging.discard(future)
+        roll -= faults.hang_rate
+
+        if roll < faults.reset_rate:
+            stats.resets += 1
+            assert request.transport is not None
+            request.transport.abort()
+            return web.Response()
+        roll -= faults.reset_rate
+
+        if roll < faults.rate_limit_rate:
+            stats.rate_limited += 1
+            return self._respond(
+                {"error": "rate limited"},
+                429,
+                {"Retry-After": str(faults.retry_after)},
+            )
+        roll -= faults.rate_limit_rate
+
+        if faults.outage or roll < faults.error_rate:
+            stats.errors += 1
+            return self._respond({"error": "unavailable"}, faults.error_status)
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if (
+            problem := validate_payload(
+                payload, self._api_key, self._check_net_import
+            )
+        ) is not None:
+            stats.invalid += 1
+            return self._respond({"error": problem}, 400)
+
+        stats.accepted += 1
+        stats.posts_by_key[payload["apiKey"]] += 1
+        return self._respond({"ok": True}, 200)
+
+    def _respond(
+        self, data: dict[str, Any], status: int, headers: dict[str, str] | None = None
+    ) -> web.Response:
+        """Build a JSON response and count its status."""
+        self.stats.statuses[status] += 1
+        return web.json_response(data, status=status, headers=headers)
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parse the command line of the standalone server."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--api-key", help="Only accept posts with this API key")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=30)
+    parser.add_argument("--reset-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--check-net-import",
+        action="store_true",
+        help="Reject net import that is not consumption minus production "
+        "(leave off when posting from formulas)",
+    )
+    return parser.parse_args()
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """Run the standalone server until interrupted."""
+    server = FakeChargeHQServer(
+        args.host,
+        args.port,
+        FaultConfig(
+            latency_ms=args.latency,
+            latency_jitter_ms=args.jitter,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            rate_limit_rate=args.rate_limit_rate,
+            retry_after=args.retry_after,
+            reset_rate=args.reset_rate,
+            hang_rate=args.hang_rate,
+        ),
+        api_key=args.api_key,
+        seed=args.seed,
+        check_net_import=args.check_net_import,
+    )
+    url = await server.start()
+    print(f"Accepting posts on {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        print(json.dumps(server.stats.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_serve(_parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,86 @@
+"""Lightweight stand-ins for Home Assistant objects used by the benchmarks."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import random
+from typing import Any
+
+from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT
+from homeassistant.core import State
+
+
+class FakeStates:
+    """Dict-backed replacement for ``hass.states``.
+
+    Only implements what the integration reads, so lookups cost about the
+    same as a dict access and don't drown out the code being measured.
+    """
+
+    def __init__(self) -> None:
+        """Initialise the state machine."""
+        self._states: dict[str, State] = {}
+
+    def get(self, entity_id: str) -> State | None:
+        """Return the state of an entity."""
+        return self._states.get(entity_id)
+
+    def set(self, entity_id: str, value: float, unit: str) -> State:
+        """Set the state of an entity."""
+        state = State(entity_id, str(value), {ATTR_UNIT_OF_MEASUREMENT: unit})
+        self._states[entity_id] = state
+        return state
+
+
+class FakeBus:
+    """Event bus that accepts listeners but never fires events.
+
+    Benchmarks feed state changes to the sampling engine directly.
+    """
+
+    def async_listen(self, *args: Any, **kwargs: Any) -> Callable[[], None]:
+        """Register a listener and return its remover."""
+        return lambda: None
+
+
+class FakeHass:
+    """Minimal ``hass`` with a fake state machine."""
+
+    def __init__(self) -> None:
+        """Initialise the instance."""
+        self.states = FakeStates()
+        self.bus = FakeBus()
+        self.data: dict = {}
+
+
+def populate(
+    hass: FakeHass, count: int, seed: int = 0
+) -> tuple[list[str], list[str], str, str]:
+    """Create synthetic power and energy sensors.
+
+    Half of the power sensors are consumption and half solar; units are
+    mixed so unit conversion is exercised.
+
+    Args:
+        hass: The fake instance to add the sensors to.
+        count: Number of power sensors.
+        seed: Seed for the random values.
+
+    Returns:
+        The consumption sensors, the solar sensors and the imported and
+        exported energy sensors.
+    """
+    rng = random.Random(seed)
+    consumption: list[str] = []
+    solar: list[str] = []
+    for index in range(count):
+        group = consumption if index % 2 == 0 else solar
+        entity_id = f"sensor.bench_{'load' if group is consumption else 'pv'}_{index}"
+        if index % 3 == 0:
+            hass.states.set(entity_id, round(rng.uniform(0, 5), 3), "kW")
+        else:
+            hass.states.set(entity_id, round(rng.uniform(0, 5000), 1), "W")
+        group.append(entity_id)
+
+    hass.states.set("sensor.bench_imported", 12345.678, "kWh")
+    hass.states.set("sensor.bench_exported", 9876543.0, "Wh")
+    return consumption, solar, "sensor.bench_imported", "sensor.bench_exported"
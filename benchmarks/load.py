@@ -0,0 +1,266 @@
+"""Load driver running many coordinators against the fake ChargeHQ server.
+
+Each coordinator is set up the way the integration sets up a config entry,
+with its own synthetic sensors, API key, outbox and circuit breaker, inside
+a bare Home Assistant instance. Run from the repository root:
+
+    python benchmarks/load.py --coordinators 200 --interval 5 --duration 60
+
+Inject faults to see how posting degrades and recovers, for example a 30
+second outage starting 20 seconds in:
+
+    python benchmarks/load.py --outage-at 20 --outage-for 30 --duration 120
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+from typing import Any
+
+sys.path[:0] = [
+    str(Path(__file__).resolve().parent.parent / "custom_components"),
+    str(Path(__file__).parent),
+]
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.aiohttp_client import (  # noqa: E402
+    async_get_clientsession,
+)
+
+from chargehq_push_api_poster.api import (  # noqa: E402
+    EnergyPosterApiClient,
+    PostResult,
+)
+from chargehq_push_api_poster.const import (  # noqa: E402
+    DEFAULT_OUTBOX_SIZE,
+    DEFAULT_POST_TIMEOUT,
+)
+from chargehq_push_api_poster.coordinator import (  # noqa: E402
+    EnergyPosterCoordinator,
+)
+from chargehq_push_api_poster.metrics import LatencyHistogram  # noqa: E402
+from chargehq_push_api_poster.outbox import PostOutbox  # noqa: E402
+from chargehq_push_api_poster.target import PostTarget  # noqa: E402
+from chargehq_push_api_poster.transport import async_create_session  # noqa: E402
+from fake_chargehq import FakeChargeHQServer, FaultConfig  # noqa: E402
+from run import SCHEMA_VERSION, collect_metadata  # noqa: E402
+
+# Seconds between checks of whether the coordinators recovered from an outage
+RECOVERY_POLL_INTERVAL = 0.5
+
+
+async def async_create_coordinator(
+    hass: HomeAssistant,
+    index: int,
+    url: str,
+    args: argparse.Namespace,
+    rng: random.Random,
+) -> EnergyPosterCoordinator:
+    """Create a coordinator with its own synthetic sensors."""
+    consumption: list[str] = []
+    solar: list[str] = []
+    for sensor in range(args.sensors):
+        group = consumption if sensor % 2 == 0 else solar
+        entity_id = f"sensor.load_{index}_{sensor}"
+        hass.states.async_set(
+            entity_id, str(rng.uniform(0, 5000)), {"unit_of_measurement": "W"}
+        )
+        group.append(entity_id)
+
+    if args.dedicated_connection:
+        session = await async_create_session(hass, args.interval)
+    else:
+        session = async_get_clientsession(hass)
+
+    api_client = EnergyPosterApiClient(
+        session=session,
+        api_url=url,
+        api_key=f"load-{index}",
+        owns_session=args.dedicated_connection,
+        compress=args.compress,
+    )
+    outbox = None
+    if args.outbox_size > 0:
+        outbox = PostOutbox(hass, f"load_{index}", args.outbox_size)
+    target = PostTarget(hass, api_client, url, args.post_timeout, outbox)
+
+    return EnergyPosterCoordinator(
+        hass, [target], consumption, solar, args.interval
+    )
+
+
+async def _async_churn_sensors(
+    hass: HomeAssistant, args: argparse.Namespace, rng: random.Random
+) -> None:
+    """Keep changing every synthetic sensor."""
+    entity_ids = [
+        f"sensor.load_{index}_{sensor}"
+        for index in range(args.coordinators)
+        for sensor in range(args.sensors)
+    ]
+    while True:
+        for entity_id in entity_ids:
+            hass.states.async_set(
+                entity_id, str(rng.uniform(0, 5000)), {"unit_of_measurement": "W"}
+            )
+        await asyncio.sleep(args.update_interval)
+
+
+def _recovered(coordinators: list[EnergyPosterCoordinator]) -> tuple[bool, bool]:
+    """Return whether every endpoint posts again, and whether outboxes drained."""
+    targets = [target for coordinator in coordinators for target in coordinator.targets]
+    posting = all(target.last_result is PostResult.SUCCESS for target in targets)
+    drained = all(not target.outbox for target in targets)
+    return posting, drained
+
+
+async def async_run(args: argparse.Namespace) -> dict[str, Any]:
+    """Run the load test and return the results."""
+    rng = random.Random(args.seed)
+    server = FakeChargeHQServer(
+        faults=FaultConfig(
+            latency_ms=args.latency,
+            latency_jitter_ms=args.jitter,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            retry_after=args.retry_after,
+            reset_rate=args.reset_rate,
+            hang_rate=args.hang_rate,
+        ),
+        seed=args.seed,
+        # The load test configures no formulas
+        check_net_import=True,
+    )
+    url = await server.start()
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        await hass.async_start()
+
+        coordinators = [
+            await async_create_coordinator(hass, index, url, args, rng)
+            for index in range(args.coordinators)
+        ]
+
+        async def async_start(coordinator: EnergyPosterCoordinator) -> None:
+            # Spread the first posts over one interval, like entries set up
+            # at different times
+            await asyncio.sleep(rng.uniform(0, args.interval))
+            await coordinator.async_start()
+
+        start = time.monotonic()
+        await asyncio.gather(*(async_start(coordinator) for coordinator in coordinators))
+        churn = hass.async_create_task(_async_churn_sensors(hass, args, rng))
+
+        recovery: dict[str, Any] = {}
+        if args.outage_for:
+            await asyncio.sleep(max(0.0, start + args.outage_at - time.monotonic()))
+            server.faults.outage = True
+            await asyncio.sleep(args.outage_for)
+            server.faults.outage = False
+            outage_end = time.monotonic()
+
+            recovery = {"posting_after_s": None, "drained_after_s": None}
+            while time.monotonic() < start + args.duration:
+                posting, drained = _recovered(coordinators)
+                elapsed = round(time.monotonic() - outage_end, 2)
+                if posting and recovery["posting_after_s"] is None:
+                    recovery["posting_after_s"] = elapsed
+                if posting and drained:
+                    recovery["drained_after_s"] = elapsed
+                    break
+                await asyncio.sleep(RECOVERY_POLL_INTERVAL)
+
+        await asyncio.sleep(max(0.0, start + args.duration - time.monotonic()))
+        elapsed = time.monotonic() - start
+
+        churn.cancel()
+        await asyncio.gather(
+            *(coordinator.async_stop() for coordinator in coordinators)
+        )
+        await hass.async_stop()
+    await server.stop()
+
+    latency = LatencyHistogram()
+    drift = LatencyHistogram()
+    for coordinator in coordinators:
+        latency.merge(coordinator.post_latency)
+        drift.merge(coordinator.schedule_drift)
+    targets = [target for coordinator in coordinators for target in coordinator.targets]
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "metadata": collect_metadata(),
+        "params": {
+            name: value for name, value in vars(args).items() if name != "output"
+        },
+        "results": {
+            "elapsed_s": round(elapsed, 2),
+            "throughput_rps": round(server.stats.accepted / elapsed, 2),
+            "server": server.stats.as_dict(),
+            "client": {
+                "successful_posts": sum(t.successful_posts for t in targets),
+                "failed_posts": sum(t.failed_posts for t in targets),
+                "timed_out_posts": sum(t.timed_out_posts for t in targets),
+                "skipped_ticks": sum(c.skipped_ticks for c in coordinators),
+                "queued_samples": sum(len(t.outbox) for t in targets if t.outbox),
+                "evicted_samples": sum(t.outbox.evicted for t in targets if t.outbox),
+                "open_circuits": sum(
+                    t.api_client.circuit_breaker.state != "closed" for t in targets
+                ),
+                "post_latency": latency.as_dict(),
+                "schedule_drift": drift.as_dict(),
+            },
+            "recovery": recovery,
+        },
+    }
+
+
+def main() -> int:
+    """Run the load driver."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--coordinators", type=int, default=100)
+    parser.add_argument("--sensors", type=int, default=4, help="Per coordinator")
+    parser.add_argument("--interval", type=int, default=5, help="Seconds")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds")
+    parser.add_argument(
+        "--update-interval", type=float, default=1.0, help="Seconds between sensor changes"
+    )
+    parser.add_argument("--post-timeout", type=float, default=DEFAULT_POST_TIMEOUT)
+    parser.add_argument("--outbox-size", type=int, default=DEFAULT_OUTBOX_SIZE)
+    parser.add_argument("--dedicated-connection", action="store_true")
+    parser.add_argument("--compress", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=30)
+    parser.add_argument("--reset-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--outage-at", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--outage-for", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--output", type=Path, help="Write results to this file")
+    args = parser.parse_args()
+
+    # Injected faults make the integration log errors on every failed post
+    logging.basicConfig(level=logging.CRITICAL)
+
+    report = asyncio.run(async_run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""Benchmarks for the aggregation and posting hot paths.
+
+Run from the repository root with Home Assistant installed:
+
+    python benchmarks/run.py --output results.json
+
+Results are written as JSON so runs can be compared over time:
+
+    python benchmarks/run.py --compare baseline.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+import gc
+import json
+import logging
+from pathlib import Path
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "custom_components"), str(Path(__file__).parent)]
+
+from aiohttp import ClientSession  # noqa: E402
+from homeassistant.const import __version__ as HA_VERSION  # noqa: E402
+from homeassistant.core import State  # noqa: E402
+
+from chargehq_push_api_poster.aggregator import SensorAggregator  # noqa: E402
+from chargehq_push_api_poster.api import (  # noqa: E402
+    EnergyPosterApiClient,
+    build_site_meters,
+)
+from chargehq_push_api_poster.const import (  # noqa: E402
+    AGGREGATION_MODE_EVENT,
+    AGGREGATION_MODE_POLL,
+)
+from chargehq_push_api_poster.coordinator import (  # noqa: E402
+    EnergyPosterCoordinator,
+)
+from chargehq_push_api_poster.encoder import PayloadEncoder  # noqa: E402
+from chargehq_push_api_poster.engine import async_get_engine  # noqa: E402
+from fake_chargehq import FakeChargeHQServer  # noqa: E402
+from fakes import FakeHass, populate  # noqa: E402
+
+# Version of the results format
+SCHEMA_VERSION = 1
+
+DEFAULT_SIZES = (10, 100, 1000, 5000)
+DEFAULT_ITERATIONS = 2000
+DEFAULT_POST_ITERATIONS = 200
+WARMUP_ITERATIONS = 50
+
+
+def _summarise(
+    name: str,
+    params: dict[str, Any],
+    unit: str,
+    samples: list[float],
+) -> dict[str, Any]:
+    """Build a result record from raw samples."""
+    ordered = sorted(samples)
+    return {
+        "benchmark": name,
+        "params": params,
+        "unit": unit,
+        "iterations": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "min": ordered[0],
+    }
+
+
+def _time_calls(func: Callable[[], Any], iterations: int) -> list[float]:
+    """Call a function repeatedly and return each duration in microseconds."""
+    for _ in range(WARMUP_ITERATIONS):
+        func()
+
+    samples = []
+    perf_counter_ns = time.perf_counter_ns
+    for _ in range(iterations):
+        start = perf_counter_ns()
+        func()
+        samples.append((perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def bench_poll_tick(sizes: list[int], iterations: int) -> list[dict[str, Any]]:
+    """Measure reading every sensor on a tick in polling mode.
+
+    Runs once with unchanged states, which only hit the cache, and once with
+    every state replaced between ticks, which converts each value again.
+    """
+    results = []
+    for size in sizes:
+        for changed in (False, True):
+            hass = FakeHass()
+            consumption, solar, imported, exported = populate(hass, size)
+            coordinator = EnergyPosterCoordinator(
+                hass,
+                [],
+                consumption,
+                solar,
+                30,
+                imported,
+                exported,
+                aggregation_mode=AGGREGATION_MODE_POLL,
+            )
+
+            # Alternate between two pre-built sets of new State objects, so
+            # every tick sees a changed state without timing their creation
+            state_sets = [
+                {
+                    entity_id: State(entity_id, state.state, state.attributes)
+                    for entity_id, state in hass.states._states.items()
+                }
+                for _ in range(2)
+            ]
+            position = 0
+
+            def tick() -> None:
+                nonlocal position
+                if changed:
+                    hass.states._states = state_sets[position]
+                    position ^= 1
+                coordinator._get_sensor_sum(consumption)
+                coordinator._get_sensor_sum(solar)
+                coordinator._get_sensor_value(imported)
+                coordinator._get_sensor_value(exported)
+
+            results.append(
+                _summarise(
+                    "poll_tick",
+                    {"sensors": size, "changed": changed},
+                    "us",
+                    _time_calls(tick, max(10, iterations * 10 // size)),
+                )
+            )
+    return results
+
+
+def bench_event_update(sizes: list[int], iterations: int) -> list[dict[str, Any]]:
+    """Measure folding one state change into the running totals."""
+    results = []
+    for size in sizes:
+        hass = FakeHass()
+        consumption, solar, imported, exported = populate(hass, size)
+        engine = async_get_engine(hass)
+        aggregator = SensorAggregator(engine, consumption, solar, imported, exported)
+        aggregator.async_start()
+
+        # Pre-build the new states so only the update itself is timed
+        entity_ids = consumption + solar
+        states = [
+            hass.states.set(entity_id, float(index % 7), "kW")
+            for index, entity_id in enumerate(entity_ids)
+        ]
+        updates = list(zip(entity_ids, states))
+        position = 0
+
+        def update() -> None:
+            nonlocal position
+            entity_id, state = updates[position]
+            position = (position + 1) % len(updates)
+            engine.power.async_update(entity_id, state)
+            aggregator.consumption_kw  # noqa: B018
+            aggregator.production_kw  # noqa: B018
+
+        results.append(
+            _summarise(
+                "event_update",
+                {"sensors": size},
+                "us",
+                _time_calls(update, iterations),
+            )
+        )
+    return results
+
+
+def bench_encode(iterations: int) -> list[dict[str, Any]]:
+    """Measure building and encoding a request body."""
+    results = []
+    for compress in (False, True):
+        encoder = PayloadEncoder("benchmark-key", 3, compress)
+
+        def encode() -> None:
+            site_meters = build_site_meters(
+                consumption_kw=3.456789,
+                production_kw=1.234567,
+                net_import_kw=2.222222,
+                imported_kwh=12345.678,
+                exported_kwh=9876.543,
+            )
+            encoder.encode(1700000000000, site_meters)
+
+        results.append(
+            _summarise(
+                "encode",
+                {"compress": compress},
+                "us",
+                _time_calls(encode, iterations),
+            )
+        )
+    return results
+
+
+async def bench_post(iterations: int) -> list[dict[str, Any]]:
+    """Measure a post_energy_data call against the local fake ChargeHQ server."""
+    server = FakeChargeHQServer()
+    url = await server.start()
+    results = []
+    try:
+        for compress in (False, True):
+            async with ClientSession() as session:
+                client = EnergyPosterApiClient(
+                    session, url, "benchmark-key", compress=compress
+                )
+
+                async def post() -> None:
+                    posted = await client.post_energy_data(
+                        timestamp_ms=int(time.time() * 1000),
+                        consumption_kw=3.456,
+                        production_kw=1.234,
+                        net_import_kw=2.222,
+                        imported_kwh=12345.678,
+                        exported_kwh=9876.543,
+                    )
+                    if not posted:
+                        raise RuntimeError("The fake server did not accept a post")
+
+                for _ in range(WARMUP_ITERATIONS):
+                    await post()
+
+                samples = []
+                for _ in range(iterations):
+                    start = time.perf_counter_ns()
+                    await post()
+                    samples.append((time.perf_counter_ns() - start) / 1_000_000)
+
+                results.append(
+                    _summarise("post", {"compress": compress}, "ms", samples)
+                )
+    finally:
+        await server.stop()
+    return results
+
+
+def bench_memory(sizes: list[int]) -> list[dict[str, Any]]:
+    """Measure the memory held by one coordinator."""
+    results = []
+    for size in sizes:
+        for averaging in (False, True):
+            hass = FakeHass()
+            consumption, solar, imported, exported = populate(hass, size)
+
+            gc.collect()
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            coordinator = EnergyPosterCoordinator(
+                hass,
+                [],
+                consumption,
+                solar,
+                30,
+                imported,
+                exported,
+                aggregation_mode=AGGREGATION_MODE_EVENT,
+                averaging=averaging,
+            )
+            assert coordinator._aggregator is not None
+            coordinator._aggregator.async_start()
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+            allocated = sum(
+                stat.size_diff for stat in after.compare_to(before, "filename")
+            )
+            results.append(
+                {
+                    "benchmark": "coordinator_memory",
+                    "params": {"sensors": size, "averaging": averaging},
+                    "unit": "bytes",
+                    "iterations": 1,
+                    "mean": allocated,
+                    "median": allocated,
+                    "p95": allocated,
+                    "min": allocated,
+                }
+            )
+            del coordinator
+    return results
+
+
+def collect_metadata() -> dict[str, Any]:
+    """Describe the environment the benchmarks ran in."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    manifest = json.loads(
+        (ROOT / "custom_components/chargehq_push_api_poster/manifest.json").read_text()
+    )
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "version": manifest["version"],
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "homeassistant": HA_VERSION,
+    }
+
+
+def _compare(
+    results: list[dict[str, Any]], baseline_path: Path, threshold: float
+) -> bool:
+    """Print the change of each median against a baseline run.
+
+    Returns:
+        True if no benchmark got slower (or bigger) by more than threshold.
+    """
+    baseline = json.loads(baseline_path.read_text())
+    previous = {
+        (result["benchmark"], json.dumps(result["params"], sort_keys=True)): result
+        for result in baseline["results"]
+    }
+
+    ok = True
+    for result in results:
+        key = (result["benchmark"], json.dumps(result["params"], sort_keys=True))
+        if key not in previous or not previous[key]["median"]:
+            continue
+        change = result["median"] / previous[key]["median"] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        print(
+            f"{'REGRESSED' if regressed else 'ok':>9}  {key[0]:<20} {key[1]:<40} "
+            f"{previous[key]['median']:>12.2f} -> {result['median']:>12.2f} "
+            f"{result['unit']:<5} ({change:+.1%})",
+            file=sys.stderr,
+        )
+    return ok
+
+
+def main() -> int:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma separated numbers of synthetic sensors",
+    )
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument(
+        "--post-iterations", type=int, default=DEFAULT_POST_ITERATIONS
+    )
+    parser.add_argument(
+        "--only",
+        help="Comma separated benchmarks to run "
+        "(poll_tick, event_update, encode, post, memory)",
+    )
+    parser.add_argument("--output", type=Path, help="Write results to this file")
+    parser.add_argument("--compare", type=Path, help="Baseline results to compare")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown of a median that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    # Missing or unknown sensors are expected in synthetic runs
+    logging.basicConfig(level=logging.ERROR)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    selected = set(args.only.split(",")) if args.only else None
+
+    def wanted(name: str) -> bool:
+        return selected is None or name in selected
+
+    results: list[dict[str, Any]] = []
+    if wanted("poll_tick"):
+        results += bench_poll_tick(sizes, args.iterations)
+    if wanted("event_update"):
+        results += bench_event_update(sizes, args.iterations)
+    if wanted("encode"):
+        results += bench_encode(args.iterations)
+    if wanted("post"):
+        results += asyncio.run(bench_post(args.post_iterations))
+    if wanted("memory"):
+        results += bench_memory(sizes)
+
+    report = {
+        "schema": SCHEMA_VERSION,
+        "metadata": collect_metadata(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+    if args.compare and not _compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,141 @@
 """The Energy Poster integration."""
 from __future__ import annotations
 
+from functools import partial
 import logging
+from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from .api import EnergyPosterApiClient
 from .const import (
+    CONF_ADAPTIVE_INTERVAL,
+    CONF_ADDITIONAL_ENDPOINTS,
+    CONF_AGGREGATION_MODE,
+    CONF_ALIGN_TO_CLOCK,
     CONF_API_KEY,
     CONF_API_URL,
+    CONF_AVERAGING,
+    CONF_AVERAGING_MIN_MAX,
+    CONF_COMPRESS,
+    CONF_CONSUMPTION_DEADBAND,
+    CONF_CONSUMPTION_FORMULA,
+    CONF_CONSUMPTION_MAX_AGE,
     CONF_CONSUMPTION_SENSORS,
+    CONF_DEDICATED_CONNECTION,
     CONF_EXPORTED_KWH_SENSOR,
+    CONF_HEARTBEAT,
     CONF_IMPORTED_KWH_SENSOR,
+    CONF_INTEGRATE_ENERGY,
     CONF_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_MIN_INTERVAL,
+    CONF_NET_IMPORT_DEADBAND,
+    CONF_NET_IMPORT_FORMULA,
+    CONF_OUTBOX_SIZE,
+    CONF_OVERLAP_POLICY,
+    CONF_POST_TIMEOUT,
+    CONF_PRECISION,
+    CONF_PRODUCTION_FORMULA,
+    CONF_SOLAR_MAX_AGE,
     CONF_SOLAR_SENSORS,
+    CONF_STALE_POLICY,
+    CONF_SWING_DEBOUNCE,
+    CONF_SWING_THRESHOLD,
+    CONF_VOLATILITY_REFERENCE,
+    DEFAULT_ADAPTIVE_INTERVAL,
+    DEFAULT_AGGREGATION_MODE,
+    DEFAULT_ALIGN_TO_CLOCK,
+    DEFAULT_AVERAGING,
+    DEFAULT_AVERAGING_MIN_MAX,
+    DEFAULT_COMPRESS,
+    DEFAULT_CONSUMPTION_DEADBAND,
+    DEFAULT_DEDICATED_CONNECTION,
+    DEFAULT_FORMULA,
+    DEFAULT_HEARTBEAT,
+    DEFAULT_INTEGRATE_ENERGY,
     DEFAULT_INTERVAL,
+    DEFAULT_MAX_AGE,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_NET_IMPORT_DEADBAND,
+    DEFAULT_OUTBOX_SIZE,
+    DEFAULT_OVERLAP_POLICY,
+    DEFAULT_POST_TIMEOUT,
+    DEFAULT_PRECISION,
+    DEFAULT_STALE_POLICY,
+    DEFAULT_SWING_DEBOUNCE,
+    DEFAULT_SWING_THRESHOLD,
+    DEFAULT_VOLATILITY_REFERENCE,
     DOMAIN,
+    STALE_POLICY_FLAG,
 )
 from .coordinator import EnergyPosterCoordinator
+from .energy import EnergyIntegrator
+from .engine import DATA_ENGINE
+from .freshness import LAST_REPORTED_SUPPORTED
+from .outbox import PostOutbox
+from .services import async_setup_services, async_unload_services
+from .target import PostTarget, outbox_id, parse_additional_endpoints
+from .transport import async_create_session
 
 _LOGGER = logging.getLogger(__name__)
 
+# Options applied to the running coordinator when changed; changing any other
+# option reloads the entry
+HOT_OPTIONS = {
+    CONF_API_URL,
+    CONF_API_KEY,
+    CONF_CONSUMPTION_SENSORS,
+    CONF_SOLAR_SENSORS,
+    CONF_IMPORTED_KWH_SENSOR,
+    CONF_EXPORTED_KWH_SENSOR,
+    CONF_INTERVAL,
+    CONF_PRECISION,
+    CONF_COMPRESS,
+    CONF_CONSUMPTION_DEADBAND,
+    CONF_NET_IMPORT_DEADBAND,
+    CONF_HEARTBEAT,
+}
+
+# Values of options the entry doesn't store. The user step only stores the
+# basic options, and older entries lack options added since.
+OPTION_DEFAULTS: dict[str, Any] = {
+    CONF_ADDITIONAL_ENDPOINTS: "",
+    CONF_IMPORTED_KWH_SENSOR: None,
+    CONF_EXPORTED_KWH_SENSOR: None,
+    CONF_INTERVAL: DEFAULT_INTERVAL,
+    CONF_AGGREGATION_MODE: DEFAULT_AGGREGATION_MODE,
+    CONF_AVERAGING: DEFAULT_AVERAGING,
+    CONF_AVERAGING_MIN_MAX: DEFAULT_AVERAGING_MIN_MAX,
+    CONF_OUTBOX_SIZE: DEFAULT_OUTBOX_SIZE,
+    CONF_POST_TIMEOUT: DEFAULT_POST_TIMEOUT,
+    CONF_OVERLAP_POLICY: DEFAULT_OVERLAP_POLICY,
+    CONF_ALIGN_TO_CLOCK: DEFAULT_ALIGN_TO_CLOCK,
+    CONF_DEDICATED_CONNECTION: DEFAULT_DEDICATED_CONNECTION,
+    CONF_PRECISION: DEFAULT_PRECISION,
+    CONF_COMPRESS: DEFAULT_COMPRESS,
+    CONF_CONSUMPTION_DEADBAND: DEFAULT_CONSUMPTION_DEADBAND,
+    CONF_NET_IMPORT_DEADBAND: DEFAULT_NET_IMPORT_DEADBAND,
+    CONF_HEARTBEAT: DEFAULT_HEARTBEAT,
+    CONF_SWING_THRESHOLD: DEFAULT_SWING_THRESHOLD,
+    CONF_SWING_DEBOUNCE: DEFAULT_SWING_DEBOUNCE,
+    CONF_ADAPTIVE_INTERVAL: DEFAULT_ADAPTIVE_INTERVAL,
+    CONF_MIN_INTERVAL: DEFAULT_MIN_INTERVAL,
+    CONF_MAX_INTERVAL: DEFAULT_MAX_INTERVAL,
+    CONF_VOLATILITY_REFERENCE: DEFAULT_VOLATILITY_REFERENCE,
+    CONF_CONSUMPTION_FORMULA: DEFAULT_FORMULA,
+    CONF_PRODUCTION_FORMULA: DEFAULT_FORMULA,
+    CONF_NET_IMPORT_FORMULA: DEFAULT_FORMULA,
+    CONF_INTEGRATE_ENERGY: DEFAULT_INTEGRATE_ENERGY,
+    CONF_CONSUMPTION_MAX_AGE: DEFAULT_MAX_AGE,
+    CONF_SOLAR_MAX_AGE: DEFAULT_MAX_AGE,
+    CONF_STALE_POLICY: DEFAULT_STALE_POLICY,
+}
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Energy Poster from a config entry."""
@@ -36,26 +149,141 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     imported_kwh_sensor = entry.data.get(CONF_IMPORTED_KWH_SENSOR)
     exported_kwh_sensor = entry.data.get(CONF_EXPORTED_KWH_SENSOR)
     interval = entry.data.get(CONF_INTERVAL, DEFAULT_INTERVAL)
+    aggregation_mode = entry.data.get(CONF_AGGREGATION_MODE, DEFAULT_AGGREGATION_MODE)
+    averaging = entry.data.get(CONF_AVERAGING, DEFAULT_AVERAGING)
+    averaging_min_max = entry.data.get(CONF_AVERAGING_MIN_MAX, DEFAULT_AVERAGING_MIN_MAX)
+    outbox_size = entry.data.get(CONF_OUTBOX_SIZE, DEFAULT_OUTBOX_SIZE)
+    post_timeout = entry.data.get(CONF_POST_TIMEOUT, DEFAULT_POST_TIMEOUT)
+    overlap_policy = entry.data.get(CONF_OVERLAP_POLICY, DEFAULT_OVERLAP_POLICY)
+    align_to_clock = entry.data.get(CONF_ALIGN_TO_CLOCK, DEFAULT_ALIGN_TO_CLOCK)
+    dedicated_connection = entry.data.get(
+        CONF_DEDICATED_CONNECTION, DEFAULT_DEDICATED_CONNECTION
+    )
+    precision = entry.data.get(CONF_PRECISION, DEFAULT_PRECISION)
+    compress = entry.data.get(CONF_COMPRESS, DEFAULT_COMPRESS)
+    consumption_deadband = entry.data.get(
+        CONF_CONSUMPTION_DEADBAND, DEFAULT_CONSUMPTION_DEADBAND
+    )
+    net_import_deadband = entry.data.get(
+        CONF_NET_IMPORT_DEADBAND, DEFAULT_NET_IMPORT_DEADBAND
+    )
+    heartbeat = entry.data.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT)
+    swing_threshold = entry.data.get(CONF_SWING_THRESHOLD, DEFAULT_SWING_THRESHOLD)
+    swing_debounce = entry.data.get(CONF_SWING_DEBOUNCE, DEFAULT_SWING_DEBOUNCE)
+    adaptive = entry.data.get(CONF_ADAPTIVE_INTERVAL, DEFAULT_ADAPTIVE_INTERVAL)
+    min_interval = entry.data.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL)
+    max_interval = entry.data.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL)
+    volatility_reference = entry.data.get(
+        CONF_VOLATILITY_REFERENCE, DEFAULT_VOLATILITY_REFERENCE
+    )
+    consumption_formula = entry.data.get(CONF_CONSUMPTION_FORMULA, DEFAULT_FORMULA)
+    production_formula = entry.data.get(CONF_PRODUCTION_FORMULA, DEFAULT_FORMULA)
+    net_import_formula = entry.data.get(CONF_NET_IMPORT_FORMULA, DEFAULT_FORMULA)
+    integrate_energy = entry.data.get(CONF_INTEGRATE_ENERGY, DEFAULT_INTEGRATE_ENERGY)
+    consumption_max_age = entry.data.get(CONF_CONSUMPTION_MAX_AGE, DEFAULT_MAX_AGE)
+    solar_max_age = entry.data.get(CONF_SOLAR_MAX_AGE, DEFAULT_MAX_AGE)
+    stale_policy = entry.data.get(CONF_STALE_POLICY, DEFAULT_STALE_POLICY)
+    if (
+        not LAST_REPORTED_SUPPORTED
+        and stale_policy != STALE_POLICY_FLAG
+        and (consumption_max_age or solar_max_age)
+    ):
+        _LOGGER.warning(
+            "This Home Assistant version can't tell steady sensors from stale "
+            "ones, only reporting stale sensors instead of acting on them"
+        )
+        stale_policy = STALE_POLICY_FLAG
 
-    # Get the shared aiohttp session
-    session = async_get_clientsession(hass)
-
-    # Create the API client
-    api_client = EnergyPosterApiClient(
-        session=session,
-        api_url=api_url,
-        api_key=api_key,
+    additional_endpoints = parse_additional_endpoints(
+        entry.data.get(CONF_ADDITIONAL_ENDPOINTS)
     )
 
+    async def async_create_target(
+        target_url: str, target_key: str, target_timeout: int, target_outbox: str
+    ) -> PostTarget:
+        """Create a post target for one endpoint."""
+        # Use a dedicated keep-alive session, or the shared aiohttp session
+        if dedicated_connection:
+            # Keep connections open for the longest gap between posts
+            session = await async_create_session(
+                hass, max(interval, max_interval) if adaptive else interval
+            )
+        else:
+            session = async_get_clientsession(hass)
+
+        # Create the API client
+        api_client = EnergyPosterApiClient(
+            session=session,
+            api_url=target_url,
+            api_key=target_key,
+            owns_session=dedicated_connection,
+            precision=precision,
+            compress=compress,
+        )
+
+        # Resolve DNS and complete the TLS handshake before the first post,
+        # without holding up setup
+        if dedicated_connection:
+            entry.async_create_task(hass, api_client.async_prewarm())
+
+        # Create the outbox for samples that fail to post
+        outbox = None
+        if outbox_size > 0:
+            outbox = PostOutbox(hass, target_outbox, outbox_size)
+
+        return PostTarget(hass, api_client, target_url, target_timeout, outbox)
+
+    # Create a target for the primary endpoint and each additional endpoint
+    targets = [
+        await async_create_target(
+            api_url, api_key, post_timeout, outbox_id(entry.entry_id)
+        )
+    ]
+    for extra_url, extra_key, extra_timeout in additional_endpoints:
+        targets.append(
+            await async_create_target(
+                extra_url,
+                extra_key,
+                extra_timeout or post_timeout,
+                outbox_id(entry.entry_id, extra_url),
+            )
+        )
+
+    # Calculate the energy totals that have no kWh sensor from net import
+    energy_integrator = None
+    if integrate_energy and not (imported_kwh_sensor and exported_kwh_sensor):
+        energy_integrator = EnergyIntegrator(hass, entry.entry_id)
+
     # Create the coordinator
     coordinator = EnergyPosterCoordinator(
         hass=hass,
-        api_client=api_client,
+        targets=targets,
         consumption_sensors=consumption_sensors,
         solar_sensors=solar_sensors,
         interval=interval,
         imported_kwh_sensor=imported_kwh_sensor,
         exported_kwh_sensor=exported_kwh_sensor,
+        aggregation_mode=aggregation_mode,
+        averaging=averaging,
+        averaging_min_max=averaging_min_max,
+        overlap_policy=overlap_policy,
+        align_to_clock=align_to_clock,
+        consumption_deadband=consumption_deadband,
+        net_import_deadband=net_import_deadband,
+        heartbeat=heartbeat,
+        swing_threshold=swing_threshold,
+        swing_debounce=swing_debounce,
+        adaptive=adaptive,
+        min_interval=min_interval,
+        max_interval=max_interval,
+        volatility_reference=volatility_reference,
+        consumption_formula=consumption_formula.strip(),
+        production_formula=production_formula.strip(),
+        net_import_formula=net_import_formula.strip(),
+        energy_integrator=energy_integrator,
+        consumption_max_age=consumption_max_age,
+        solar_max_age=solar_max_age,
+        stale_policy=stale_policy,
     )
 
     # Store the coordinator
@@ -68,8 +296,22 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Set up sensor platform
     await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
 
-    # Register update listener for options changes
-    entry.async_on_unload(entry.add_update_listener(async_update_options))
+    async_setup_services(hass)
+
+    # Register update listener for options changes, with the options the
+    # entry is running with
+    entry.async_on_unload(
+        entry.add_update_listener(partial(async_update_options, dict(entry.data)))
+    )
+
+    async def async_shutdown(_: Event) -> None:
+        """Post the final sample while Home Assistant stops."""
+        await coordinator.async_stop()
+
+    # Config entries are not unloaded when Home Assistant stops
+    entry.async_on_unload(
+        hass.bus.async_listen(EVENT_HOMEASSISTANT_STOP, async_shutdown)
+    )
 
     return True
 
@@ -91,12 +333,126 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         # Clean up domain data if empty
         if not hass.data[DOMAIN]:
             hass.data.pop(DOMAIN)
+            async_unload_services(hass)
+            if (engine := hass.data.pop(DATA_ENGINE, None)) is not None:
+                engine.async_stop()
 
     return unload_ok
 
 
-async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Handle options update."""
-    _LOGGER.info("Reloading ChargeHQ Push API Poster integration due to options change")
-    await hass.config_entries.async_reload(entry.entry_id)
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove data stored for a config entry."""
+    await PostOutbox(hass, outbox_id(entry.entry_id), 0).async_remove()
+    await EnergyIntegrator(hass, entry.entry_id).async_remove()
+
+    try:
+        additional_endpoints = parse_additional_endpoints(
+            entry.data.get(CONF_ADDITIONAL_ENDPOINTS)
+        )
+    except ValueError:
+        return
+    for extra_url, _, _ in additional_endpoints:
+        await PostOutbox(hass, outbox_id(entry.entry_id, extra_url), 0).async_remove()
+
+
+async def async_update_options(
+    applied: dict[str, Any], hass: HomeAssistant, entry: ConfigEntry
+) -> None:
+    """Handle options update.
+
+    Changes the running coordinator can take are applied in place, so posts
+    carry on without a gap; anything else reloads the entry.
+
+    Args:
+        applied: The options the entry is running with, updated in place.
+        hass: The Home Assistant instance.
+        entry: The config entry with the new options.
+    """
+    # An option the entry didn't store before is unchanged if it is now
+    # stored with its default
+    old = {**OPTION_DEFAULTS, **applied}
+    new = {**OPTION_DEFAULTS, **entry.data}
+    changed = {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+    if not changed:
+        return
+
+    if not changed <= HOT_OPTIONS or _needs_reload(applied, entry.data):
+        _LOGGER.info(
+            "Reloading ChargeHQ Push API Poster integration due to options change"
+        )
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+
+    _LOGGER.info(
+        "Applying changed options without a reload: %s", ", ".join(sorted(changed))
+    )
+    coordinator: EnergyPosterCoordinator = hass.data[DOMAIN][entry.entry_id]
+    data = entry.data
+
+    if changed & {CONF_API_URL, CONF_API_KEY}:
+        primary = coordinator.targets[0]
+        primary.update_endpoint(data[CONF_API_URL], data[CONF_API_KEY])
+        if CONF_API_URL in changed and data.get(
+            CONF_DEDICATED_CONNECTION, DEFAULT_DEDICATED_CONNECTION
+        ):
+            entry.async_create_task(hass, primary.api_client.async_prewarm())
+
+    if changed & {CONF_PRECISION, CONF_COMPRESS}:
+        for target in coordinator.targets:
+            target.api_client.reconfigure(
+                precision=data.get(CONF_PRECISION, DEFAULT_PRECISION),
+                compress=data.get(CONF_COMPRESS, DEFAULT_COMPRESS),
+            )
+
+    if changed & {
+        CONF_CONSUMPTION_SENSORS,
+        CONF_SOLAR_SENSORS,
+        CONF_IMPORTED_KWH_SENSOR,
+        CONF_EXPORTED_KWH_SENSOR,
+    }:
+        coordinator.async_set_sensors(
+            data[CONF_CONSUMPTION_SENSORS],
+            data[CONF_SOLAR_SENSORS],
+            data.get(CONF_IMPORTED_KWH_SENSOR),
+            data.get(CONF_EXPORTED_KWH_SENSOR),
+        )
+
+    if CONF_INTERVAL in changed:
+        coordinator.async_set_interval(data.get(CONF_INTERVAL, DEFAULT_INTERVAL))
+
+    if changed & {CONF_CONSUMPTION_DEADBAND, CONF_NET_IMPORT_DEADBAND, CONF_HEARTBEAT}:
+        coordinator.async_set_posting_policy(
+            data.get(CONF_CONSUMPTION_DEADBAND, DEFAULT_CONSUMPTION_DEADBAND),
+            data.get(CONF_NET_IMPORT_DEADBAND, DEFAULT_NET_IMPORT_DEADBAND),
+            data.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT),
+        )
+
+    applied.clear()
+    applied.update(data)
+
+
+def _needs_reload(old: dict[str, Any], new: Any) -> bool:
+    """Return whether a change of hot options still needs a reload.
+
+    Args:
+        old: The options the entry is running with.
+        new: The changed options.
+    """
+
+    def needs_integrator(data: Any) -> bool:
+        return bool(data.get(CONF_INTEGRATE_ENERGY, DEFAULT_INTEGRATE_ENERGY)) and not (
+            data.get(CONF_IMPORTED_KWH_SENSOR) and data.get(CONF_EXPORTED_KWH_SENSOR)
+        )
+
+    # The energy integrator is only created during setup
+    if needs_integrator(old) != needs_integrator(new):
+        return True
+
+    # Dedicated connections are kept alive for the interval they were
+    # created with, so a longer interval needs a new session
+    return bool(
+        new.get(CONF_DEDICATED_CONNECTION, DEFAULT_DEDICATED_CONNECTION)
+        and new.get(CONF_INTERVAL, DEFAULT_INTERVAL)
+        > old.get(CONF_INTERVAL, DEFAULT_INTERVAL)
+    )
 
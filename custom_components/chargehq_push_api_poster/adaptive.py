@@ -0,0 +1,93 @@
+"""Adaptive posting interval for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+import math
+
+# Seconds of history the volatility estimate mostly reflects. Older samples
+# still count, but with exponentially decaying weight.
+VOLATILITY_WINDOW = 300
+
+
+class VolatilityTracker:
+    """Streaming, time-weighted standard deviation of a signal.
+
+    Keeps an exponentially weighted mean and variance, so each sample is
+    folded in with O(1) work and memory. The signal is treated as a step
+    function: each value holds until the next one, and is weighted by how
+    long it held.
+    """
+
+    def __init__(self, window: float = VOLATILITY_WINDOW) -> None:
+        """Initialise the tracker.
+
+        Args:
+            window: Time constant of the exponential weighting in seconds.
+        """
+        self._window = window
+        self._mean: float | None = None
+        self._variance = 0.0
+        self._value = 0.0
+        self._since = 0.0
+
+    def add(self, timestamp: float, value: float) -> None:
+        """Add a sample.
+
+        Args:
+            timestamp: Monotonic time of the sample in seconds.
+            value: The sample value.
+        """
+        if self._mean is None:
+            self._mean = value
+        else:
+            self._fold(timestamp)
+        self._value = value
+        self._since = timestamp
+
+    def std_dev(self, now: float) -> float:
+        """Return the standard deviation of the signal up to now.
+
+        Args:
+            now: Monotonic time in seconds.
+        """
+        if self._mean is None:
+            return 0.0
+        self._fold(now)
+        self._since = now
+        return math.sqrt(self._variance)
+
+    def _fold(self, now: float) -> None:
+        """Fold the held value into the mean and variance."""
+        assert self._mean is not None
+        elapsed = now - self._since
+        if elapsed <= 0:
+            return
+
+        alpha = 1 - math.exp(-elapsed / self._window)
+        diff = self._value - self._mean
+        increment = alpha * diff
+        self._mean += increment
+        self._variance = (1 - alpha) * (self._variance + diff * increment)
+
+
+def adaptive_interval(
+    std_dev: float, minimum: float, maximum: float, reference: float
+) -> float:
+    """Map signal volatility to a posting interval.
+
+    A flat signal posts at the maximum interval; the interval shrinks
+    linearly as the standard deviation grows and reaches the minimum at the
+    reference standard deviation.
+
+    Args:
+        std_dev: Standard deviation of the signal in kW.
+        minimum: Shortest interval in seconds.
+        maximum: Longest interval in seconds.
+        reference: Standard deviation in kW at which the minimum is reached.
+
+    Returns:
+        The interval in seconds.
+    """
+    if reference <= 0:
+        return minimum
+    ratio = min(std_dev / reference, 1.0)
+    return maximum - (maximum - minimum) * ratio
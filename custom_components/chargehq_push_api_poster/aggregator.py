@@ -0,0 +1,305 @@
+"""State-change driven sensor aggregation for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+import logging
+import math
+import time
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .averaging import SampleRingBuffer, WindowStats, buffer_size
+from .engine import SamplingEngine
+from .formula import GROUP_CONSUMPTION, GROUP_SOLAR, MeterFormulas
+
+_LOGGER = logging.getLogger(__name__)
+
+# Rebuild a running total from its per-sensor values after this many
+# incremental updates so floating point error cannot build up over time.
+RESYNC_AFTER_UPDATES = 10000
+
+
+class SensorGroup:
+    """Running total over a group of power sensors."""
+
+    def __init__(self, entity_ids: list[str]) -> None:
+        """Initialise the group.
+
+        Args:
+            entity_ids: The sensor entity IDs that make up the group.
+        """
+        self.entity_ids = list(entity_ids)
+        self.values: dict[str, float] = {}
+        self.total = 0.0
+        self._updates = 0
+
+    def set_value(self, entity_id: str, value: float | None) -> None:
+        """Replace the value of one sensor and adjust the running total.
+
+        Args:
+            entity_id: The sensor entity ID.
+            value: The new value in kW, or None if it should count as 0.0.
+        """
+        old_value = self.values.pop(entity_id, 0.0)
+        if value is not None:
+            self.values[entity_id] = value
+        else:
+            value = 0.0
+
+        self._updates += 1
+        if self._updates >= RESYNC_AFTER_UPDATES:
+            self.resync()
+        else:
+            self.total += value - old_value
+
+    def resync(self) -> None:
+        """Recalculate the running total from the per-sensor values."""
+        self.total = math.fsum(self.values.values())
+        self._updates = 0
+
+
+class SensorAggregator:
+    """Track configured sensors from state changes and keep running totals.
+
+    Each state change does a constant amount of work, so reading the totals
+    when building a post costs O(1) regardless of how many sensors are
+    configured. States are converted by the shared sampling engine, so
+    sensors used by several config entries are only converted once.
+    """
+
+    def __init__(
+        self,
+        engine: SamplingEngine,
+        consumption_sensors: list[str],
+        solar_sensors: list[str],
+        imported_kwh_sensor: str | None = None,
+        exported_kwh_sensor: str | None = None,
+        averaging: bool = False,
+        formulas: MeterFormulas | None = None,
+    ) -> None:
+        """Initialise the aggregator.
+
+        Args:
+            engine: The shared sampling engine.
+            consumption_sensors: List of consumption sensor entity IDs.
+            solar_sensors: List of solar production sensor entity IDs.
+            imported_kwh_sensor: Optional imported kWh sensor entity ID.
+            exported_kwh_sensor: Optional exported kWh sensor entity ID.
+            averaging: Whether to record the power totals in sample buffers
+                for time-weighted averaging.
+            formulas: Formulas deriving the posted power fields from the
+                sensor sums and other power sensors, or None to post the
+                sums.
+        """
+        self._engine = engine
+        self._consumption = SensorGroup(consumption_sensors)
+        self._solar = SensorGroup(solar_sensors)
+        self._imported_kwh_sensor = imported_kwh_sensor
+        self._exported_kwh_sensor = exported_kwh_sensor
+        self._energy_values: dict[str, float] = {}
+        self._formulas = formulas
+        # Inputs and results of the formulas, updated on every power change
+        self._formula_values: dict[str, float] = {}
+        self._derived = (0.0, 0.0, 0.0)
+        self._unsub_power: CALLBACK_TYPE | None = None
+        self._unsub_energy: CALLBACK_TYPE | None = None
+        self._listeners: list[CALLBACK_TYPE] = []
+
+        # Sample buffers of the power totals, keyed by posted field
+        self._buffers: dict[str, SampleRingBuffer] = {}
+        if averaging:
+            self._buffers = {
+                "consumption_kw": SampleRingBuffer(),
+                "production_kw": SampleRingBuffer(),
+                "net_import_kw": SampleRingBuffer(),
+            }
+
+        # Map each entity to the power groups it belongs to
+        self._power_groups: dict[str, list[SensorGroup]] = {}
+        for group in (self._consumption, self._solar):
+            for entity_id in group.entity_ids:
+                self._power_groups.setdefault(entity_id, []).append(group)
+        if formulas is not None:
+            for entity_id in formulas.entity_ids:
+                self._power_groups.setdefault(entity_id, [])
+
+        self._energy_sensors = {
+            entity_id
+            for entity_id in (imported_kwh_sensor, exported_kwh_sensor)
+            if entity_id
+        }
+
+    @property
+    def entity_ids(self) -> set[str]:
+        """Return every entity ID the aggregator tracks."""
+        return set(self._power_groups) | self._energy_sensors
+
+    @property
+    def consumption_kw(self) -> float:
+        """Return the total consumption in kW."""
+        if self._formulas is not None:
+            return self._derived[0]
+        return self._consumption.total
+
+    @property
+    def production_kw(self) -> float:
+        """Return the total solar production in kW."""
+        if self._formulas is not None:
+            return self._derived[1]
+        return self._solar.total
+
+    @property
+    def net_import_kw(self) -> float:
+        """Return the net grid import in kW."""
+        if self._formulas is not None:
+            return self._derived[2]
+        return self._consumption.total - self._solar.total
+
+    @property
+    def imported_kwh(self) -> float | None:
+        """Return the imported energy in kWh, if configured and available."""
+        if self._imported_kwh_sensor is None:
+            return None
+        return self._energy_values.get(self._imported_kwh_sensor)
+
+    @property
+    def exported_kwh(self) -> float | None:
+        """Return the exported energy in kWh, if configured and available."""
+        if self._exported_kwh_sensor is None:
+            return None
+        return self._energy_values.get(self._exported_kwh_sensor)
+
+    @callback
+    def async_start(self) -> None:
+        """Subscribe to changes and seed values from the current states."""
+        power_entities = list(self._power_groups)
+        self._unsub_power = self._engine.power.async_subscribe(
+            power_entities, self._async_power_changed
+        )
+        for entity_id in power_entities:
+            self._async_power_changed(entity_id, self._engine.power.value(entity_id))
+
+        energy_entities = list(self._energy_sensors)
+        self._unsub_energy = self._engine.energy.async_subscribe(
+            energy_entities, self._async_energy_changed
+        )
+        for entity_id in energy_entities:
+            self._async_energy_changed(entity_id, self._engine.energy.value(entity_id))
+
+    @callback
+    def async_stop(self) -> None:
+        """Unsubscribe from state changes."""
+        if self._unsub_power is not None:
+            self._unsub_power()
+            self._unsub_power = None
+        if self._unsub_energy is not None:
+            self._unsub_energy()
+            self._unsub_energy = None
+
+    @callback
+    def async_exclude(self, entity_id: str) -> None:
+        """Leave a power sensor out of the totals until it updates again.
+
+        Args:
+            entity_id: The sensor entity ID.
+        """
+        if any(entity_id in group.values for group in self._power_groups[entity_id]):
+            self._async_power_changed(entity_id, None)
+
+    @callback
+    def async_include(self, entity_id: str) -> None:
+        """Put a power sensor left out by async_exclude back into the totals.
+
+        Args:
+            entity_id: The sensor entity ID.
+        """
+        if entity_id in self._power_groups:
+            self._async_power_changed(entity_id, self._engine.power.value(entity_id))
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for changes of the power totals.
+
+        Args:
+            update_callback: Called after a power sensor changed the totals.
+
+        Returns:
+            A callback that removes the listener.
+        """
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the listener."""
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_power_changed(self, entity_id: str, value: float | None) -> None:
+        """Fold a new power value in kW into the running totals."""
+        for group in self._power_groups[entity_id]:
+            group.set_value(entity_id, value)
+
+        if self._formulas is not None:
+            self._update_derived(entity_id, value)
+
+        if self._buffers:
+            self._record_samples()
+
+        for update_callback in self._listeners:
+            update_callback()
+
+    @callback
+    def _async_energy_changed(self, entity_id: str, value: float | None) -> None:
+        """Store a new energy value in kWh."""
+        if value is None:
+            self._energy_values.pop(entity_id, None)
+        else:
+            self._energy_values[entity_id] = value
+
+    def _update_derived(self, entity_id: str, value: float | None) -> None:
+        """Evaluate the formulas after a power value changed."""
+        assert self._formulas is not None
+        values = self._formula_values
+        if entity_id in self._formulas.entity_ids:
+            if value is None:
+                values.pop(entity_id, None)
+            else:
+                values[entity_id] = value
+        values[GROUP_CONSUMPTION] = self._consumption.total
+        values[GROUP_SOLAR] = self._solar.total
+        self._derived = self._formulas.evaluate(values)
+
+    def _record_samples(self) -> None:
+        """Append the current power totals to the sample buffers."""
+        now = time.monotonic()
+        self._buffers["consumption_kw"].append(now, self.consumption_kw)
+        self._buffers["production_kw"].append(now, self.production_kw)
+        self._buffers["net_import_kw"].append(now, self.net_import_kw)
+
+    def set_averaging_window(self, window: float) -> None:
+        """Keep enough samples to average over a window.
+
+        Args:
+            window: The longest window in seconds that will be averaged.
+        """
+        for buffer in self._buffers.values():
+            buffer.grow(buffer_size(window))
+
+    def window_stats(self, start: float, end: float) -> dict[str, WindowStats]:
+        """Return time-weighted statistics of the power totals over a window.
+
+        Args:
+            start: Monotonic start time of the window in seconds.
+            end: Monotonic end time of the window in seconds.
+
+        Returns:
+            Statistics keyed by posted field. Empty if averaging is disabled
+            or no samples have been recorded yet.
+        """
+        stats: dict[str, WindowStats] = {}
+        for field, buffer in self._buffers.items():
+            field_stats = buffer.window_stats(start, end)
+            if field_stats is not None:
+                stats[field] = field_stats
+        return stats
@@ -1,13 +1,147 @@
 """API client for ChargeHQ Push API Poster integration."""
 from __future__ import annotations
 
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import Enum
 import logging
+import random
+import time
 from typing import Any
 
-from aiohttp import ClientError, ClientSession
+from aiohttp import ClientError, ClientSession, ClientTimeout
+
+from .const import DEFAULT_PRECISION
+from .encoder import PayloadEncoder
+from .transport import CONNECT_TIMEOUT, DEFAULT_TIMEOUT
 
 _LOGGER = logging.getLogger(__name__)
 
+# Maximum number of bytes of an error response body that are read and logged
+ERROR_BODY_LIMIT = 256
+
+# Consecutive failures before the circuit opens
+CIRCUIT_FAILURE_THRESHOLD = 3
+
+# Backoff in seconds after the circuit opens, doubled on every failed trial
+# request up to the maximum
+CIRCUIT_BASE_BACKOFF = 30
+CIRCUIT_MAX_BACKOFF = 900
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class PostResult(Enum):
+    """Outcome of a post."""
+
+    SUCCESS = "success"
+    # The endpoint rejected the payload, posting it again will not help
+    REJECTED = "rejected"
+    # The post failed in a way that may succeed later
+    FAILED = "failed"
+    # The post was not attempted because the circuit is open
+    SKIPPED = "skipped"
+
+
+class CircuitBreaker:
+    """Track endpoint health and decide when requests may be sent.
+
+    After CIRCUIT_FAILURE_THRESHOLD consecutive failures (or any rate limit
+    response) the circuit opens and requests are refused until the backoff
+    has passed. A single trial request is then let through (half-open): if
+    it succeeds the circuit closes, otherwise it opens again with a doubled,
+    jittered backoff.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        base_backoff: float = CIRCUIT_BASE_BACKOFF,
+        max_backoff: float = CIRCUIT_MAX_BACKOFF,
+    ) -> None:
+        """Initialise the circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failures before the circuit opens.
+            base_backoff: Backoff in seconds the first time the circuit opens.
+            max_backoff: Upper bound of the backoff in seconds.
+        """
+        self._failure_threshold = failure_threshold
+        self._base_backoff = base_backoff
+        self._max_backoff = max_backoff
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self._open_count = 0
+        self._open_until = 0.0
+
+    @property
+    def retry_in(self) -> float:
+        """Return the seconds until a trial request is allowed."""
+        if self.state != CIRCUIT_OPEN:
+            return 0.0
+        return max(0.0, self._open_until - time.monotonic())
+
+    def allow_request(self) -> bool:
+        """Return whether a request may be sent now."""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+
+        if self.state == CIRCUIT_OPEN and time.monotonic() >= self._open_until:
+            # Let a single trial request through
+            self.state = CIRCUIT_HALF_OPEN
+            return True
+
+        return False
+
+    def record_success(self) -> None:
+        """Record a successful request and close the circuit."""
+        if self.state != CIRCUIT_CLOSED:
+            _LOGGER.info("Endpoint recovered, resuming posts")
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self._open_count = 0
+
+    def record_failure(
+        self, retry_after: float | None = None, rate_limited: bool = False
+    ) -> None:
+        """Record a failed request, opening the circuit if needed.
+
+        Args:
+            retry_after: Seconds the endpoint asked us to wait, if any. The
+                circuit always opens for at least this long, up to the
+                maximum backoff.
+            rate_limited: Whether the endpoint rate limited the request, which
+                opens the circuit straight away.
+        """
+        self.consecutive_failures += 1
+        if (
+            retry_after is None
+            and not rate_limited
+            and self.state == CIRCUIT_CLOSED
+            and self.consecutive_failures < self._failure_threshold
+        ):
+            return
+
+        # Exponential backoff with jitter so many clients don't retry together
+        backoff = min(self._max_backoff, self._base_backoff * 2**self._open_count)
+        backoff = random.uniform(backoff / 2, backoff)
+        if retry_after is not None:
+            backoff = max(backoff, min(retry_after, self._max_backoff))
+
+        self._open_count += 1
+        self._open_until = time.monotonic() + backoff
+        if self.state != CIRCUIT_OPEN:
+            _LOGGER.warning(
+                "Endpoint unhealthy after %d failed posts, "
+                "pausing posts for %.0f seconds",
+                self.consecutive_failures,
+                backoff,
+            )
+        self.state = CIRCUIT_OPEN
+
 
 class EnergyPosterApiClient:
     """API client to post energy data to the configured endpoint."""
@@ -17,17 +151,86 @@ class EnergyPosterApiClient:
         session: ClientSession,
         api_url: str,
         api_key: str,
+        owns_session: bool = False,
+        precision: int = DEFAULT_PRECISION,
+        compress: bool = False,
     ) -> None:
         """Initialize the API client.
 
         Args:
-            session: The aiohttp client session from Home Assistant.
+            session: The aiohttp client session to post with.
             api_url: The API endpoint URL to POST data to.
             api_key: The API key for authorisation.
+            owns_session: Whether the client should close the session when
+                it is closed (True for a dedicated session).
+            precision: Number of decimal places values are posted with.
+            compress: Whether to gzip request bodies.
         """
         self._session = session
         self._api_url = api_url
         self._api_key = api_key
+        self._owns_session = owns_session
+        self._precision = precision
+        self._compress = compress
+        self._encoder = PayloadEncoder(api_key, precision, compress)
+        self.circuit_breaker = CircuitBreaker()
+        self.last_payload_bytes = 0
+        self.payload_bytes = 0
+
+    def reconfigure(
+        self,
+        *,
+        api_url: str | None = None,
+        api_key: str | None = None,
+        precision: int | None = None,
+        compress: bool | None = None,
+    ) -> None:
+        """Change the endpoint or the encoding of later posts.
+
+        The session is kept, so connections that are already open stay warm.
+        A new URL or API key also resets the endpoint health, since failures
+        of the old endpoint or key say nothing about the new one.
+
+        Args:
+            api_url: The new API endpoint URL, or None to keep it.
+            api_key: The new API key, or None to keep it.
+            precision: The new number of decimal places, or None to keep it.
+            compress: Whether to gzip request bodies, or None to keep it.
+        """
+        if (api_url is not None and api_url != self._api_url) or (
+            api_key is not None and api_key != self._api_key
+        ):
+            self.circuit_breaker = CircuitBreaker()
+        if api_url is not None:
+            self._api_url = api_url
+        if api_key is not None:
+            self._api_key = api_key
+        if precision is not None:
+            self._precision = precision
+        if compress is not None:
+            self._compress = compress
+        self._encoder = PayloadEncoder(self._api_key, self._precision, self._compress)
+
+    async def async_prewarm(self) -> None:
+        """Open a connection to the endpoint ahead of the first post.
+
+        DNS resolution and the TLS handshake happen now, and the connection
+        is returned to the pool for the first post to reuse.
+        """
+        try:
+            async with self._session.head(
+                self._api_url,
+                allow_redirects=False,
+                timeout=ClientTimeout(total=CONNECT_TIMEOUT),
+            ) as response:
+                await response.read()
+        except (ClientError, asyncio.TimeoutError) as err:
+            _LOGGER.debug("Could not pre-warm connection to the endpoint: %s", err)
+
+    async def async_close(self) -> None:
+        """Close the session if the client owns it."""
+        if self._owns_session:
+            await self._session.close()
 
     async def post_energy_data(
         self,
@@ -37,6 +240,7 @@ class EnergyPosterApiClient:
         net_import_kw: float,
         imported_kwh: float | None = None,
         exported_kwh: float | None = None,
+        extra_meters: dict[str, float] | None = None,
     ) -> bool:
         """Post energy data to the configured API endpoint.
 
@@ -47,56 +251,161 @@ class EnergyPosterApiClient:
             net_import_kw: Net import (consumption - production) in kW.
             imported_kwh: Total imported energy in kWh (optional).
             exported_kwh: Total exported energy in kWh (optional).
+            extra_meters: Additional site meter values to include (optional).
 
         Returns:
             True if the POST was successful, False otherwise.
         """
-        site_meters: dict[str, Any] = {
-            "consumption_kw": consumption_kw,
-            "net_import_kw": net_import_kw,
-            "production_kw": production_kw,
-        }
+        site_meters = build_site_meters(
+            consumption_kw=consumption_kw,
+            production_kw=production_kw,
+            net_import_kw=net_import_kw,
+            imported_kwh=imported_kwh,
+            exported_kwh=exported_kwh,
+            extra_meters=extra_meters,
+        )
+        result = await self.post_site_meters(timestamp_ms, site_meters)
+        return result is PostResult.SUCCESS
+
+    async def post_site_meters(
+        self,
+        timestamp_ms: int,
+        site_meters: dict[str, Any],
+    ) -> PostResult:
+        """Post prepared site meter values to the configured API endpoint.
 
-        # Add optional fields only if they are provided
-        if imported_kwh is not None:
-            site_meters["imported_kwh"] = imported_kwh
+        Args:
+            timestamp_ms: Timestamp in milliseconds.
+            site_meters: The site meter values, as built by build_site_meters.
 
-        if exported_kwh is not None:
-            site_meters["exported_kwh"] = exported_kwh
+        Returns:
+            The outcome of the post.
+        """
+        if not self.circuit_breaker.allow_request():
+            _LOGGER.debug(
+                "Endpoint unhealthy, skipping post for another %.0f seconds",
+                self.circuit_breaker.retry_in,
+            )
+            return PostResult.SKIPPED
 
-        payload: dict[str, Any] = {
-            "apiKey": self._api_key,
-            "tsms": timestamp_ms,
-            "siteMeters": site_meters,
-        }
+        body = self._encoder.encode(timestamp_ms, site_meters)
+        self.last_payload_bytes = len(body)
+        self.payload_bytes += len(body)
 
         try:
             async with self._session.post(
                 self._api_url,
-                json=payload,
-                headers={"Content-Type": "application/json"},
+                data=body,
+                headers=self._encoder.headers,
+                timeout=DEFAULT_TIMEOUT,
             ) as response:
                 if response.status >= 200 and response.status < 300:
+                    self.circuit_breaker.record_success()
                     _LOGGER.debug(
                         "Successfully posted energy data: consumption=%.2f kW, "
                         "production=%.2f kW, net_import=%.2f kW",
-                        consumption_kw,
-                        production_kw,
-                        net_import_kw,
+                        site_meters["consumption_kw"],
+                        site_meters["production_kw"],
+                        site_meters["net_import_kw"],
                     )
-                    return True
-                else:
-                    response_text = await response.text()
-                    _LOGGER.error(
-                        "Failed to post energy data. Status: %s, Response: %s",
-                        response.status,
-                        response_text,
+                    return PostResult.SUCCESS
+
+                # Only read the start of the error body, it can be large
+                response_text = (
+                    await response.content.read(ERROR_BODY_LIMIT)
+                ).decode(errors="replace")
+                _LOGGER.error(
+                    "Failed to post energy data. Status: %s, Response: %s",
+                    response.status,
+                    response_text,
+                )
+
+                if response.status in (408, 429) or response.status >= 500:
+                    self.circuit_breaker.record_failure(
+                        _parse_retry_after(response.headers.get("Retry-After")),
+                        rate_limited=response.status == 429,
                     )
-                    return False
-        except ClientError as err:
-            _LOGGER.error("Error posting energy data: %s", err)
-            return False
+                    return PostResult.FAILED
+
+                # The endpoint is up but refused this payload
+                self.circuit_breaker.record_success()
+                return PostResult.REJECTED
+        except asyncio.CancelledError:
+            # Cancelled mid request, e.g. by a deadline; count it so a trial
+            # request can't leave the circuit half-open
+            self.circuit_breaker.record_failure()
+            raise
+        except (ClientError, asyncio.TimeoutError) as err:
+            _LOGGER.error("Error posting energy data: %s", err or type(err).__name__)
+            self.circuit_breaker.record_failure()
+            return PostResult.FAILED
         except Exception as err:
             _LOGGER.exception("Unexpected error posting energy data: %s", err)
-            return False
+            self.circuit_breaker.record_failure()
+            return PostResult.FAILED
+
+
+def build_site_meters(
+    consumption_kw: float,
+    production_kw: float,
+    net_import_kw: float,
+    imported_kwh: float | None = None,
+    exported_kwh: float | None = None,
+    extra_meters: dict[str, float] | None = None,
+) -> dict[str, Any]:
+    """Build the siteMeters part of the payload.
+
+    Args:
+        consumption_kw: Total consumption in kW.
+        production_kw: Total solar production in kW.
+        net_import_kw: Net import (consumption - production) in kW.
+        imported_kwh: Total imported energy in kWh (optional).
+        exported_kwh: Total exported energy in kWh (optional).
+        extra_meters: Additional site meter values to include (optional).
+
+    Returns:
+        The site meter values keyed by API field name.
+    """
+    site_meters: dict[str, Any] = {
+        "consumption_kw": consumption_kw,
+        "net_import_kw": net_import_kw,
+        "production_kw": production_kw,
+    }
+
+    # Add optional fields only if they are provided
+    if imported_kwh is not None:
+        site_meters["imported_kwh"] = imported_kwh
+
+    if exported_kwh is not None:
+        site_meters["exported_kwh"] = exported_kwh
+
+    if extra_meters:
+        site_meters.update(extra_meters)
+
+    return site_meters
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header into seconds.
+
+    Args:
+        value: The header value, either delay-seconds or an HTTP date.
+
+    Returns:
+        The number of seconds to wait, or None if absent or invalid.
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
 
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,165 @@
+"""Time-weighted averaging for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+from array import array
+import logging
+import math
+from typing import NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# Changes within one step of this many seconds share a sample, so a burst of
+# updates from many sensors can't push the start of a window out of the
+# buffer. The value last set in a step holds for the whole step.
+SAMPLE_STEP = 1.0
+
+# Smallest number of samples kept per averaged field. If a window holds more
+# steps than the buffer the oldest are overwritten and the window starts at
+# the oldest kept sample.
+SAMPLE_BUFFER_SIZE = 600
+
+
+def buffer_size(window: float) -> int:
+    """Return the number of samples needed to cover a window.
+
+    Args:
+        window: The longest window in seconds.
+    """
+    return max(SAMPLE_BUFFER_SIZE, math.ceil(window / SAMPLE_STEP) + 1)
+
+
+class WindowStats(NamedTuple):
+    """Time-weighted statistics of a signal over a window."""
+
+    mean: float
+    minimum: float
+    maximum: float
+
+
+class SampleRingBuffer:
+    """Fixed-size, array-backed ring buffer of timestamped samples.
+
+    Memory is allocated up front and appending a sample is O(1). The signal
+    is treated as a step function: each sample holds until the next. At most
+    one sample is kept per SAMPLE_STEP.
+    """
+
+    def __init__(self, capacity: int = SAMPLE_BUFFER_SIZE) -> None:
+        """Initialise the buffer.
+
+        Args:
+            capacity: The maximum number of samples kept.
+        """
+        self._capacity = capacity
+        self._times = array("d", [0.0]) * capacity
+        self._values = array("d", [0.0]) * capacity
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return the number of samples held."""
+        return self._count
+
+    def append(self, timestamp: float, value: float) -> None:
+        """Add a sample, overwriting the oldest one when full.
+
+        A sample in the same step as the previous one replaces its value.
+
+        Args:
+            timestamp: Monotonic time of the sample in seconds.
+            value: The sample value.
+        """
+        if self._count:
+            last = (self._next - 1) % self._capacity
+            if timestamp // SAMPLE_STEP == self._times[last] // SAMPLE_STEP:
+                self._values[last] = value
+                return
+
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def grow(self, capacity: int) -> None:
+        """Make room for more samples, keeping the ones held.
+
+        Args:
+            capacity: The maximum number of samples kept; a smaller capacity
+                than the current one is ignored.
+        """
+        if capacity <= self._capacity:
+            return
+
+        first = (self._next - self._count) % self._capacity
+        times = array("d", [0.0]) * capacity
+        values = array("d", [0.0]) * capacity
+        for offset in range(self._count):
+            index = (first + offset) % self._capacity
+            times[offset] = self._times[index]
+            values[offset] = self._values[index]
+        self._times = times
+        self._values = values
+        self._capacity = capacity
+        self._next = self._count
+
+    def window_stats(self, start: float, end: float) -> WindowStats | None:
+        """Return time-weighted statistics for the window [start, end].
+
+        Args:
+            start: Monotonic start time of the window in seconds.
+            end: Monotonic end time of the window in seconds.
+
+        Returns:
+            The window statistics, or None if the buffer holds no samples
+            at or before the end of the window.
+        """
+        first = (self._next - self._count) % self._capacity
+        current: float | None = None
+        current_since = start
+        window_begin: float | None = None
+        area = 0.0
+        minimum = float("inf")
+        maximum = float("-inf")
+
+        for offset in range(self._count):
+            index = (first + offset) % self._capacity
+            timestamp = self._times[index]
+            value = self._values[index]
+
+            if timestamp <= start:
+                # Latest value in effect when the window opens
+                current = value
+                window_begin = start
+                continue
+            if timestamp > end:
+                break
+
+            if current is None:
+                # Older samples were overwritten, the window starts here
+                window_begin = timestamp
+                if self._count == self._capacity:
+                    _LOGGER.debug(
+                        "Averaging over the last %.0f of %.0f seconds, older "
+                        "samples were overwritten",
+                        end - timestamp,
+                        end - start,
+                    )
+            else:
+                area += current * (timestamp - current_since)
+                minimum = min(minimum, current)
+                maximum = max(maximum, current)
+            current = value
+            current_since = timestamp
+
+        if current is None or window_begin is None:
+            return None
+
+        area += current * (end - current_since)
+        minimum = min(minimum, current)
+        maximum = max(maximum, current)
+
+        duration = end - window_begin
+        if duration <= 0:
+            return WindowStats(current, current, current)
+        return WindowStats(area / duration, minimum, maximum)
@@ -0,0 +1,285 @@
+"""Backfill of past samples from the recorder for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from functools import partial
+import heapq
+import logging
+import math
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, State
+from homeassistant.util import dt as dt_util
+
+from .api import PostResult, build_site_meters
+from .formula import GROUP_CONSUMPTION, GROUP_SOLAR, MeterFormulas
+from .target import PostTarget, Sample
+from .units import ENERGY_UNIT_FACTORS, POWER_UNIT_FACTORS, UnitConversionCache
+
+_LOGGER = logging.getLogger(__name__)
+
+# Span of history loaded from the recorder at once. Its samples are posted
+# before the next span is loaded, so memory use does not grow with the range.
+HISTORY_CHUNK = timedelta(hours=1)
+
+# Posts in flight at once per endpoint
+BACKFILL_CONCURRENCY = 2
+
+# Posts started per second per endpoint
+BACKFILL_RATE = 2.0
+
+
+class HistoryBackfill:
+    """Rebuild past samples from the recorder and post them.
+
+    History is read a chunk at a time and replayed as a step function, like
+    the live sensor tracking: at every multiple of the interval each sensor
+    has the last state recorded before it. The samples of a chunk are posted
+    to every endpoint before the next chunk is read, with at most
+    BACKFILL_CONCURRENCY posts in flight and BACKFILL_RATE posts started per
+    second per endpoint. An endpoint that fails or is paused stops receiving
+    samples; the others carry on.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        targets: list[PostTarget],
+        interval: int,
+        consumption_sensors: list[str],
+        solar_sensors: list[str],
+        imported_kwh_sensor: str | None = None,
+        exported_kwh_sensor: str | None = None,
+        formulas: MeterFormulas | None = None,
+    ) -> None:
+        """Initialise the backfill.
+
+        Args:
+            hass: The Home Assistant instance.
+            targets: The endpoints to post the samples to.
+            interval: Interval in seconds between samples.
+            consumption_sensors: List of consumption sensor entity IDs.
+            solar_sensors: List of solar production sensor entity IDs.
+            imported_kwh_sensor: Optional imported kWh sensor entity ID.
+            exported_kwh_sensor: Optional exported kWh sensor entity ID.
+            formulas: Formulas deriving the posted power fields, if any.
+        """
+        self._hass = hass
+        self._interval = interval
+        self._consumption_sensors = consumption_sensors
+        self._solar_sensors = solar_sensors
+        self._imported_kwh_sensor = imported_kwh_sensor
+        self._exported_kwh_sensor = exported_kwh_sensor
+        self._formulas = formulas
+
+        self._power_sensors = set(consumption_sensors) | set(solar_sensors)
+        if formulas is not None:
+            self._power_sensors |= formulas.entity_ids
+        self._energy_sensors = {
+            entity_id
+            for entity_id in (imported_kwh_sensor, exported_kwh_sensor)
+            if entity_id
+        }
+        self._power_units = UnitConversionCache(POWER_UNIT_FACTORS, "kW")
+        self._energy_units = UnitConversionCache(ENERGY_UNIT_FACTORS, "kWh")
+
+        # Converted value of each sensor at the sample being built
+        self._values: dict[str, float | None] = {}
+        # Endpoints still receiving samples, with the count posted so far
+        self._posted: dict[PostTarget, int] = {target: 0 for target in targets}
+        self._next_post: dict[PostTarget, float] = {}
+
+    async def async_run(self, start: datetime, end: datetime) -> None:
+        """Post the samples between two times.
+
+        Args:
+            start: Start of the range (inclusive).
+            end: End of the range (exclusive).
+        """
+        _LOGGER.info(
+            "Backfilling samples from %s to %s every %d seconds",
+            start.isoformat(),
+            end.isoformat(),
+            self._interval,
+        )
+        tick = math.ceil(start.timestamp() / self._interval) * self._interval
+        chunk_start = start
+        while chunk_start < end and self._posted:
+            chunk_end = min(chunk_start + HISTORY_CHUNK, end)
+            history = await self._async_load_history(chunk_start, chunk_end)
+
+            samples: list[Sample] = []
+            changes = _merge_changes(history)
+            pending = next(changes, None)
+            while tick < chunk_end.timestamp():
+                # Apply every state recorded up to the tick
+                while pending is not None and pending[0] <= tick:
+                    self._apply(pending[1], pending[2])
+                    pending = next(changes, None)
+                if (sample := self._build_sample(tick)) is not None:
+                    samples.append(sample)
+                tick += self._interval
+
+            await asyncio.gather(
+                *(
+                    self._async_post_samples(target, samples)
+                    for target in list(self._posted)
+                )
+            )
+            chunk_start = chunk_end
+
+        for target, count in self._posted.items():
+            _LOGGER.info("Backfilled %d samples to %s", count, target.name)
+
+    async def _async_load_history(
+        self, start: datetime, end: datetime
+    ) -> dict[str, list[State]]:
+        """Load the states of the sensors in a time range from the recorder.
+
+        The state each sensor had at the start of the range is included, so
+        that every chunk can be replayed on its own.
+        """
+        # pylint: disable-next=import-outside-toplevel
+        from homeassistant.components.recorder import get_instance, history
+
+        states = await get_instance(self._hass).async_add_executor_job(
+            partial(
+                history.get_significant_states,
+                self._hass,
+                start,
+                end,
+                entity_ids=list(self._power_sensors | self._energy_sensors),
+                include_start_time_state=True,
+                significant_changes_only=False,
+            )
+        )
+        return {
+            entity_id: [state for state in entity_states if isinstance(state, State)]
+            for entity_id, entity_states in states.items()
+        }
+
+    def _apply(self, entity_id: str, state: State) -> None:
+        """Make a recorded state the current value of a sensor."""
+        if entity_id in self._power_sensors:
+            self._values[entity_id] = self._power_units.convert(entity_id, state)
+        else:
+            self._values[entity_id] = self._energy_units.convert(entity_id, state)
+
+    def _build_sample(self, tick: float) -> Sample | None:
+        """Build the sample of a tick from the current sensor values.
+
+        Returns:
+            The timestamp in milliseconds and the site meters, or None if no
+            power sensor had a recorded state yet.
+        """
+        values = self._values
+        if not any(entity_id in values for entity_id in self._power_sensors):
+            return None
+
+        consumption_kw = sum(
+            values.get(entity_id) or 0.0 for entity_id in self._consumption_sensors
+        )
+        production_kw = sum(
+            values.get(entity_id) or 0.0 for entity_id in self._solar_sensors
+        )
+        if self._formulas is not None:
+            formula_values = {
+                entity_id: value
+                for entity_id in self._formulas.entity_ids
+                if (value := values.get(entity_id)) is not None
+            }
+            formula_values[GROUP_CONSUMPTION] = consumption_kw
+            formula_values[GROUP_SOLAR] = production_kw
+            consumption_kw, production_kw, net_import_kw = self._formulas.evaluate(
+                formula_values
+            )
+        else:
+            net_import_kw = consumption_kw - production_kw
+
+        imported_kwh = None
+        if self._imported_kwh_sensor:
+            imported_kwh = values.get(self._imported_kwh_sensor)
+        exported_kwh = None
+        if self._exported_kwh_sensor:
+            exported_kwh = values.get(self._exported_kwh_sensor)
+
+        return int(tick * 1000), build_site_meters(
+            consumption_kw=consumption_kw,
+            production_kw=production_kw,
+            net_import_kw=net_import_kw,
+            imported_kwh=imported_kwh,
+            exported_kwh=exported_kwh,
+        )
+
+    async def _async_post_samples(
+        self, target: PostTarget, samples: list[Sample]
+    ) -> None:
+        """Post samples to one endpoint within the concurrency and rate limits."""
+        semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+        stopped_at: list[int] = []
+
+        async def async_post(timestamp_ms: int, site_meters: dict[str, Any]) -> None:
+            async with semaphore:
+                if stopped_at:
+                    return
+                await self._async_wait_for_slot(target)
+                try:
+                    result = await asyncio.wait_for(
+                        target.api_client.post_site_meters(timestamp_ms, site_meters),
+                        target.post_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    result = PostResult.FAILED
+                if result is PostResult.SUCCESS:
+                    self._posted[target] += 1
+                elif result is PostResult.REJECTED:
+                    _LOGGER.debug(
+                        "%s rejected the backfilled sample of %s",
+                        target.name,
+                        _format_ms(timestamp_ms),
+                    )
+                else:
+                    stopped_at.append(timestamp_ms)
+
+        await asyncio.gather(*(async_post(*sample) for sample in samples))
+
+        if stopped_at:
+            _LOGGER.warning(
+                "Stopped backfilling %s at %s after %d samples because the "
+                "endpoint is unavailable; run the backfill again from then",
+                target.name,
+                _format_ms(min(stopped_at)),
+                self._posted.pop(target),
+            )
+
+    async def _async_wait_for_slot(self, target: PostTarget) -> None:
+        """Wait until another post to an endpoint may start."""
+        now = time.monotonic()
+        slot = max(now, self._next_post.get(target, now))
+        self._next_post[target] = slot + 1 / BACKFILL_RATE
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def _merge_changes(
+    history: dict[str, list[State]]
+) -> Iterator[tuple[float, str, State]]:
+    """Merge the recorded states of several sensors in time order."""
+    return heapq.merge(
+        *(_changes(entity_id, states) for entity_id, states in history.items()),
+        key=lambda change: change[0],
+    )
+
+
+def _changes(entity_id: str, states: list[State]) -> Iterator[tuple[float, str, State]]:
+    """Return the recorded states of a sensor with their times."""
+    for state in states:
+        yield state.last_updated.timestamp(), entity_id, state
+
+
+def _format_ms(timestamp_ms: int) -> str:
+    """Format a timestamp in milliseconds for the log."""
+    return dt_util.utc_from_timestamp(timestamp_ms / 1000).isoformat()
@@ -12,16 +12,76 @@ from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers import selector
 
 from .const import (
+    AGGREGATION_MODE_EVENT,
+    AGGREGATION_MODE_POLL,
+    CONF_ADAPTIVE_INTERVAL,
+    CONF_ADDITIONAL_ENDPOINTS,
+    CONF_AGGREGATION_MODE,
+    CONF_ALIGN_TO_CLOCK,
     CONF_API_KEY,
     CONF_API_URL,
+    CONF_AVERAGING,
+    CONF_AVERAGING_MIN_MAX,
+    CONF_COMPRESS,
+    CONF_CONSUMPTION_DEADBAND,
+    CONF_CONSUMPTION_FORMULA,
+    CONF_CONSUMPTION_MAX_AGE,
     CONF_CONSUMPTION_SENSORS,
+    CONF_DEDICATED_CONNECTION,
     CONF_EXPORTED_KWH_SENSOR,
+    CONF_HEARTBEAT,
     CONF_IMPORTED_KWH_SENSOR,
+    CONF_INTEGRATE_ENERGY,
     CONF_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_MIN_INTERVAL,
+    CONF_NET_IMPORT_DEADBAND,
+    CONF_NET_IMPORT_FORMULA,
+    CONF_OUTBOX_SIZE,
+    CONF_OVERLAP_POLICY,
+    CONF_POST_TIMEOUT,
+    CONF_PRECISION,
+    CONF_PRODUCTION_FORMULA,
+    CONF_SOLAR_MAX_AGE,
     CONF_SOLAR_SENSORS,
+    CONF_STALE_POLICY,
+    CONF_SWING_DEBOUNCE,
+    CONF_SWING_THRESHOLD,
+    CONF_VOLATILITY_REFERENCE,
+    DEFAULT_ADAPTIVE_INTERVAL,
+    DEFAULT_AGGREGATION_MODE,
+    DEFAULT_ALIGN_TO_CLOCK,
+    DEFAULT_AVERAGING,
+    DEFAULT_AVERAGING_MIN_MAX,
+    DEFAULT_COMPRESS,
+    DEFAULT_CONSUMPTION_DEADBAND,
+    DEFAULT_DEDICATED_CONNECTION,
+    DEFAULT_FORMULA,
+    DEFAULT_HEARTBEAT,
+    DEFAULT_INTEGRATE_ENERGY,
     DEFAULT_INTERVAL,
+    DEFAULT_MAX_AGE,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_NET_IMPORT_DEADBAND,
+    DEFAULT_OUTBOX_SIZE,
+    DEFAULT_OVERLAP_POLICY,
+    DEFAULT_POST_TIMEOUT,
+    DEFAULT_PRECISION,
+    DEFAULT_STALE_POLICY,
+    DEFAULT_SWING_DEBOUNCE,
+    DEFAULT_SWING_THRESHOLD,
+    DEFAULT_VOLATILITY_REFERENCE,
     DOMAIN,
+    OVERLAP_POLICY_MERGE,
+    OVERLAP_POLICY_SKIP,
+    STALE_POLICY_EXCLUDE,
+    STALE_POLICY_FLAG,
+    STALE_POLICY_SKIP,
 )
+from .formula import Formula
+from .freshness import LAST_REPORTED_SUPPORTED
+from .target import parse_additional_endpoints
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -120,6 +180,7 @@ class ChargeHQPushApiPosterOptionsFlow(config_entries.OptionsFlow):
     def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
         """Initialize options flow."""
         self._config_entry = config_entry
+        self._data: dict[str, Any] = {}
 
     async def async_step_init(
         self, user_input: dict[str, Any] | None = None
@@ -148,12 +209,9 @@ class ChargeHQPushApiPosterOptionsFlow(config_entries.OptionsFlow):
                 errors[CONF_INTERVAL] = "invalid_interval"
 
             if not errors:
-                # Update the config entry
-                self.hass.config_entries.async_update_entry(
-                    self._config_entry,
-                    data=user_input,
-                )
-                return self.async_create_entry(title="", data={})
+                # Continue to the advanced settings
+                self._data = dict(user_input)
+                return await self.async_step_advanced()
 
         # Get current values
         current_data = self._config_entry.data
@@ -217,3 +275,218 @@ class ChargeHQPushApiPosterOptionsFlow(config_entries.OptionsFlow):
             errors=errors,
         )
 
+    async def async_step_advanced(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle the advanced options."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            # Validate the input
+            try:
+                parse_additional_endpoints(user_input.get(CONF_ADDITIONAL_ENDPOINTS))
+            except ValueError:
+                errors[CONF_ADDITIONAL_ENDPOINTS] = "invalid_additional_endpoints"
+
+            if user_input.get(
+                CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL
+            ) > user_input.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL):
+                errors[CONF_MAX_INTERVAL] = "invalid_interval_range"
+
+            for key in (
+                CONF_CONSUMPTION_FORMULA,
+                CONF_PRODUCTION_FORMULA,
+                CONF_NET_IMPORT_FORMULA,
+            ):
+                if formula := user_input.get(key, DEFAULT_FORMULA).strip():
+                    try:
+                        Formula(formula)
+                    except ValueError:
+                        errors[key] = "invalid_formula"
+
+            if (
+                not LAST_REPORTED_SUPPORTED
+                and user_input.get(CONF_STALE_POLICY, DEFAULT_STALE_POLICY)
+                != STALE_POLICY_FLAG
+                and (
+                    user_input.get(CONF_CONSUMPTION_MAX_AGE, DEFAULT_MAX_AGE)
+                    or user_input.get(CONF_SOLAR_MAX_AGE, DEFAULT_MAX_AGE)
+                )
+            ):
+                # Steady sensors would look stale and be dropped
+                errors[CONF_STALE_POLICY] = "stale_policy_unsupported"
+
+            if not errors:
+                # Update the config entry
+                self.hass.config_entries.async_update_entry(
+                    self._config_entry,
+                    data={**self._data, **user_input},
+                )
+                return self.async_create_entry(title="", data={})
+
+        # Get current values
+        current_data = self._config_entry.data
+
+        data_schema = vol.Schema(
+            {
+                vol.Optional(
+                    CONF_ADDITIONAL_ENDPOINTS,
+                    default=current_data.get(CONF_ADDITIONAL_ENDPOINTS, ""),
+                ): selector.TextSelector(
+                    selector.TextSelectorConfig(multiline=True)
+                ),
+                vol.Optional(
+                    CONF_AGGREGATION_MODE,
+                    default=current_data.get(
+                        CONF_AGGREGATION_MODE, DEFAULT_AGGREGATION_MODE
+                    ),
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=[AGGREGATION_MODE_EVENT, AGGREGATION_MODE_POLL],
+                        translation_key=CONF_AGGREGATION_MODE,
+                    )
+                ),
+                vol.Optional(
+                    CONF_AVERAGING,
+                    default=current_data.get(CONF_AVERAGING, DEFAULT_AVERAGING),
+                ): bool,
+                vol.Optional(
+                    CONF_AVERAGING_MIN_MAX,
+                    default=current_data.get(
+                        CONF_AVERAGING_MIN_MAX, DEFAULT_AVERAGING_MIN_MAX
+                    ),
+                ): bool,
+                vol.Optional(
+                    CONF_OUTBOX_SIZE,
+                    default=current_data.get(CONF_OUTBOX_SIZE, DEFAULT_OUTBOX_SIZE),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_POST_TIMEOUT,
+                    default=current_data.get(CONF_POST_TIMEOUT, DEFAULT_POST_TIMEOUT),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    CONF_OVERLAP_POLICY,
+                    default=current_data.get(
+                        CONF_OVERLAP_POLICY, DEFAULT_OVERLAP_POLICY
+                    ),
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=[OVERLAP_POLICY_SKIP, OVERLAP_POLICY_MERGE],
+                        translation_key=CONF_OVERLAP_POLICY,
+                    )
+                ),
+                vol.Optional(
+                    CONF_ALIGN_TO_CLOCK,
+                    default=current_data.get(
+                        CONF_ALIGN_TO_CLOCK, DEFAULT_ALIGN_TO_CLOCK
+                    ),
+                ): bool,
+                vol.Optional(
+                    CONF_DEDICATED_CONNECTION,
+                    default=current_data.get(
+                        CONF_DEDICATED_CONNECTION, DEFAULT_DEDICATED_CONNECTION
+                    ),
+                ): bool,
+                vol.Optional(
+                    CONF_PRECISION,
+                    default=current_data.get(CONF_PRECISION, DEFAULT_PRECISION),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=6)),
+                vol.Optional(
+                    CONF_COMPRESS,
+                    default=current_data.get(CONF_COMPRESS, DEFAULT_COMPRESS),
+                ): bool,
+                vol.Optional(
+                    CONF_CONSUMPTION_DEADBAND,
+                    default=current_data.get(
+                        CONF_CONSUMPTION_DEADBAND, DEFAULT_CONSUMPTION_DEADBAND
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_NET_IMPORT_DEADBAND,
+                    default=current_data.get(
+                        CONF_NET_IMPORT_DEADBAND, DEFAULT_NET_IMPORT_DEADBAND
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_HEARTBEAT,
+                    default=current_data.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT),
+                ): vol.All(vol.Coerce(int), vol.Range(min=30)),
+                vol.Optional(
+                    CONF_SWING_THRESHOLD,
+                    default=current_data.get(
+                        CONF_SWING_THRESHOLD, DEFAULT_SWING_THRESHOLD
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_SWING_DEBOUNCE,
+                    default=current_data.get(
+                        CONF_SWING_DEBOUNCE, DEFAULT_SWING_DEBOUNCE
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_ADAPTIVE_INTERVAL,
+                    default=current_data.get(
+                        CONF_ADAPTIVE_INTERVAL, DEFAULT_ADAPTIVE_INTERVAL
+                    ),
+                ): bool,
+                vol.Optional(
+                    CONF_MIN_INTERVAL,
+                    default=current_data.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5)),
+                vol.Optional(
+                    CONF_MAX_INTERVAL,
+                    default=current_data.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5)),
+                vol.Optional(
+                    CONF_VOLATILITY_REFERENCE,
+                    default=current_data.get(
+                        CONF_VOLATILITY_REFERENCE, DEFAULT_VOLATILITY_REFERENCE
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_CONSUMPTION_MAX_AGE,
+                    default=current_data.get(CONF_CONSUMPTION_MAX_AGE, DEFAULT_MAX_AGE),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_SOLAR_MAX_AGE,
+                    default=current_data.get(CONF_SOLAR_MAX_AGE, DEFAULT_MAX_AGE),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_STALE_POLICY,
+                    default=current_data.get(CONF_STALE_POLICY, DEFAULT_STALE_POLICY),
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=[
+                            STALE_POLICY_FLAG,
+                            STALE_POLICY_EXCLUDE,
+                            STALE_POLICY_SKIP,
+                        ],
+                        translation_key=CONF_STALE_POLICY,
+                    )
+                ),
+                vol.Optional(
+                    CONF_INTEGRATE_ENERGY,
+                    default=current_data.get(
+                        CONF_INTEGRATE_ENERGY, DEFAULT_INTEGRATE_ENERGY
+                    ),
+                ): bool,
+                vol.Optional(
+                    CONF_CONSUMPTION_FORMULA,
+                    default=current_data.get(CONF_CONSUMPTION_FORMULA, DEFAULT_FORMULA),
+                ): str,
+                vol.Optional(
+                    CONF_PRODUCTION_FORMULA,
+                    default=current_data.get(CONF_PRODUCTION_FORMULA, DEFAULT_FORMULA),
+                ): str,
+                vol.Optional(
+                    CONF_NET_IMPORT_FORMULA,
+                    default=current_data.get(CONF_NET_IMPORT_FORMULA, DEFAULT_FORMULA),
+                ): str,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="advanced",
+            data_schema=data_schema,
+            errors=errors,
+        )
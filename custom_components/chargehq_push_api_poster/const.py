@@ -4,11 +4,73 @@ DOMAIN = "chargehq_push_api_poster"
 
 CONF_API_URL = "api_url"
 CONF_API_KEY = "api_key"
+CONF_ADDITIONAL_ENDPOINTS = "additional_endpoints"
 CONF_CONSUMPTION_SENSORS = "consumption_sensors"
 CONF_SOLAR_SENSORS = "solar_sensors"
 CONF_IMPORTED_KWH_SENSOR = "imported_kwh_sensor"
 CONF_EXPORTED_KWH_SENSOR = "exported_kwh_sensor"
 CONF_INTERVAL = "interval"
+CONF_AGGREGATION_MODE = "aggregation_mode"
+CONF_AVERAGING = "averaging"
+CONF_AVERAGING_MIN_MAX = "averaging_min_max"
+CONF_OUTBOX_SIZE = "outbox_size"
+CONF_POST_TIMEOUT = "post_timeout"
+CONF_OVERLAP_POLICY = "overlap_policy"
+CONF_ALIGN_TO_CLOCK = "align_to_clock"
+CONF_DEDICATED_CONNECTION = "dedicated_connection"
+CONF_PRECISION = "precision"
+CONF_COMPRESS = "compress"
+CONF_CONSUMPTION_DEADBAND = "consumption_deadband"
+CONF_NET_IMPORT_DEADBAND = "net_import_deadband"
+CONF_HEARTBEAT = "heartbeat"
+CONF_SWING_THRESHOLD = "swing_threshold"
+CONF_SWING_DEBOUNCE = "swing_debounce"
+CONF_ADAPTIVE_INTERVAL = "adaptive_interval"
+CONF_MIN_INTERVAL = "min_interval"
+CONF_MAX_INTERVAL = "max_interval"
+CONF_VOLATILITY_REFERENCE = "volatility_reference"
+CONF_CONSUMPTION_FORMULA = "consumption_formula"
+CONF_PRODUCTION_FORMULA = "production_formula"
+CONF_NET_IMPORT_FORMULA = "net_import_formula"
+CONF_INTEGRATE_ENERGY = "integrate_energy"
+CONF_CONSUMPTION_MAX_AGE = "consumption_max_age"
+CONF_SOLAR_MAX_AGE = "solar_max_age"
+CONF_STALE_POLICY = "stale_policy"
 
-DEFAULT_INTERVAL = 30
+AGGREGATION_MODE_EVENT = "event"
+AGGREGATION_MODE_POLL = "poll"
+
+OVERLAP_POLICY_SKIP = "skip"
+OVERLAP_POLICY_MERGE = "merge"
 
+STALE_POLICY_FLAG = "flag"
+STALE_POLICY_EXCLUDE = "exclude"
+STALE_POLICY_SKIP = "skip"
+
+DEFAULT_INTERVAL = 30
+DEFAULT_AGGREGATION_MODE = AGGREGATION_MODE_EVENT
+DEFAULT_AVERAGING = False
+DEFAULT_AVERAGING_MIN_MAX = False
+# One day of samples at the default interval
+DEFAULT_OUTBOX_SIZE = 2880
+DEFAULT_POST_TIMEOUT = 20
+DEFAULT_OVERLAP_POLICY = OVERLAP_POLICY_SKIP
+DEFAULT_ALIGN_TO_CLOCK = False
+DEFAULT_DEDICATED_CONNECTION = False
+DEFAULT_PRECISION = 3
+DEFAULT_COMPRESS = False
+DEFAULT_CONSUMPTION_DEADBAND = 0.0
+DEFAULT_NET_IMPORT_DEADBAND = 0.0
+DEFAULT_HEARTBEAT = 300
+DEFAULT_SWING_THRESHOLD = 0.0
+DEFAULT_SWING_DEBOUNCE = 5
+DEFAULT_ADAPTIVE_INTERVAL = False
+DEFAULT_MIN_INTERVAL = 15
+DEFAULT_MAX_INTERVAL = 120
+DEFAULT_VOLATILITY_REFERENCE = 0.5
+# Empty formulas keep the built-in sums
+DEFAULT_FORMULA = ""
+DEFAULT_INTEGRATE_ENERGY = False
+# 0 never treats a sensor as stale
+DEFAULT_MAX_AGE = 0
+DEFAULT_STALE_POLICY = STALE_POLICY_FLAG
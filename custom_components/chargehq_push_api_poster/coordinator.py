@@ -1,18 +1,59 @@
 """Coordinator for Energy Poster integration."""
 from __future__ import annotations
 
+import asyncio
+from collections import deque
+import contextlib
+from datetime import datetime
 import logging
 import time
-from datetime import timedelta
 from typing import Any
 
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_state_change_event,
+)
+from homeassistant.helpers.start import async_at_started
+from homeassistant.util import dt as dt_util
 
-from .api import EnergyPosterApiClient
+from .adaptive import VolatilityTracker, adaptive_interval
+from .aggregator import SensorAggregator
+from .api import PostResult, build_site_meters
+from .backfill import HistoryBackfill
+from .const import (
+    AGGREGATION_MODE_EVENT,
+    DEFAULT_HEARTBEAT,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_SWING_DEBOUNCE,
+    DEFAULT_VOLATILITY_REFERENCE,
+    OVERLAP_POLICY_MERGE,
+    OVERLAP_POLICY_SKIP,
+    STALE_POLICY_EXCLUDE,
+    STALE_POLICY_FLAG,
+    STALE_POLICY_SKIP,
+)
+from .energy import EnergyIntegrator
+from .engine import async_get_engine
+from .formula import GROUP_CONSUMPTION, GROUP_SOLAR, MeterFormulas
+from .freshness import FreshnessIndex
+from .metrics import POST_ATTEMPT_HISTORY, LatencyHistogram, PostAttempt
+from .policy import PostingPolicy
+from .target import PostTarget, Sample
 
 _LOGGER = logging.getLogger(__name__)
 
+# Longest wait in seconds after Home Assistant started for the configured
+# sensors to report a state before the first post is made anyway
+SENSOR_READY_TIMEOUT = 60
+
+# Longest time in seconds stopping waits for running posts and the final
+# sample before cancelling them
+SHUTDOWN_TIMEOUT = 10
+
 
 class EnergyPosterCoordinator:
     """Coordinator to handle periodic energy data posting."""
@@ -20,95 +61,972 @@ class EnergyPosterCoordinator:
     def __init__(
         self,
         hass: HomeAssistant,
-        api_client: EnergyPosterApiClient,
+        targets: list[PostTarget],
         consumption_sensors: list[str],
         solar_sensors: list[str],
         interval: int,
         imported_kwh_sensor: str | None = None,
         exported_kwh_sensor: str | None = None,
+        aggregation_mode: str = AGGREGATION_MODE_EVENT,
+        averaging: bool = False,
+        averaging_min_max: bool = False,
+        overlap_policy: str = OVERLAP_POLICY_SKIP,
+        align_to_clock: bool = False,
+        consumption_deadband: float = 0.0,
+        net_import_deadband: float = 0.0,
+        heartbeat: float = DEFAULT_HEARTBEAT,
+        swing_threshold: float = 0.0,
+        swing_debounce: float = DEFAULT_SWING_DEBOUNCE,
+        adaptive: bool = False,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        volatility_reference: float = DEFAULT_VOLATILITY_REFERENCE,
+        consumption_formula: str = "",
+        production_formula: str = "",
+        net_import_formula: str = "",
+        energy_integrator: EnergyIntegrator | None = None,
+        consumption_max_age: float = 0,
+        solar_max_age: float = 0,
+        stale_policy: str = STALE_POLICY_FLAG,
     ) -> None:
         """Initialize the coordinator.
 
         Args:
             hass: The Home Assistant instance.
-            api_client: The API client to post data.
+            targets: The endpoints to post data to.
             consumption_sensors: List of consumption sensor entity IDs.
             solar_sensors: List of solar production sensor entity IDs.
             interval: Interval in seconds between posts.
             imported_kwh_sensor: Optional imported kWh sensor entity ID.
             exported_kwh_sensor: Optional exported kWh sensor entity ID.
+            aggregation_mode: Whether to track sensors from state change events
+                or poll every sensor on each tick.
+            averaging: Whether to post the time-weighted mean power over the
+                interval instead of the instantaneous values.
+            averaging_min_max: Whether to also post the minimum and maximum
+                power seen over the interval when averaging.
+            overlap_policy: What to do with a tick while the previous post to
+                an endpoint is still running: skip it for that endpoint, or
+                merge it into one extra post that runs as soon as the current
+                one finishes.
+            align_to_clock: Whether fixed interval posts happen on multiples
+                of the interval on the wall clock, e.g. at :00 and :30 with a
+                30 second interval.
+            consumption_deadband: Only post when consumption moved by at least
+                this many kW since the last post (0 ignores consumption).
+            net_import_deadband: Only post when net import moved by at least
+                this many kW since the last post (0 ignores net import). With
+                both deadbands at 0 every tick is posted.
+            heartbeat: Post at least this often in seconds, even when the
+                values stayed within the deadbands.
+            swing_threshold: Post immediately, without waiting for the next
+                tick, when net import moves by at least this many kW (0
+                disables; needs the event driven aggregation mode).
+            swing_debounce: Seconds a swing must persist before the
+                immediate post is made.
+            adaptive: Whether to adapt the interval to how much consumption
+                and production fluctuate, instead of posting every interval.
+            min_interval: Shortest adaptive interval in seconds, used while
+                the power readings fluctuate strongly.
+            max_interval: Longest adaptive interval in seconds, used while
+                the power readings are flat.
+            volatility_reference: Standard deviation in kW at which the
+                adaptive interval reaches its minimum.
+            consumption_formula: Formula for consumption_kw, or empty to post
+                the sum of the consumption sensors.
+            production_formula: Formula for production_kw, or empty to post
+                the sum of the solar sensors.
+            net_import_formula: Formula for net_import_kw, or empty to post
+                consumption minus production.
+            energy_integrator: Optional integrator that calculates the
+                imported and exported energy for the kWh sensors that are
+                not configured.
+            consumption_max_age: Seconds without an update after which a
+                consumption sensor is stale (0 disables).
+            solar_max_age: Seconds without an update after which a solar
+                sensor is stale (0 disables).
+            stale_policy: What to do when sensors are stale: only report
+                them, leave them out of the sums, or skip the post.
+
+        Raises:
+            ValueError: If a formula is invalid.
         """
         self._hass = hass
-        self._api_client = api_client
+        self._targets = targets
         self._consumption_sensors = consumption_sensors
         self._solar_sensors = solar_sensors
         self._interval = interval
         self._imported_kwh_sensor = imported_kwh_sensor
         self._exported_kwh_sensor = exported_kwh_sensor
-        self._unsub_timer: Any = None
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._unsub_started: CALLBACK_TYPE | None = None
+        self._startup_task: asyncio.Task[None] | None = None
+        self._backfill_task: asyncio.Task[None] | None = None
+        self._stopped = False
+        # Sensor tracking and timers are shared with the other config entries
+        self._engine = async_get_engine(hass)
+        self._averaging = averaging
+        self._averaging_min_max = averaging_min_max
+        self._window_start = time.monotonic()
+        # Formulas are compiled once here and evaluated on cached values
+        self._formulas: MeterFormulas | None = None
+        if consumption_formula or production_formula or net_import_formula:
+            self._formulas = MeterFormulas(
+                consumption_formula, production_formula, net_import_formula
+            )
+        self._energy = energy_integrator
+        self._group_max_ages = [
+            (consumption_sensors, consumption_max_age),
+            (solar_sensors, solar_max_age),
+        ]
+        self._stale_policy = stale_policy
+        self._freshness: list[FreshnessIndex] = []
+        self._unsub_freshness: CALLBACK_TYPE | None = None
+        self.stale_sensors: list[str] = []
+        self.stale_ticks = 0
+        self._aggregator: SensorAggregator | None = None
+        if aggregation_mode == AGGREGATION_MODE_EVENT:
+            self._aggregator = SensorAggregator(
+                self._engine,
+                consumption_sensors,
+                solar_sensors,
+                imported_kwh_sensor,
+                exported_kwh_sensor,
+                averaging=averaging,
+                formulas=self._formulas,
+            )
+        elif averaging:
+            _LOGGER.warning(
+                "Averaging needs the event driven aggregation mode, "
+                "posting instantaneous values instead"
+            )
+        self._overlap_policy = overlap_policy
+        self._align_to_clock = align_to_clock
+        # Wall clock time of the next tick when aligned to the clock
+        self._tick_wall: float | None = None
+        self.skipped_ticks = 0
+        self._policy = PostingPolicy(
+            consumption_deadband, net_import_deadband, heartbeat, swing_threshold
+        )
+        self._swing_threshold = swing_threshold
+        self._swing_debounce = swing_debounce
+        self._unsub_totals: CALLBACK_TYPE | None = None
+        self._unsub_swing: CALLBACK_TYPE | None = None
+        self.suppressed_posts = 0
+        self.immediate_posts = 0
+        self._adaptive = adaptive
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._volatility_reference = volatility_reference
+        self._consumption_volatility = VolatilityTracker()
+        self._production_volatility = VolatilityTracker()
+        self.effective_interval: float = interval
+        if adaptive:
+            self.effective_interval = min(max(interval, min_interval), max_interval)
+        self._listeners: list[CALLBACK_TYPE] = []
         self.last_posted_data: dict[str, Any] = {}
 
+        # Performance metrics; memory use is fixed
+        self._tick_due: float | None = None
+        self.aggregation_time = LatencyHistogram()
+        self.schedule_drift = LatencyHistogram()
+        self.post_latency = LatencyHistogram()
+        self.post_attempts: deque[PostAttempt] = deque(maxlen=POST_ATTEMPT_HISTORY)
+
+        if self._aggregator is not None:
+            self._aggregator.set_averaging_window(self._averaging_window())
+
     async def async_start(self) -> None:
-        """Start the coordinator and schedule periodic updates."""
+        """Start tracking the sensors.
+
+        Returns without waiting for the network: the first post is made in
+        the background once Home Assistant has started and the sensors are
+        ready, and the periodic posts are scheduled from there.
+        """
         _LOGGER.info(
             "Starting Energy Poster coordinator with %d consumption sensors, "
-            "%d solar sensors, interval=%d seconds",
+            "%d solar sensors, %d endpoints, interval=%d seconds, aggregation=%s",
             len(self._consumption_sensors),
             len(self._solar_sensors),
+            len(self._targets),
             self._interval,
+            "event" if self._aggregator is not None else "poll",
         )
 
+        for target in self._targets:
+            await target.async_start()
+
+        if self._energy is not None:
+            await self._energy.async_load()
+
+        # Seed the running totals and subscribe to sensor state changes, or
+        # resolve the unit conversion factors up front when polling
+        if self._aggregator is not None:
+            self._aggregator.async_start()
+            self._window_start = time.monotonic()
+
+            # Watch for sharp net import swings between ticks, track how
+            # much the readings fluctuate and integrate energy
+            if (
+                self._swing_threshold > 0
+                or self._adaptive
+                or self._energy is not None
+            ):
+                self._unsub_totals = self._aggregator.async_add_listener(
+                    self._async_totals_changed
+                )
+        else:
+            for entity_id in self._consumption_sensors + self._solar_sensors:
+                self._engine.power.read(entity_id)
+            if self._formulas is not None:
+                for entity_id in self._formulas.entity_ids:
+                    self._engine.power.read(entity_id)
+            for entity_id in (self._imported_kwh_sensor, self._exported_kwh_sensor):
+                if entity_id:
+                    self._engine.energy.read(entity_id)
+
+        self._async_start_freshness()
+
+        # Sensors of other integrations are still loading while Home
+        # Assistant starts, so wait for it before the first post
+        self._unsub_started = async_at_started(self._hass, self._async_hass_started)
+
+    @callback
+    def _async_hass_started(self, _: HomeAssistant) -> None:
+        """Start the first post once Home Assistant has started."""
+        self._unsub_started = None
+        self._startup_task = self._hass.async_create_task(self._async_first_post())
+
+    async def _async_first_post(self) -> None:
+        """Wait for the sensors, post, then schedule periodic updates."""
+        try:
+            await self._async_wait_for_sensors()
+        finally:
+            self._startup_task = None
+
         # Perform an initial post
-        await self._async_post_energy_data()
+        self._async_request_post()
 
         # Schedule periodic updates
-        self._unsub_timer = async_track_time_interval(
-            self._hass,
-            self._async_scheduled_post,
-            timedelta(seconds=self._interval),
+        if self._adaptive:
+            self._async_schedule_adaptive_post()
+        else:
+            self._async_align_tick()
+            self._async_schedule_post()
+
+    async def _async_wait_for_sensors(self) -> None:
+        """Wait until every configured sensor has a usable state.
+
+        Gives up after SENSOR_READY_TIMEOUT so that a sensor that was removed
+        or stays unavailable cannot hold up posting.
+        """
+        pending = {
+            entity_id
+            for entity_id in self._configured_entity_ids()
+            if not _is_ready(self._hass.states.get(entity_id))
+        }
+        if not pending:
+            return
+
+        _LOGGER.debug("Waiting for %d sensors before the first post", len(pending))
+        ready = asyncio.Event()
+
+        @callback
+        def async_state_changed(event: Event) -> None:
+            """Tick off a sensor once it has a usable state."""
+            if _is_ready(event.data["new_state"]):
+                pending.discard(event.data["entity_id"])
+                if not pending:
+                    ready.set()
+
+        unsub = async_track_state_change_event(
+            self._hass, list(pending), async_state_changed
         )
+        try:
+            await asyncio.wait_for(ready.wait(), SENSOR_READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            _LOGGER.warning(
+                "Sensors not ready after %d seconds, posting without them: %s",
+                SENSOR_READY_TIMEOUT,
+                ", ".join(sorted(pending)),
+            )
+        finally:
+            unsub()
+
+    def _configured_entity_ids(self) -> set[str]:
+        """Return every sensor the posted data is built from."""
+        entity_ids = set(self._consumption_sensors) | set(self._solar_sensors)
+        if self._formulas is not None:
+            entity_ids |= self._formulas.entity_ids
+        for entity_id in (self._imported_kwh_sensor, self._exported_kwh_sensor):
+            if entity_id:
+                entity_ids.add(entity_id)
+        return entity_ids
 
     async def async_stop(self) -> None:
-        """Stop the coordinator and cancel scheduled updates."""
+        """Stop the coordinator, posting a final sample first.
+
+        Posts that are still running get up to SHUTDOWN_TIMEOUT to finish,
+        then the current sample is posted within what is left of it, so the
+        last sample before a restart or reload is not lost. Endpoints whose
+        post had to be cancelled are not sent the final sample. Whatever is
+        still running at the deadline is cancelled, so no task outlives the
+        coordinator. Stopping again does nothing.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
         _LOGGER.info("Stopping ChargeHQ Push API Poster coordinator")
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+
+        # Only flush a final sample once the periodic posts have begun
+        flush = self._unsub_timer is not None
+
+        if self._unsub_started is not None:
+            self._unsub_started()
+            self._unsub_started = None
+
+        if self._startup_task is not None:
+            await _async_cancel(self._startup_task)
+
+        if self._backfill_task is not None:
+            await _async_cancel(self._backfill_task)
+
         if self._unsub_timer is not None:
             self._unsub_timer()
             self._unsub_timer = None
 
+        if self._unsub_swing is not None:
+            self._unsub_swing()
+            self._unsub_swing = None
+
+        flush_targets = list(self._targets)
+        if post_tasks := {
+            target: target.post_task
+            for target in self._targets
+            if target.post_task is not None
+        }:
+            # Ticks merged into the running posts are covered by the final
+            # sample
+            for target in post_tasks:
+                target.pending_sample = None
+            _, pending = await asyncio.wait(
+                post_tasks.values(), timeout=SHUTDOWN_TIMEOUT
+            )
+            for target, post_task in post_tasks.items():
+                if post_task in pending:
+                    _LOGGER.warning(
+                        "Post to %s still running after %d seconds, cancelling it",
+                        target.name,
+                        SHUTDOWN_TIMEOUT,
+                    )
+                    await _async_cancel(post_task)
+                    flush_targets.remove(target)
+
+        if flush and flush_targets and (sample := self._async_take_sample(True)):
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(
+                        *(
+                            self._async_post_to(target, sample)
+                            for target in flush_targets
+                        )
+                    ),
+                    max(deadline - time.monotonic(), 0),
+                )
+            except asyncio.TimeoutError:
+                _LOGGER.warning(
+                    "Could not post the final sample within %d seconds",
+                    SHUTDOWN_TIMEOUT,
+                )
+
+        if self._unsub_totals is not None:
+            self._unsub_totals()
+            self._unsub_totals = None
+
+        if self._unsub_freshness is not None:
+            self._unsub_freshness()
+            self._unsub_freshness = None
+
+        if self._aggregator is not None:
+            self._aggregator.async_stop()
+
+        if self._energy is not None:
+            self._energy.async_update(time.monotonic())
+            await self._energy.async_save()
+
+        for target in self._targets:
+            await target.async_stop()
+
+    @callback
+    def async_set_interval(self, interval: int) -> None:
+        """Change the post interval without interrupting the posts.
+
+        The next post is rescheduled on the new interval; in adaptive mode
+        the interval only sets the starting point and nothing changes.
+
+        Args:
+            interval: Interval in seconds between posts.
+        """
+        self._interval = interval
+        if self._adaptive:
+            return
+
+        self.effective_interval = interval
+        if self._aggregator is not None:
+            self._aggregator.set_averaging_window(self._averaging_window())
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._async_align_tick()
+            self._async_schedule_post()
+        self._async_notify_listeners()
+
+    @callback
+    def async_set_sensors(
+        self,
+        consumption_sensors: list[str],
+        solar_sensors: list[str],
+        imported_kwh_sensor: str | None,
+        exported_kwh_sensor: str | None,
+    ) -> None:
+        """Switch to other sensors without interrupting the posts.
+
+        Args:
+            consumption_sensors: List of consumption sensor entity IDs.
+            solar_sensors: List of solar production sensor entity IDs.
+            imported_kwh_sensor: Optional imported kWh sensor entity ID.
+            exported_kwh_sensor: Optional exported kWh sensor entity ID.
+        """
+        self._consumption_sensors = consumption_sensors
+        self._solar_sensors = solar_sensors
+        self._imported_kwh_sensor = imported_kwh_sensor
+        self._exported_kwh_sensor = exported_kwh_sensor
+        self._group_max_ages = [
+            (entity_ids, max_age)
+            for entity_ids, (_, max_age) in zip(
+                (consumption_sensors, solar_sensors), self._group_max_ages
+            )
+        ]
+
+        if self._aggregator is not None:
+            old_aggregator = self._aggregator
+            self._aggregator = SensorAggregator(
+                self._engine,
+                consumption_sensors,
+                solar_sensors,
+                imported_kwh_sensor,
+                exported_kwh_sensor,
+                averaging=self._averaging,
+                formulas=self._formulas,
+            )
+            self._aggregator.set_averaging_window(self._averaging_window())
+            # Subscribe before unsubscribing, so sensors kept in the new set
+            # keep their shared subscription and cached value
+            self._aggregator.async_start()
+            old_aggregator.async_stop()
+            if self._unsub_totals is not None:
+                self._unsub_totals()
+                self._unsub_totals = self._aggregator.async_add_listener(
+                    self._async_totals_changed
+                )
+        else:
+            for entity_id in consumption_sensors + solar_sensors:
+                self._engine.power.read(entity_id)
+            for entity_id in (imported_kwh_sensor, exported_kwh_sensor):
+                if entity_id:
+                    self._engine.energy.read(entity_id)
+
+        if self._unsub_freshness is not None:
+            self._unsub_freshness()
+            self._unsub_freshness = None
+        self._async_start_freshness()
+
+    @callback
+    def async_set_posting_policy(
+        self, consumption_deadband: float, net_import_deadband: float, heartbeat: float
+    ) -> None:
+        """Change the deadbands and heartbeat; the next tick always posts.
+
+        Args:
+            consumption_deadband: Minimum change in consumption (kW) to post.
+            net_import_deadband: Minimum change in net import (kW) to post.
+            heartbeat: Maximum seconds between posts.
+        """
+        self._policy = PostingPolicy(
+            consumption_deadband, net_import_deadband, heartbeat, self._swing_threshold
+        )
+        if self._aggregator is not None:
+            self._aggregator.set_averaging_window(self._averaging_window())
+
+    def _averaging_window(self) -> float:
+        """Return the longest time in seconds one post can average over.
+
+        Suppressed ticks keep the window open, so the heartbeat bounds it
+        when a deadband is set.
+        """
+        window = float(self._interval)
+        if self._adaptive:
+            window = max(window, self._max_interval)
+        if self._policy.enabled:
+            window = max(window, self._policy.heartbeat)
+        return window
+
+    @callback
+    def async_start_backfill(self, start: datetime, end: datetime) -> None:
+        """Post the samples of a past time range from the recorder.
+
+        The backfill runs in the background next to the live posts.
+
+        Args:
+            start: Start of the range.
+            end: End of the range.
+
+        Raises:
+            HomeAssistantError: If a backfill is already running.
+        """
+        if self._backfill_task is not None:
+            raise HomeAssistantError("A backfill is already running")
+
+        backfill = HistoryBackfill(
+            self._hass,
+            self._targets,
+            self._interval,
+            self._consumption_sensors,
+            self._solar_sensors,
+            self._imported_kwh_sensor,
+            self._exported_kwh_sensor,
+            self._formulas,
+        )
+        self._backfill_task = self._hass.async_create_task(
+            self._async_run_backfill(backfill, start, end)
+        )
+
+    async def _async_run_backfill(
+        self, backfill: HistoryBackfill, start: datetime, end: datetime
+    ) -> None:
+        """Run a backfill and forget it once it finished."""
+        try:
+            await backfill.async_run(start, end)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error backfilling samples")
+        finally:
+            self._backfill_task = None
+
+    @property
+    def targets(self) -> list[PostTarget]:
+        """Return the endpoints data is posted to."""
+        return self._targets
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for completed posts and changes of the effective interval.
+
+        Args:
+            update_callback: Called after each post attempt completes, and
+                when the adaptive interval changes.
+
+        Returns:
+            A callback that removes the listener.
+        """
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the listener."""
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_notify_listeners(self) -> None:
+        """Notify listeners that a post completed or the interval changed."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def _async_start_freshness(self) -> None:
+        """Index when each sensor last updated, per group with a max age."""
+        self._freshness = []
+        for entity_ids, max_age in self._group_max_ages:
+            if max_age <= 0:
+                continue
+            index = FreshnessIndex(max_age)
+            for entity_id in entity_ids:
+                self._engine.power.read(entity_id)
+                index.add(entity_id, self._engine.power.updated(entity_id))
+            self._freshness.append(index)
+
+        if self._freshness and self._aggregator is not None:
+            entity_ids = list(
+                {entity_id for index in self._freshness for entity_id in index.entity_ids}
+            )
+            self._unsub_freshness = self._engine.power.async_subscribe(
+                entity_ids, self._async_sensor_updated
+            )
+
     @callback
-    def _async_scheduled_post(self, _: Any) -> None:
-        """Handle scheduled post (callback wrapper)."""
-        self._hass.async_create_task(self._async_post_energy_data())
+    def _async_sensor_updated(self, entity_id: str, value: float | None) -> None:
+        """Record the update of a sensor in the freshness indexes."""
+        updated = self._engine.power.updated(entity_id)
+        for index in self._freshness:
+            index.touch(entity_id, updated)
+
+    @callback
+    def _async_check_freshness(self) -> set[str]:
+        """Find the stale sensors, leaving them out of the sums if configured.
+
+        Returns:
+            The stale sensors.
+        """
+        if self._aggregator is None:
+            # Without state change events, pick up updates from the states
+            read = self._engine.power.read
+            updated = self._engine.power.updated
+            for index in self._freshness:
+                for entity_id in index.entity_ids:
+                    read(entity_id)
+                    index.touch(entity_id, updated(entity_id))
+
+        now = time.time()
+        stale: set[str] = set()
+        for index in self._freshness:
+            stale |= index.expire(now, self._engine.power.reported)
+
+        if self._stale_policy == STALE_POLICY_EXCLUDE and self._aggregator is not None:
+            for entity_id in stale:
+                self._aggregator.async_exclude(entity_id)
+            # Sensors that only reported unchanged values since being left
+            # out had no state change event to bring them back
+            for entity_id in set(self.stale_sensors) - stale:
+                self._aggregator.async_include(entity_id)
+
+        if stale or self.stale_sensors:
+            self.stale_sensors = sorted(stale)
+        return stale
+
+    @callback
+    def _async_totals_changed(self) -> None:
+        """Handle a change of the power totals."""
+        assert self._aggregator is not None
+        consumption_kw = self._aggregator.consumption_kw
+        production_kw = self._aggregator.production_kw
+
+        now = time.monotonic()
+        if self._adaptive:
+            self._consumption_volatility.add(now, consumption_kw)
+            self._production_volatility.add(now, production_kw)
+
+        if self._energy is not None:
+            self._energy.async_update(now, self._aggregator.net_import_kw)
+
+        # Start debouncing an immediate post when net import swings
+        if self._swing_threshold <= 0 or self._unsub_swing is not None:
+            return
+
+        if self._policy.is_swing(self._aggregator.net_import_kw):
+            self._unsub_swing = async_call_later(
+                self._hass, self._swing_debounce, self._async_swing_settled
+            )
+
+    @callback
+    def _async_swing_settled(self, _: Any) -> None:
+        """Post immediately if the net import swing persisted."""
+        assert self._aggregator is not None
+        self._unsub_swing = None
+
+        net_import_kw = self._aggregator.net_import_kw
+        if self._policy.is_swing(net_import_kw):
+            _LOGGER.debug(
+                "Net import swung to %.2f kW, posting immediately", net_import_kw
+            )
+            self.immediate_posts += 1
+            self._async_request_post()
+
+    @callback
+    def _async_align_tick(self) -> None:
+        """Set the next tick to the next multiple of the interval.
+
+        Multiples are taken on the wall clock when aligning to it, otherwise
+        on the monotonic clock. Either way entries with the same interval
+        share a timer wakeup.
+        """
+        if not self._align_to_clock:
+            self._tick_due = (time.monotonic() // self._interval + 1) * self._interval
+            return
+
+        wall_now = time.time()
+        self._tick_wall = (wall_now // self._interval + 1) * self._interval
+        self._tick_due = time.monotonic() + self._tick_wall - wall_now
+
+    @callback
+    def _async_schedule_post(self) -> None:
+        """Schedule the next fixed interval post."""
+        assert self._tick_due is not None
+        # Ticks aligned to the clock must not run early to share a wakeup
+        self._unsub_timer = self._engine.scheduler.async_schedule_at(
+            self._tick_due,
+            self._async_scheduled_post,
+            coalesce=not self._align_to_clock,
+        )
+
+    @callback
+    def _async_scheduled_post(self) -> None:
+        """Handle scheduled post."""
+        assert self._tick_due is not None
+        self._async_record_drift()
+
+        now = time.monotonic()
+        if self._tick_wall is not None:
+            # Step along the wall clock, mapping each boundary to the
+            # monotonic clock afresh, so the wall clock being slewed by NTP
+            # does not build up as drift
+            wall_now = time.time()
+            self._tick_wall += self._interval
+            if not wall_now < self._tick_wall <= wall_now + self._interval:
+                # Ticks were missed or the wall clock was stepped
+                self._tick_wall = (wall_now // self._interval + 1) * self._interval
+            self._tick_due = now + self._tick_wall - wall_now
+        else:
+            # Ticks can run slightly early when coalesced; skip ticks that
+            # were missed entirely, e.g. after a stall
+            self._tick_due += self._interval
+            while self._tick_due <= now:
+                self._tick_due += self._interval
+        self._async_schedule_post()
+        self._async_request_post()
+
+    @callback
+    def _async_schedule_adaptive_post(self) -> None:
+        """Schedule the next post after the effective interval."""
+        self._tick_due = time.monotonic() + self.effective_interval
+        self._unsub_timer = self._engine.scheduler.async_schedule_at(
+            self._tick_due, self._async_adaptive_post
+        )
+
+    @callback
+    def _async_adaptive_post(self) -> None:
+        """Post, then pick the next interval from the recent volatility."""
+        self._async_record_drift()
+        now = time.monotonic()
+        std_dev = max(
+            self._consumption_volatility.std_dev(now),
+            self._production_volatility.std_dev(now),
+        )
+        interval = round(
+            adaptive_interval(
+                std_dev,
+                self._min_interval,
+                self._max_interval,
+                self._volatility_reference,
+            )
+        )
+        if interval != self.effective_interval:
+            _LOGGER.debug(
+                "Power readings fluctuate by %.3f kW, posting every %d seconds",
+                std_dev,
+                interval,
+            )
+            self.effective_interval = interval
+            self._async_notify_listeners()
+
+        self._async_schedule_adaptive_post()
+        self._async_request_post()
+
+    @callback
+    def _async_record_drift(self) -> None:
+        """Record how late the current tick fired."""
+        if self._tick_due is not None:
+            self.schedule_drift.record((time.monotonic() - self._tick_due) * 1000)
+
+    @callback
+    def _async_request_post(self) -> None:
+        """Take a sample and post it to every endpoint.
+
+        Each endpoint runs one post at a time, so a slow endpoint only holds
+        up its own posts. While an endpoint is still posting, the tick is
+        skipped for it, or with the merge policy its sample is posted there
+        as soon as the running post finishes.
+        """
+        if self._stopped:
+            return
+
+        merge = self._overlap_policy == OVERLAP_POLICY_MERGE
+        for target in self._targets:
+            if target.post_task is not None:
+                target.skipped_ticks += 1
+                self.skipped_ticks += 1
+                _LOGGER.debug(
+                    "Previous post to %s still running, %s tick "
+                    "(%d overlapping ticks so far)",
+                    target.name,
+                    "merging" if merge else "skipping",
+                    target.skipped_ticks,
+                )
+
+        if not merge and all(target.post_task for target in self._targets):
+            # No endpoint can take the sample
+            return
+
+        if (sample := self._async_take_sample()) is None:
+            return
+
+        for target in self._targets:
+            if target.post_task is None:
+                target.post_task = self._hass.async_create_task(
+                    self._async_run_posts(target, sample)
+                )
+            elif merge:
+                target.pending_sample = sample
+
+    async def _async_run_posts(self, target: PostTarget, sample: Sample) -> None:
+        """Post to an endpoint, then post the latest sample merged meanwhile."""
+        next_sample: Sample | None = sample
+        try:
+            while next_sample is not None:
+                await self._async_post_to(target, next_sample)
+                next_sample, target.pending_sample = target.pending_sample, None
+        finally:
+            target.post_task = None
+
+    async def _async_post_to(self, target: PostTarget, sample: Sample) -> None:
+        """Post a sample to one endpoint and record the attempt."""
+        timestamp_ms, site_meters = sample
+        result = await target.async_post(timestamp_ms, site_meters)
+
+        if result is not PostResult.SKIPPED:
+            self.post_latency.record(target.last_duration_ms)
+        self.post_attempts.append(
+            PostAttempt(
+                time=dt_util.utcnow().isoformat(),
+                target=target.name,
+                result=result.value,
+                duration_ms=round(target.last_duration_ms, 2),
+                payload_bytes=target.api_client.last_payload_bytes,
+            )
+        )
 
-    async def _async_post_energy_data(self) -> None:
-        """Aggregate sensor data and post to the API."""
-        consumption_kw = self._get_sensor_sum(self._consumption_sensors)
-        production_kw = self._get_sensor_sum(self._solar_sensors)
-        net_import_kw = consumption_kw - production_kw
+        # Store data for display sensor; a slow endpoint may finish an older
+        # sample after a newer one
+        if timestamp_ms >= self.last_posted_data.get("timestamp_ms", 0):
+            self.last_posted_data = {"timestamp_ms": timestamp_ms, **site_meters}
+        self._async_notify_listeners()
+
+    @callback
+    def _async_take_sample(self, force: bool = False) -> Sample | None:
+        """Aggregate the sensor data into a sample to post.
+
+        Args:
+            force: Whether to post the sample even when it is within the
+                deadbands, e.g. as the final sample before stopping.
+
+        Returns:
+            The sample, or None if it should not be posted.
+        """
+        aggregation_start = time.perf_counter()
+        # Timestamp the sample when it is taken, not after aggregating
         timestamp_ms = int(time.time() * 1000)
 
-        # Get optional imported/exported kWh values
-        imported_kwh = None
-        if self._imported_kwh_sensor:
-            imported_kwh = self._get_sensor_value(self._imported_kwh_sensor)
-
-        exported_kwh = None
-        if self._exported_kwh_sensor:
-            exported_kwh = self._get_sensor_value(self._exported_kwh_sensor)
-
-        # Store data for display sensor
-        self.last_posted_data = {
-            "timestamp_ms": timestamp_ms,
-            "consumption_kw": consumption_kw,
-            "production_kw": production_kw,
-            "net_import_kw": net_import_kw,
-        }
+        stale: set[str] = set()
+        if self._freshness:
+            stale = self._async_check_freshness()
+            if stale:
+                self.stale_ticks += 1
+                if self._stale_policy == STALE_POLICY_SKIP:
+                    _LOGGER.debug(
+                        "Not posting, %d sensors are stale: %s",
+                        len(stale),
+                        ", ".join(self.stale_sensors),
+                    )
+                    return None
+
+        if self._aggregator is not None:
+            # Running totals are kept up to date from state change events
+            consumption_kw = self._aggregator.consumption_kw
+            production_kw = self._aggregator.production_kw
+            net_import_kw = self._aggregator.net_import_kw
+            imported_kwh = self._aggregator.imported_kwh
+            exported_kwh = self._aggregator.exported_kwh
+        else:
+            excluded = stale if self._stale_policy == STALE_POLICY_EXCLUDE else None
+            consumption_kw = self._get_sensor_sum(self._consumption_sensors, excluded)
+            production_kw = self._get_sensor_sum(self._solar_sensors, excluded)
+            if self._formulas is not None:
+                consumption_kw, production_kw, net_import_kw = self._evaluate_formulas(
+                    consumption_kw, production_kw
+                )
+            else:
+                net_import_kw = consumption_kw - production_kw
+
+            # Get optional imported/exported kWh values
+            imported_kwh = None
+            if self._imported_kwh_sensor:
+                imported_kwh = self._get_sensor_value(self._imported_kwh_sensor)
+
+            exported_kwh = None
+            if self._exported_kwh_sensor:
+                exported_kwh = self._get_sensor_value(self._exported_kwh_sensor)
+
+            # Without state change events each tick is the only sample
+            if self._adaptive:
+                now = time.monotonic()
+                self._consumption_volatility.add(now, consumption_kw)
+                self._production_volatility.add(now, production_kw)
 
-        if imported_kwh is not None:
-            self.last_posted_data["imported_kwh"] = imported_kwh
+        # Close the energy integral up to now with the instantaneous reading
+        if self._energy is not None:
+            self._energy.async_update(time.monotonic(), net_import_kw)
+            if not self._imported_kwh_sensor:
+                imported_kwh = self._energy.imported_kwh
+            if not self._exported_kwh_sensor:
+                exported_kwh = self._energy.exported_kwh
 
-        if exported_kwh is not None:
-            self.last_posted_data["exported_kwh"] = exported_kwh
+        # Replace the instantaneous power values with the time-weighted
+        # means over the interval since the previous post
+        extra_meters: dict[str, float] = {}
+        window_end = time.monotonic()
+        if self._averaging and self._aggregator is not None:
+            stats = self._aggregator.window_stats(self._window_start, window_end)
+
+            if "consumption_kw" in stats:
+                consumption_kw = stats["consumption_kw"].mean
+            if "production_kw" in stats:
+                production_kw = stats["production_kw"].mean
+            if "net_import_kw" in stats:
+                net_import_kw = stats["net_import_kw"].mean
+
+            if self._averaging_min_max:
+                for field, field_stats in stats.items():
+                    name = field.removesuffix("_kw")
+                    extra_meters[f"{name}_min_kw"] = field_stats.minimum
+                    extra_meters[f"{name}_max_kw"] = field_stats.maximum
+
+        self.aggregation_time.record((time.perf_counter() - aggregation_start) * 1000)
+
+        # Skip samples that barely differ from the last post
+        now = time.monotonic()
+        if not force and not self._policy.should_post(
+            consumption_kw, net_import_kw, now
+        ):
+            self.suppressed_posts += 1
+            _LOGGER.debug(
+                "Energy data within deadbands, not posting "
+                "(consumption=%.2f kW, net_import=%.2f kW)",
+                consumption_kw,
+                net_import_kw,
+            )
+            return None
+        self._policy.record_post(consumption_kw, net_import_kw, now)
+        # The next mean covers the time since this post
+        self._window_start = window_end
+
+        site_meters = build_site_meters(
+            consumption_kw=consumption_kw,
+            production_kw=production_kw,
+            net_import_kw=net_import_kw,
+            imported_kwh=imported_kwh,
+            exported_kwh=exported_kwh,
+            extra_meters=extra_meters,
+        )
 
         _LOGGER.debug(
             "Aggregated energy data: consumption=%.2f kW, production=%.2f kW, "
@@ -118,69 +1036,50 @@ class EnergyPosterCoordinator:
             net_import_kw,
             timestamp_ms,
         )
+        return timestamp_ms, site_meters
 
-        await self._api_client.post_energy_data(
-            timestamp_ms=timestamp_ms,
-            consumption_kw=consumption_kw,
-            production_kw=production_kw,
-            net_import_kw=net_import_kw,
-            imported_kwh=imported_kwh,
-            exported_kwh=exported_kwh,
-        )
-
-    def _get_sensor_sum(self, entity_ids: list[str]) -> float:
+    def _get_sensor_sum(
+        self, entity_ids: list[str], excluded: set[str] | None = None
+    ) -> float:
         """Sum the values of multiple sensors and convert to kW.
 
         Args:
             entity_ids: List of sensor entity IDs to sum.
+            excluded: Sensors to leave out of the sum.
 
         Returns:
             The sum of all sensor values in kW. Non-numeric or missing states are treated as 0.0.
         """
         total = 0.0
+        read = self._engine.power.read
         for entity_id in entity_ids:
-            state = self._hass.states.get(entity_id)
-            if state is None:
-                _LOGGER.warning("Sensor %s not found, treating as 0.0", entity_id)
-                continue
-
-            try:
-                value = float(state.state)
-
-                # Convert based on unit of measurement
-                # Home Assistant official units: UnitOfPower.WATT = "W", UnitOfPower.KILO_WATT = "kW"
-                unit = state.attributes.get("unit_of_measurement", "")
-                if unit == "W":
-                    # Convert watts to kilowatts
-                    value = value / 1000.0
-                    _LOGGER.debug(
-                        "Sensor %s is in watts, converted %.2f W to %.2f kW",
-                        entity_id,
-                        float(state.state),
-                        value,
-                    )
-                elif unit == "kW":
-                    # Already in kilowatts
-                    _LOGGER.debug("Sensor %s is already in kW: %.2f", entity_id, value)
-                else:
-                    # Assume kW if no unit specified or unknown unit
-                    _LOGGER.warning(
-                        "Sensor %s has unknown or missing unit '%s', assuming kW",
-                        entity_id,
-                        unit,
-                    )
-
+            value = read(entity_id)
+            if value is not None and not (excluded and entity_id in excluded):
                 total += value
-            except (ValueError, TypeError):
-                _LOGGER.warning(
-                    "Sensor %s has non-numeric state '%s', treating as 0.0",
-                    entity_id,
-                    state.state,
-                )
-                continue
 
         return total
 
+    def _evaluate_formulas(
+        self, consumption_kw: float, production_kw: float
+    ) -> tuple[float, float, float]:
+        """Evaluate the formulas on polled values.
+
+        Args:
+            consumption_kw: The sum of the consumption sensors.
+            production_kw: The sum of the solar sensors.
+
+        Returns:
+            Consumption, production and net import in kW.
+        """
+        assert self._formulas is not None
+        values = {GROUP_CONSUMPTION: consumption_kw, GROUP_SOLAR: production_kw}
+        read = self._engine.power.read
+        for entity_id in self._formulas.entity_ids:
+            value = read(entity_id)
+            if value is not None:
+                values[entity_id] = value
+        return self._formulas.evaluate(values)
+
     def _get_sensor_value(self, entity_id: str) -> float | None:
         """Get the value of a single sensor and convert to kWh if needed.
 
@@ -190,43 +1089,16 @@ class EnergyPosterCoordinator:
         Returns:
             The sensor value in kWh or None if unavailable or non-numeric.
         """
-        state = self._hass.states.get(entity_id)
-        if state is None:
-            _LOGGER.warning("Sensor %s not found", entity_id)
-            return None
+        return self._engine.energy.read(entity_id)
 
-        try:
-            value = float(state.state)
-
-            # Convert based on unit of measurement
-            # Home Assistant official units: UnitOfEnergy.WATT_HOUR = "Wh", UnitOfEnergy.KILO_WATT_HOUR = "kWh"
-            unit = state.attributes.get("unit_of_measurement", "")
-            if unit == "Wh":
-                # Convert watt-hours to kilowatt-hours
-                value = value / 1000.0
-                _LOGGER.debug(
-                    "Sensor %s is in Wh, converted %.2f Wh to %.2f kWh",
-                    entity_id,
-                    float(state.state),
-                    value,
-                )
-            elif unit == "kWh":
-                # Already in kilowatt-hours
-                _LOGGER.debug("Sensor %s is already in kWh: %.2f", entity_id, value)
-            else:
-                # Assume kWh if no unit specified or unknown unit
-                _LOGGER.warning(
-                    "Sensor %s has unknown or missing unit '%s', assuming kWh",
-                    entity_id,
-                    unit,
-                )
 
-            return value
-        except (ValueError, TypeError):
-            _LOGGER.warning(
-                "Sensor %s has non-numeric state '%s'",
-                entity_id,
-                state.state,
-            )
-            return None
+def _is_ready(state: State | None) -> bool:
+    """Return whether a sensor state can be posted."""
+    return state is not None and state.state not in (STATE_UNAVAILABLE, STATE_UNKNOWN)
+
 
+async def _async_cancel(task: asyncio.Task[Any]) -> None:
+    """Cancel a task and wait for it to finish."""
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
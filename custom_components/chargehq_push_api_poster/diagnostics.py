@@ -0,0 +1,69 @@
+"""Diagnostics support for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_ADDITIONAL_ENDPOINTS, CONF_API_KEY, DOMAIN
+from .coordinator import EnergyPosterCoordinator
+from .engine import async_get_engine
+
+# The additional endpoints option holds API keys as well as URLs
+TO_REDACT = {CONF_API_KEY, CONF_ADDITIONAL_ENDPOINTS}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: EnergyPosterCoordinator = hass.data[DOMAIN][entry.entry_id]
+    engine = async_get_engine(hass)
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "coordinator": {
+            "effective_interval": coordinator.effective_interval,
+            "skipped_ticks": coordinator.skipped_ticks,
+            "suppressed_posts": coordinator.suppressed_posts,
+            "immediate_posts": coordinator.immediate_posts,
+            "stale_ticks": coordinator.stale_ticks,
+            "stale_sensors": coordinator.stale_sensors,
+            "aggregation_time": coordinator.aggregation_time.as_dict(),
+            "schedule_drift": coordinator.schedule_drift.as_dict(),
+            "post_latency": coordinator.post_latency.as_dict(),
+        },
+        "engine": {
+            "power_sensors": engine.power.entity_count,
+            "energy_sensors": engine.energy.entity_count,
+            "scheduled_ticks": len(engine.scheduler),
+            "timer_wakeups": engine.scheduler.wakeups,
+            "sensor_issues": engine.issues.as_list(),
+        },
+        "targets": [
+            {
+                "name": target.name,
+                "successful_posts": target.successful_posts,
+                "failed_posts": target.failed_posts,
+                "timed_out_posts": target.timed_out_posts,
+                "skipped_ticks": target.skipped_ticks,
+                "last_result": (
+                    target.last_result.value if target.last_result else None
+                ),
+                "circuit_state": target.api_client.circuit_breaker.state,
+                "consecutive_failures": (
+                    target.api_client.circuit_breaker.consecutive_failures
+                ),
+                "payload_bytes": target.api_client.payload_bytes,
+                "queued_samples": len(target.outbox) if target.outbox else 0,
+                "evicted_samples": target.outbox.evicted if target.outbox else 0,
+                "latency": target.latency.as_dict(),
+            }
+            for target in coordinator.targets
+        ],
+        "post_attempts": [
+            attempt._asdict() for attempt in coordinator.post_attempts
+        ],
+    }
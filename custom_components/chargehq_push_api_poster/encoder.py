@@ -0,0 +1,81 @@
+"""Payload encoding for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+import gzip
+import json
+import math
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Compression level used for gzip bodies. Payloads are tiny, so higher levels
+# only cost CPU without making them meaningfully smaller.
+GZIP_LEVEL = 6
+
+
+def _dumps(value: Any) -> bytes:
+    """Serialise a value to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+class PayloadEncoder:
+    """Encode posts to request bodies.
+
+    The parts of the payload that never change (the envelope and the API
+    key) are encoded once when the encoder is created; each post only
+    rounds and serialises the site meter values.
+    """
+
+    def __init__(self, api_key: str, precision: int, compress: bool = False) -> None:
+        """Initialise the encoder.
+
+        Args:
+            api_key: The API key for authorisation.
+            precision: Number of decimal places values are rounded to.
+            compress: Whether to gzip the body.
+        """
+        self._precision = precision
+        self._compress = compress
+        self._prefix = b'{"apiKey":' + _dumps(api_key) + b',"tsms":'
+        self._separator = b',"siteMeters":'
+
+        self.headers = {"Content-Type": "application/json"}
+        if compress:
+            self.headers["Content-Encoding"] = "gzip"
+
+    def encode(self, timestamp_ms: int, site_meters: dict[str, Any]) -> bytes:
+        """Encode a post to a request body.
+
+        Args:
+            timestamp_ms: Timestamp in milliseconds.
+            site_meters: The site meter values keyed by API field name.
+
+        Returns:
+            The request body.
+        """
+        precision = self._precision
+        rounded = {
+            key: round(value, precision)
+            for key, value in site_meters.items()
+            # NaN and infinity can't be represented in JSON
+            if value is not None and math.isfinite(value)
+        }
+
+        body = b"".join(
+            (
+                self._prefix,
+                str(int(timestamp_ms)).encode(),
+                self._separator,
+                _dumps(rounded),
+                b"}",
+            )
+        )
+
+        if self._compress:
+            return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        return body
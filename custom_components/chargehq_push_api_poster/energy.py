@@ -0,0 +1,100 @@
+"""Built-in energy integration for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+# Seconds between writes of the running totals. A crash loses at most this
+# much integrated energy.
+SAVE_INTERVAL = 60
+
+SECONDS_PER_HOUR = 3600
+
+
+class EnergyIntegrator:
+    """Integrate net import power into imported and exported energy totals.
+
+    Power is treated as a step function, like the averaging buffers: each
+    reading holds until the next. Every reading closes one rectangle and
+    adds it to the imported or exported total, so an update is O(1). The
+    totals are kept in a Home Assistant Store so they survive restarts; time
+    Home Assistant was not running is not counted.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialise the integrator.
+
+        Args:
+            hass: The Home Assistant instance.
+            entry_id: The config entry the totals belong to.
+        """
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.energy.{entry_id}"
+        )
+        self.imported_kwh = 0.0
+        self.exported_kwh = 0.0
+        self._last_time: float | None = None
+        self._last_kw = 0.0
+        self._save_scheduled = False
+
+    async def async_load(self) -> None:
+        """Load the totals from disk."""
+        data = await self._store.async_load()
+        if not data:
+            return
+
+        self.imported_kwh = data.get("imported_kwh", 0.0)
+        self.exported_kwh = data.get("exported_kwh", 0.0)
+        _LOGGER.debug(
+            "Loaded energy totals: imported=%.3f kWh, exported=%.3f kWh",
+            self.imported_kwh,
+            self.exported_kwh,
+        )
+
+    async def async_save(self) -> None:
+        """Write the totals to disk now."""
+        await self._store.async_save(self._data_to_save())
+
+    async def async_remove(self) -> None:
+        """Remove the totals from disk."""
+        await self._store.async_remove()
+
+    @callback
+    def async_update(self, now: float, net_import_kw: float | None = None) -> None:
+        """Add the energy since the previous reading and start a new one.
+
+        Args:
+            now: Monotonic time of the reading in seconds.
+            net_import_kw: Net import in kW, negative while exporting, or
+                None to keep the previous reading.
+        """
+        if self._last_time is not None:
+            energy_kwh = self._last_kw * (now - self._last_time) / SECONDS_PER_HOUR
+            if energy_kwh > 0:
+                self.imported_kwh += energy_kwh
+            else:
+                self.exported_kwh -= energy_kwh
+        self._last_time = now
+        if net_import_kw is not None:
+            self._last_kw = net_import_kw
+
+        # Store.async_delay_save pushes the write back on every call, so
+        # with frequent readings it would never write. Only schedule a write
+        # when none is pending; it saves the totals as they are by then.
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            self._store.async_delay_save(self._data_to_save, SAVE_INTERVAL)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to store."""
+        self._save_scheduled = False
+        return {"imported_kwh": self.imported_kwh, "exported_kwh": self.exported_kwh}
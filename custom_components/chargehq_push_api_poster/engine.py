@@ -0,0 +1,330 @@
+"""Shared sampling engine for ChargeHQ Push API Poster.
+
+Config entries often watch the same meters. The engine is shared by every
+entry of a Home Assistant instance: each distinct sensor is subscribed to
+and converted once, whatever the number of entries that use it, and the
+post timers of all entries run from a single timer.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+import heapq
+import itertools
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
+
+from .const import DOMAIN
+from .freshness import last_reported
+from .issues import SensorIssueRegistry
+from .units import ENERGY_UNIT_FACTORS, POWER_UNIT_FACTORS, UnitConversionCache
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_ENGINE = f"{DOMAIN}_engine"
+
+# Ticks due within this many seconds of each other run from one timer wakeup
+COALESCE_WINDOW = 0.5
+
+ValueCallback = Callable[[str, "float | None"], None]
+
+
+class SharedEntityTracker:
+    """Track sensors once and fan converted values out to subscribers.
+
+    Each entity has a single state change subscription and its state is
+    converted once per change, however many subscribers share it. Entities
+    are unsubscribed when their last subscriber goes away.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        factors: dict[str, float],
+        target_unit: str,
+        issues: SensorIssueRegistry | None = None,
+    ) -> None:
+        """Initialise the tracker.
+
+        Args:
+            hass: The Home Assistant instance.
+            factors: Mapping of unit of measurement to conversion factor.
+            target_unit: The unit values are converted to.
+            issues: Registry that sensor problems are reported to.
+        """
+        self._hass = hass
+        self._units = UnitConversionCache(factors, target_unit, issues)
+        self._subscribers: dict[str, list[ValueCallback]] = {}
+        self._unsub_state: dict[str, CALLBACK_TYPE] = {}
+        self._values: dict[str, float | None] = {}
+        # Timestamps the states the values came from were last reported
+        self._updated: dict[str, float | None] = {}
+        # State each cached value was converted from, for reads of
+        # entities nobody subscribed to
+        self._read_states: dict[str, State | None] = {}
+
+    @property
+    def entity_count(self) -> int:
+        """Return the number of subscribed entities."""
+        return len(self._subscribers)
+
+    def value(self, entity_id: str) -> float | None:
+        """Return the current value of a subscribed entity."""
+        return self._values.get(entity_id)
+
+    def updated(self, entity_id: str) -> float | None:
+        """Return when the state behind an entity's value was last reported.
+
+        Only known for subscribed entities and entities that were read.
+        """
+        return self._updated.get(entity_id)
+
+    def reported(self, entity_id: str) -> float | None:
+        """Return when an entity's current state was last reported.
+
+        Read from the state machine, as reporting an unchanged value fires no
+        state change event.
+        """
+        return last_reported(self._hass.states.get(entity_id))
+
+    def read(self, entity_id: str) -> float | None:
+        """Return the current value of any entity.
+
+        Subscribed entities are served from the cache. Other entities are
+        converted again only when their state object changed since the last
+        read, so entries polling the same sensor share the work.
+
+        Args:
+            entity_id: The sensor entity ID.
+        """
+        if entity_id in self._subscribers:
+            return self._values[entity_id]
+
+        state = self._hass.states.get(entity_id)
+        if entity_id in self._read_states and self._read_states[entity_id] is state:
+            return self._values[entity_id]
+
+        value = self._units.convert(entity_id, state)
+        self._read_states[entity_id] = state
+        self._values[entity_id] = value
+        self._updated[entity_id] = last_reported(state)
+        return value
+
+    @callback
+    def async_subscribe(
+        self, entity_ids: list[str], value_callback: ValueCallback
+    ) -> CALLBACK_TYPE:
+        """Call back with the converted value whenever an entity changes.
+
+        Args:
+            entity_ids: The entities to track.
+            value_callback: Called with the entity ID and its new value in
+                the target unit, or None if missing or non-numeric.
+
+        Returns:
+            A callback that removes the subscription.
+        """
+        for entity_id in entity_ids:
+            if entity_id not in self._subscribers:
+                self._subscribers[entity_id] = []
+                self._read_states.pop(entity_id, None)
+                state = self._hass.states.get(entity_id)
+                self._values[entity_id] = self._units.convert(entity_id, state)
+                self._updated[entity_id] = last_reported(state)
+                self._unsub_state[entity_id] = async_track_state_change_event(
+                    self._hass, entity_id, self._async_state_changed
+                )
+            self._subscribers[entity_id].append(value_callback)
+
+        @callback
+        def unsubscribe() -> None:
+            """Remove the subscription."""
+            for entity_id in entity_ids:
+                subscribers = self._subscribers[entity_id]
+                subscribers.remove(value_callback)
+                if not subscribers:
+                    del self._subscribers[entity_id]
+                    self._unsub_state.pop(entity_id)()
+                    self._values.pop(entity_id, None)
+                    self._updated.pop(entity_id, None)
+
+        return unsubscribe
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Convert a new state once and pass it to every subscriber."""
+        self.async_update(event.data["entity_id"], event.data.get("new_state"))
+
+    @callback
+    def async_update(self, entity_id: str, state: State | None) -> None:
+        """Convert a new state of a subscribed entity and pass it on."""
+        subscribers = self._subscribers.get(entity_id)
+        if subscribers is None:
+            return
+
+        value = self._units.convert(entity_id, state)
+        self._values[entity_id] = value
+        self._updated[entity_id] = last_reported(state)
+        for value_callback in subscribers:
+            value_callback(entity_id, value)
+
+
+class _ScheduledTick:
+    """An entry in the tick scheduler."""
+
+    __slots__ = ("due", "sequence", "action", "coalesce", "cancelled")
+
+    def __init__(
+        self, due: float, sequence: int, action: CALLBACK_TYPE, coalesce: bool
+    ) -> None:
+        """Initialise the entry."""
+        self.due = due
+        self.sequence = sequence
+        self.action = action
+        self.coalesce = coalesce
+        self.cancelled = False
+
+    def __lt__(self, other: _ScheduledTick) -> bool:
+        """Order entries by due time, then by when they were scheduled."""
+        return (self.due, self.sequence) < (other.due, other.sequence)
+
+
+class TickScheduler:
+    """Run the ticks of every coordinator from a single timer.
+
+    Due ticks are kept in a heap; one timer is armed for the earliest. When
+    it fires every tick due within COALESCE_WINDOW runs, so entries ticking
+    at about the same time share one wakeup. Ticks scheduled without
+    coalescing only run once they are due.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialise the scheduler."""
+        self._hass = hass
+        self._heap: list[_ScheduledTick] = []
+        self._sequence = itertools.count()
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._timer_due: float | None = None
+        self.wakeups = 0
+
+    def __len__(self) -> int:
+        """Return the number of scheduled ticks."""
+        return sum(not tick.cancelled for tick in self._heap)
+
+    @callback
+    def async_schedule_at(
+        self, due: float, action: CALLBACK_TYPE, coalesce: bool = True
+    ) -> CALLBACK_TYPE:
+        """Run an action once at a monotonic time.
+
+        Args:
+            due: Monotonic time in seconds to run the action at.
+            action: The callback to run.
+            coalesce: Whether the action may run up to COALESCE_WINDOW early
+                to share a wakeup with an earlier tick. Without it the
+                action never runs before its due time.
+
+        Returns:
+            A callback that cancels the tick.
+        """
+        tick = _ScheduledTick(due, next(self._sequence), action, coalesce)
+        heapq.heappush(self._heap, tick)
+        if self._timer_due is None or due < self._timer_due:
+            self._async_arm()
+
+        @callback
+        def cancel() -> None:
+            """Cancel the tick."""
+            tick.cancelled = True
+
+        return cancel
+
+    @callback
+    def async_stop(self) -> None:
+        """Cancel every tick and the timer."""
+        self._heap.clear()
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        self._timer_due = None
+
+    @callback
+    def _async_arm(self) -> None:
+        """Arm the timer for the earliest tick that is still scheduled."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        self._timer_due = None
+
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return
+
+        self._timer_due = self._heap[0].due
+        self._unsub_timer = async_call_later(
+            self._hass,
+            max(0.0, self._timer_due - time.monotonic()),
+            self._async_fire,
+        )
+
+    @callback
+    def _async_fire(self, _: Any) -> None:
+        """Run every tick that is due."""
+        self._unsub_timer = None
+        self._timer_due = None
+        self.wakeups += 1
+
+        now = time.monotonic()
+        horizon = now + COALESCE_WINDOW
+        due_ticks: list[_ScheduledTick] = []
+        early_ticks: list[_ScheduledTick] = []
+        while self._heap and self._heap[0].due <= horizon:
+            tick = heapq.heappop(self._heap)
+            if tick.cancelled:
+                continue
+            if tick.due > now and not tick.coalesce:
+                early_ticks.append(tick)
+            else:
+                due_ticks.append(tick)
+        for tick in early_ticks:
+            heapq.heappush(self._heap, tick)
+
+        for tick in due_ticks:
+            try:
+                tick.action()
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error running scheduled tick")
+
+        if self._timer_due is None:
+            self._async_arm()
+
+
+class SamplingEngine:
+    """Sensor tracking and scheduling shared by every config entry."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialise the engine."""
+        self.issues = SensorIssueRegistry(hass)
+        self.power = SharedEntityTracker(hass, POWER_UNIT_FACTORS, "kW", self.issues)
+        self.energy = SharedEntityTracker(
+            hass, ENERGY_UNIT_FACTORS, "kWh", self.issues
+        )
+        self.scheduler = TickScheduler(hass)
+
+    @callback
+    def async_stop(self) -> None:
+        """Cancel every scheduled tick and forget sensor problems."""
+        self.scheduler.async_stop()
+        self.issues.async_clear()
+
+
+@callback
+def async_get_engine(hass: HomeAssistant) -> SamplingEngine:
+    """Return the sampling engine of a Home Assistant instance."""
+    if DATA_ENGINE not in hass.data:
+        hass.data[DATA_ENGINE] = SamplingEngine(hass)
+    return hass.data[DATA_ENGINE]
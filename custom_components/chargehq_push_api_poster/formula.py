@@ -0,0 +1,275 @@
+"""Derived meter formulas for ChargeHQ Push API Poster.
+
+Formulas are parsed with Python's ``ast`` module, checked against a small
+whitelist of nodes and compiled once into nested closures, so evaluating one
+is a handful of function calls on already converted values. Nothing is
+rendered or parsed per tick.
+
+A formula can use:
+
+- ``consumption`` and ``solar``: the sums of the configured sensor groups
+- power sensor entity IDs such as ``sensor.grid_power``, in kW
+- numbers, ``+``, ``-``, ``*`` and division by a number
+- ``abs(x)``, ``min(a, b, ...)``, ``max(a, b, ...)``, ``sum(a, b, ...)``
+  and ``clamp(x, low, high)``
+
+Missing or non-numeric sensors count as 0, like in the sensor sums.
+"""
+from __future__ import annotations
+
+import ast
+from collections.abc import Callable, Mapping
+import operator
+import re
+
+# Names of the configured sensor groups
+GROUP_CONSUMPTION = "consumption"
+GROUP_SOLAR = "solar"
+
+# Longest formula accepted, to bound the work done when compiling
+MAX_FORMULA_LENGTH = 1000
+
+# Entity IDs are not valid Python (object IDs can start with a digit), so
+# they are swapped for placeholder names before parsing
+_ENTITY_ID = re.compile(r"(?<![\w.])([a-z_][a-z0-9_]*\.[a-z0-9_]+)(?![\w.(])")
+_PLACEHOLDER = "entity__{}"
+_PLACEHOLDER_NAME = re.compile(r"\bentity__\d+\b")
+
+Values = Mapping[str, float]
+Evaluator = Callable[[Values], float]
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    """Limit a value to a range."""
+    return min(max(value, low), high)
+
+
+# Allowed functions with their minimum and maximum number of arguments
+_FUNCTIONS: dict[str, tuple[Callable[..., float], int, int | None]] = {
+    "abs": (abs, 1, 1),
+    "min": (min, 2, None),
+    "max": (max, 2, None),
+    "sum": (lambda *args: sum(args), 1, None),
+    "clamp": (_clamp, 3, 3),
+}
+
+_BINARY_OPERATORS: dict[type[ast.operator], Callable[[float, float], float]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+
+class Formula:
+    """A formula compiled into a callable evaluator."""
+
+    def __init__(self, text: str) -> None:
+        """Parse and compile a formula.
+
+        Args:
+            text: The formula.
+
+        Raises:
+            ValueError: If the formula is empty, too long or uses anything
+                outside the whitelist.
+        """
+        self.text = text.strip()
+        if not self.text:
+            raise ValueError("Empty formula")
+        if len(self.text) > MAX_FORMULA_LENGTH:
+            raise ValueError("Formula too long")
+
+        entity_ids: list[str] = []
+
+        def replace(match: re.Match[str]) -> str:
+            if match.group(1) not in entity_ids:
+                entity_ids.append(match.group(1))
+            return _PLACEHOLDER.format(entity_ids.index(match.group(1)))
+
+        try:
+            tree = ast.parse(_ENTITY_ID.sub(replace, self.text), mode="eval")
+        except SyntaxError as err:
+            raise ValueError(f"Invalid formula: {err.msg}") from err
+
+        self._names = {
+            _PLACEHOLDER.format(index): entity_id
+            for index, entity_id in enumerate(entity_ids)
+        }
+        self._names[GROUP_CONSUMPTION] = GROUP_CONSUMPTION
+        self._names[GROUP_SOLAR] = GROUP_SOLAR
+        self.entity_ids = frozenset(entity_ids)
+
+        evaluate, constant = self._compile(tree.body)
+        if constant is not None:
+            self._evaluate: Evaluator = lambda values: constant
+        else:
+            self._evaluate = evaluate
+
+    def __call__(self, values: Values) -> float:
+        """Evaluate the formula.
+
+        Args:
+            values: Group sums and sensor values in kW, keyed by group name
+                or entity ID. Missing keys count as 0.
+        """
+        return self._evaluate(values)
+
+    def _compile(self, node: ast.AST) -> tuple[Evaluator, float | None]:
+        """Compile a node into an evaluator.
+
+        Returns:
+            The evaluator, and the node's value if it is constant so that
+            constant sub-expressions are folded at compile time.
+        """
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(
+                node.value, (int, float)
+            ):
+                raise ValueError(f"Unsupported constant: {node.value!r}")
+            value = float(node.value)
+            return (lambda values: value), value
+
+        if isinstance(node, ast.Name):
+            if node.id not in self._names:
+                raise ValueError(f"Unknown name: {node.id}")
+            key = self._names[node.id]
+            return (lambda values: values.get(key, 0.0)), None
+
+        if isinstance(node, ast.UnaryOp) and isinstance(
+            node.op, (ast.USub, ast.UAdd)
+        ):
+            operand, constant = self._compile(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand, constant
+            if constant is not None:
+                return (lambda values: -constant), -constant
+            return (lambda values: -operand(values)), None
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            return self._compile_binary(node)
+
+        if isinstance(node, ast.Call):
+            return self._compile_call(node)
+
+        raise ValueError(f"Unsupported expression: {self._describe(node)}")
+
+    def _describe(self, node: ast.AST) -> str:
+        """Return the source of a node for error messages."""
+        return _PLACEHOLDER_NAME.sub(
+            lambda match: self._names.get(match.group(), match.group()),
+            ast.unparse(node),
+        )
+
+    def _compile_binary(self, node: ast.BinOp) -> tuple[Evaluator, float | None]:
+        """Compile an arithmetic operation."""
+        function = _BINARY_OPERATORS[type(node.op)]
+        left, left_constant = self._compile(node.left)
+        right, right_constant = self._compile(node.right)
+
+        if isinstance(node.op, ast.Div) and right_constant is None:
+            raise ValueError("Only division by a number is supported")
+        if isinstance(node.op, ast.Div) and right_constant == 0:
+            raise ValueError("Division by zero")
+
+        if left_constant is not None and right_constant is not None:
+            value = function(left_constant, right_constant)
+            return (lambda values: value), value
+
+        # Specialise operations with a constant side, e.g. signed weights
+        if right_constant is not None:
+            return (lambda values: function(left(values), right_constant)), None
+        if left_constant is not None:
+            return (lambda values: function(left_constant, right(values))), None
+        return (lambda values: function(left(values), right(values))), None
+
+    def _compile_call(self, node: ast.Call) -> tuple[Evaluator, float | None]:
+        """Compile a call of an allowed function."""
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS:
+            raise ValueError(f"Unsupported function: {self._describe(node.func)}")
+        if node.keywords:
+            raise ValueError(f"{node.func.id}() takes no keyword arguments")
+
+        function, min_args, max_args = _FUNCTIONS[node.func.id]
+        if len(node.args) < min_args or (
+            max_args is not None and len(node.args) > max_args
+        ):
+            raise ValueError(f"Wrong number of arguments to {node.func.id}()")
+
+        compiled = [self._compile(arg) for arg in node.args]
+        constants = [constant for _, constant in compiled]
+        if all(constant is not None for constant in constants):
+            value = float(function(*constants))
+            return (lambda values: value), value
+
+        arguments = tuple(evaluate for evaluate, _ in compiled)
+        if len(arguments) == 1:
+            (argument,) = arguments
+            return (lambda values: function(argument(values))), None
+        return (
+            lambda values: function(*[argument(values) for argument in arguments])
+        ), None
+
+
+class MeterFormulas:
+    """Formulas for the posted power fields.
+
+    Fields without a formula keep the built-in calculation: consumption is
+    the consumption sensor sum, production the solar sensor sum and net
+    import consumption minus production.
+    """
+
+    def __init__(
+        self,
+        consumption: str | None = None,
+        production: str | None = None,
+        net_import: str | None = None,
+    ) -> None:
+        """Compile the formulas.
+
+        Args:
+            consumption: Formula for consumption_kw, or None for the default.
+            production: Formula for production_kw, or None for the default.
+            net_import: Formula for net_import_kw, or None for the default.
+
+        Raises:
+            ValueError: If a formula is invalid.
+        """
+        self._consumption = Formula(consumption) if consumption else None
+        self._production = Formula(production) if production else None
+        self._net_import = Formula(net_import) if net_import else None
+
+        self.entity_ids: frozenset[str] = frozenset().union(
+            *(
+                formula.entity_ids
+                for formula in (self._consumption, self._production, self._net_import)
+                if formula is not None
+            )
+        )
+
+    def evaluate(self, values: Values) -> tuple[float, float, float]:
+        """Evaluate the power fields.
+
+        Args:
+            values: The ``consumption`` and ``solar`` group sums and the
+                values of the sensors the formulas use, in kW.
+
+        Returns:
+            Consumption, production and net import in kW.
+        """
+        if self._consumption is not None:
+            consumption_kw = self._consumption(values)
+        else:
+            consumption_kw = values.get(GROUP_CONSUMPTION, 0.0)
+
+        if self._production is not None:
+            production_kw = self._production(values)
+        else:
+            production_kw = values.get(GROUP_SOLAR, 0.0)
+
+        if self._net_import is not None:
+            net_import_kw = self._net_import(values)
+        else:
+            net_import_kw = consumption_kw - production_kw
+
+        return consumption_kw, production_kw, net_import_kw
@@ -0,0 +1,119 @@
+"""Sensor freshness tracking for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import heapq
+
+from homeassistant.const import MAJOR_VERSION, MINOR_VERSION
+from homeassistant.core import State
+
+# Home Assistant 2024.4 added State.last_reported, which moves every time a
+# sensor reports, even an unchanged value. Before that only last_updated is
+# known, and it stays put while a sensor keeps reporting the same value, so a
+# healthy but steady sensor can't be told apart from one that stopped.
+LAST_REPORTED_SUPPORTED = (MAJOR_VERSION, MINOR_VERSION) >= (2024, 4)
+
+
+def last_reported(state: State | None) -> float | None:
+    """Return the timestamp a state was last reported, or None if missing."""
+    if state is None:
+        return None
+    return getattr(state, "last_reported", state.last_updated).timestamp()
+
+
+class FreshnessIndex:
+    """Track when the sensors of a group last updated and which are stale.
+
+    Every sensor has a single entry in a heap of deadlines. Recording an
+    update is a dictionary write; the heap entry is only moved when its
+    deadline passes, at which point the sensor is either found stale or
+    rescheduled at its latest update. Checking for stale sensors therefore
+    only touches the sensors whose deadline passed since the last check, not
+    every sensor in the group.
+
+    Reports of an unchanged value fire no state change event, so updates
+    can also be looked up when a deadline passes and for stale sensors.
+    """
+
+    def __init__(self, max_age: float) -> None:
+        """Initialise the index.
+
+        Args:
+            max_age: Seconds after its last update that a sensor is stale.
+        """
+        self.max_age = max_age
+        self.stale: set[str] = set()
+        self._updated: dict[str, float] = {}
+        self._deadlines: list[tuple[float, str]] = []
+
+    def __contains__(self, entity_id: str) -> bool:
+        """Return whether a sensor is in the index."""
+        return entity_id in self._updated
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Return the sensors in the index."""
+        return list(self._updated)
+
+    def add(self, entity_id: str, updated: float | None) -> None:
+        """Start tracking a sensor.
+
+        Args:
+            entity_id: The sensor entity ID.
+            updated: Timestamp of its last update, or None if it has no
+                state yet, which counts as stale.
+        """
+        if entity_id in self._updated:
+            return
+        self._updated[entity_id] = updated or 0.0
+        heapq.heappush(self._deadlines, (updated or 0.0, entity_id))
+
+    def touch(self, entity_id: str, updated: float | None) -> None:
+        """Record an update of a sensor.
+
+        Args:
+            entity_id: The sensor entity ID; sensors not in the index are
+                ignored.
+            updated: Timestamp of the update.
+        """
+        if entity_id not in self._updated or updated is None:
+            return
+        self._updated[entity_id] = updated
+        if entity_id in self.stale:
+            # Stale sensors have no heap entry; schedule a new one
+            self.stale.discard(entity_id)
+            heapq.heappush(self._deadlines, (updated, entity_id))
+
+    def expire(
+        self, now: float, lookup: Callable[[str], float | None] | None = None
+    ) -> set[str]:
+        """Find the sensors that have not updated for max_age.
+
+        Args:
+            now: The current timestamp.
+            lookup: Optional function returning when a sensor last reported,
+                asked only for stale sensors and sensors whose deadline
+                passed.
+
+        Returns:
+            The stale sensors. The set is owned by the index.
+        """
+        if lookup is not None:
+            for entity_id in list(self.stale):
+                updated = lookup(entity_id)
+                if updated is not None and updated > self._updated[entity_id]:
+                    self.touch(entity_id, updated)
+
+        cutoff = now - self.max_age
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] < cutoff:
+            _, entity_id = heapq.heappop(deadlines)
+            updated = self._updated[entity_id]
+            if updated < cutoff and lookup is not None:
+                updated = max(updated, lookup(entity_id) or 0.0)
+                self._updated[entity_id] = updated
+            if updated < cutoff:
+                self.stale.add(entity_id)
+            else:
+                heapq.heappush(deadlines, (updated, entity_id))
+        return self.stale
@@ -0,0 +1,209 @@
+"""Deduplicated sensor problem tracking for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+from functools import partial
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import issue_registry as ir
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+ISSUE_NOT_FOUND = "not_found"
+ISSUE_NON_NUMERIC = "non_numeric"
+ISSUE_UNKNOWN_UNIT = "unknown_unit"
+
+# Seconds between log reminders of a problem that persists
+REMINDER_INTERVAL = 3600
+
+# Seconds a problem must persist before a repair issue is raised. Sensors of
+# integrations that are still loading are often missing for a while.
+REPAIR_DELAY = 600
+
+_DESCRIPTIONS = {
+    ISSUE_NOT_FOUND: "not found",
+    ISSUE_NON_NUMERIC: "has non-numeric state '{detail}'",
+    ISSUE_UNKNOWN_UNIT: "has unknown or missing unit '{detail}'",
+}
+
+
+class SensorIssue:
+    """A problem with one sensor and how often it was seen."""
+
+    __slots__ = (
+        "entity_id",
+        "kind",
+        "detail",
+        "count",
+        "first_seen",
+        "last_seen",
+        "last_logged",
+        "unsub_repair",
+        "repair_raised",
+    )
+
+    def __init__(self, entity_id: str, kind: str, detail: str, now: float) -> None:
+        """Initialise the issue."""
+        self.entity_id = entity_id
+        self.kind = kind
+        self.detail = detail
+        self.count = 1
+        self.first_seen = now
+        self.last_seen = now
+        self.last_logged = now
+        self.unsub_repair: CALLBACK_TYPE | None = None
+        self.repair_raised = False
+
+    @property
+    def description(self) -> str:
+        """Return a description of the problem for the log."""
+        return _DESCRIPTIONS[self.kind].format(detail=self.detail)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the issue as JSON serialisable data."""
+        return {
+            "entity_id": self.entity_id,
+            "kind": self.kind,
+            "detail": self.detail,
+            "count": self.count,
+            "first_seen": dt_util.utc_from_timestamp(self.first_seen).isoformat(),
+            "last_seen": dt_util.utc_from_timestamp(self.last_seen).isoformat(),
+        }
+
+
+class SensorIssueRegistry:
+    """Record each distinct sensor problem once instead of logging it every time.
+
+    The first occurrence of a problem is logged as a warning; repeats only
+    bump a counter, with a reminder in the log at most every
+    REMINDER_INTERVAL. A problem that lasts REPAIR_DELAY is raised as a
+    repair issue, and everything is cleared once the sensor works again.
+    """
+
+    def __init__(self, hass: HomeAssistant | None = None) -> None:
+        """Initialise the registry.
+
+        Args:
+            hass: The Home Assistant instance, or None to only log.
+        """
+        self._hass = hass
+        self._issues: dict[tuple[str, str], SensorIssue] = {}
+        # Kinds of problem open per entity, to resolve them in O(1)
+        self._kinds: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of open issues."""
+        return len(self._issues)
+
+    def as_list(self) -> list[dict[str, Any]]:
+        """Return the open issues as JSON serialisable data."""
+        return [issue.as_dict() for issue in self._issues.values()]
+
+    @callback
+    def async_record(self, entity_id: str, kind: str, detail: str = "") -> None:
+        """Record an occurrence of a problem with a sensor.
+
+        Args:
+            entity_id: The sensor entity ID.
+            kind: The kind of problem, one of the ISSUE_* constants.
+            detail: The offending state or unit.
+        """
+        now = time.time()
+        issue = self._issues.get((entity_id, kind))
+        if issue is None:
+            issue = SensorIssue(entity_id, kind, detail, now)
+            self._issues[(entity_id, kind)] = issue
+            self._kinds.setdefault(entity_id, set()).add(kind)
+            _LOGGER.warning("Sensor %s %s", entity_id, issue.description)
+            if self._hass is not None:
+                issue.unsub_repair = async_call_later(
+                    self._hass, REPAIR_DELAY, partial(self._async_raise_repair, issue)
+                )
+            return
+
+        issue.count += 1
+        issue.last_seen = now
+        issue.detail = detail
+        if now - issue.last_logged >= REMINDER_INTERVAL:
+            issue.last_logged = now
+            _LOGGER.warning(
+                "Sensor %s %s (seen %d times since %s)",
+                entity_id,
+                issue.description,
+                issue.count,
+                dt_util.utc_from_timestamp(issue.first_seen).isoformat(),
+            )
+
+    @callback
+    def async_resolve(self, entity_id: str, *kinds: str) -> None:
+        """Clear problems of a sensor that works again.
+
+        Args:
+            entity_id: The sensor entity ID.
+            kinds: The kinds of problem that no longer apply.
+        """
+        open_kinds = self._kinds.get(entity_id)
+        if not open_kinds:
+            return
+
+        for kind in kinds:
+            if kind not in open_kinds:
+                continue
+            open_kinds.discard(kind)
+            issue = self._issues.pop((entity_id, kind))
+            self._async_clear(issue)
+            _LOGGER.info(
+                "Sensor %s no longer %s after %d occurrences",
+                entity_id,
+                "missing" if kind == ISSUE_NOT_FOUND else issue.description,
+                issue.count,
+            )
+        if not open_kinds:
+            del self._kinds[entity_id]
+
+    @callback
+    def async_clear(self) -> None:
+        """Forget every problem and remove the repair issues."""
+        for issue in self._issues.values():
+            self._async_clear(issue)
+        self._issues.clear()
+        self._kinds.clear()
+
+    @callback
+    def _async_clear(self, issue: SensorIssue) -> None:
+        """Cancel the repair issue of a problem."""
+        if issue.unsub_repair is not None:
+            issue.unsub_repair()
+            issue.unsub_repair = None
+        if issue.repair_raised and self._hass is not None:
+            ir.async_delete_issue(self._hass, DOMAIN, _repair_id(issue))
+
+    @callback
+    def _async_raise_repair(self, issue: SensorIssue, _: Any) -> None:
+        """Raise a repair issue for a problem that persisted."""
+        assert self._hass is not None
+        issue.unsub_repair = None
+        issue.repair_raised = True
+        ir.async_create_issue(
+            self._hass,
+            DOMAIN,
+            _repair_id(issue),
+            is_fixable=False,
+            severity=ir.IssueSeverity.WARNING,
+            translation_key=f"sensor_{issue.kind}",
+            translation_placeholders={
+                "entity_id": issue.entity_id,
+                "detail": issue.detail,
+            },
+        )
+
+
+def _repair_id(issue: SensorIssue) -> str:
+    """Return the repair issue ID of a problem."""
+    return f"sensor_{issue.kind}_{issue.entity_id}"
@@ -0,0 +1,128 @@
+"""Performance metrics for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+from array import array
+import math
+from typing import Any, NamedTuple
+
+# Histogram buckets grow geometrically from the smallest bound, so every
+# recorded value lands in a bucket whose upper bound is at most 25% above it.
+# 64 buckets cover 0.1 ms to about two minutes.
+HISTOGRAM_MIN_MS = 0.1
+HISTOGRAM_GROWTH = 1.25
+HISTOGRAM_BUCKETS = 64
+
+# Number of recent post attempts kept for the diagnostics download
+POST_ATTEMPT_HISTORY = 50
+
+
+class PostAttempt(NamedTuple):
+    """A single post attempt to one endpoint."""
+
+    time: str
+    target: str
+    result: str
+    duration_ms: float
+    payload_bytes: int
+
+
+class LatencyHistogram:
+    """Fixed-size histogram of durations in milliseconds.
+
+    Memory is allocated once up front and recording a value is O(1).
+    Percentiles are estimated from the bucket bounds, so they are accurate
+    to within one bucket.
+    """
+
+    def __init__(self) -> None:
+        """Initialise the histogram."""
+        self._buckets = array("L", [0]) * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.minimum: float | None = None
+        self.maximum: float | None = None
+
+    def record(self, value_ms: float) -> None:
+        """Record a duration.
+
+        Args:
+            value_ms: The duration in milliseconds.
+        """
+        value_ms = max(value_ms, 0.0)
+        if value_ms <= HISTOGRAM_MIN_MS:
+            index = 0
+        else:
+            index = min(
+                math.ceil(math.log(value_ms / HISTOGRAM_MIN_MS, HISTOGRAM_GROWTH)),
+                HISTOGRAM_BUCKETS - 1,
+            )
+        self._buckets[index] += 1
+
+        self.count += 1
+        self.total += value_ms
+        if self.minimum is None or value_ms < self.minimum:
+            self.minimum = value_ms
+        if self.maximum is None or value_ms > self.maximum:
+            self.maximum = value_ms
+
+    def merge(self, other: LatencyHistogram) -> None:
+        """Add the durations recorded by another histogram.
+
+        Args:
+            other: The histogram to add.
+        """
+        for index, bucket_count in enumerate(other._buckets):
+            self._buckets[index] += bucket_count
+
+        self.count += other.count
+        self.total += other.total
+        if other.minimum is not None and (
+            self.minimum is None or other.minimum < self.minimum
+        ):
+            self.minimum = other.minimum
+        if other.maximum is not None and (
+            self.maximum is None or other.maximum > self.maximum
+        ):
+            self.maximum = other.maximum
+
+    def percentile(self, percent: float) -> float | None:
+        """Return an estimate of a percentile.
+
+        Args:
+            percent: The percentile, between 0 and 100.
+
+        Returns:
+            The estimated duration in milliseconds, or None if nothing was
+            recorded.
+        """
+        if not self.count or self.maximum is None:
+            return None
+
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index, bucket_count in enumerate(self._buckets):
+            seen += bucket_count
+            if seen >= rank:
+                bound = HISTOGRAM_MIN_MS * HISTOGRAM_GROWTH**index
+                return min(bound, self.maximum)
+        return self.maximum
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary of the histogram."""
+        mean = self.total / self.count if self.count else None
+        return {
+            "count": self.count,
+            "mean_ms": _round(mean),
+            "min_ms": _round(self.minimum),
+            "max_ms": _round(self.maximum),
+            "p50_ms": _round(self.percentile(50)),
+            "p95_ms": _round(self.percentile(95)),
+            "p99_ms": _round(self.percentile(99)),
+        }
+
+
+def _round(value: float | None) -> float | None:
+    """Round a duration for display."""
+    if value is None:
+        return None
+    return round(value, 2)
@@ -0,0 +1,98 @@
+"""Persistent outbox for posts that could not be delivered."""
+from __future__ import annotations
+
+from collections import deque
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+# Delay in seconds before queued changes are written to disk, so a burst of
+# failed posts or replays results in a single write
+SAVE_DELAY = 10
+
+
+class PostOutbox:
+    """Bounded, disk-backed FIFO queue of samples waiting to be posted.
+
+    When the queue is full the oldest sample is evicted. The queue is kept in
+    a Home Assistant Store so it survives restarts.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, max_size: int) -> None:
+        """Initialise the outbox.
+
+        Args:
+            hass: The Home Assistant instance.
+            entry_id: The config entry the outbox belongs to.
+            max_size: Maximum number of samples kept.
+        """
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.outbox.{entry_id}"
+        )
+        self._queue: deque[tuple[int, dict[str, Any]]] = deque(maxlen=max_size)
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        """Return the number of queued samples."""
+        return len(self._queue)
+
+    async def async_load(self) -> None:
+        """Load queued samples from disk."""
+        data = await self._store.async_load()
+        if not data:
+            return
+
+        self._queue.clear()
+        for timestamp_ms, site_meters in data.get("samples", []):
+            self._queue.append((timestamp_ms, site_meters))
+
+        if self._queue:
+            _LOGGER.info("Loaded %d queued samples from the outbox", len(self._queue))
+
+    async def async_save(self) -> None:
+        """Write the queue to disk now."""
+        await self._store.async_save(self._data_to_save())
+
+    async def async_remove(self) -> None:
+        """Remove the outbox from disk."""
+        await self._store.async_remove()
+
+    @callback
+    def async_add(self, timestamp_ms: int, site_meters: dict[str, Any]) -> None:
+        """Queue a sample, evicting the oldest one when full.
+
+        Args:
+            timestamp_ms: Timestamp of the sample in milliseconds.
+            site_meters: The site meter values of the sample.
+        """
+        if len(self._queue) == self._queue.maxlen:
+            self.evicted += 1
+            _LOGGER.debug("Outbox full, dropping the oldest queued sample")
+
+        self._queue.append((timestamp_ms, site_meters))
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def peek(self) -> tuple[int, dict[str, Any]] | None:
+        """Return the oldest queued sample without removing it."""
+        if not self._queue:
+            return None
+        return self._queue[0]
+
+    @callback
+    def async_pop(self) -> None:
+        """Remove the oldest queued sample."""
+        if self._queue:
+            self._queue.popleft()
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to store."""
+        return {"samples": [list(sample) for sample in self._queue]}
@@ -0,0 +1,102 @@
+"""Posting policy for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+
+class PostingPolicy:
+    """Decide whether a sample differs enough from the last post to be sent.
+
+    A sample is posted when consumption or net import moved by at least
+    their deadband since the last post, or when nothing has been posted for
+    the heartbeat interval. A deadband of 0 ignores that value; with both at
+    0 every sample is posted.
+    """
+
+    def __init__(
+        self,
+        consumption_deadband: float,
+        net_import_deadband: float,
+        heartbeat: float,
+        swing_threshold: float = 0.0,
+    ) -> None:
+        """Initialise the policy.
+
+        Args:
+            consumption_deadband: Minimum change in consumption (kW) to post.
+            net_import_deadband: Minimum change in net import (kW) to post.
+            heartbeat: Maximum seconds between posts.
+            swing_threshold: Change in net import (kW) that warrants posting
+                immediately instead of waiting for the next tick; 0 disables.
+        """
+        self._consumption_deadband = consumption_deadband
+        self._net_import_deadband = net_import_deadband
+        self._heartbeat = heartbeat
+        self._swing_threshold = swing_threshold
+        self._last_consumption_kw: float | None = None
+        self._last_net_import_kw: float | None = None
+        self._last_post_time: float | None = None
+
+    @property
+    def heartbeat(self) -> float:
+        """Return the maximum seconds between posts."""
+        return self._heartbeat
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether the policy can suppress posts."""
+        return self._consumption_deadband > 0 or self._net_import_deadband > 0
+
+    def should_post(
+        self, consumption_kw: float, net_import_kw: float, now: float
+    ) -> bool:
+        """Return whether a sample should be posted.
+
+        Args:
+            consumption_kw: Total consumption in kW.
+            net_import_kw: Net import in kW.
+            now: Monotonic time in seconds.
+        """
+        if (
+            not self.enabled
+            or self._last_post_time is None
+            or self._last_consumption_kw is None
+            or self._last_net_import_kw is None
+        ):
+            return True
+
+        if now - self._last_post_time >= self._heartbeat:
+            return True
+
+        # A deadband of 0 leaves that value out of the decision
+        consumption_change = abs(consumption_kw - self._last_consumption_kw)
+        net_import_change = abs(net_import_kw - self._last_net_import_kw)
+        return (
+            0 < self._consumption_deadband <= consumption_change
+            or 0 < self._net_import_deadband <= net_import_change
+            or self.is_swing(net_import_kw)
+        )
+
+    def is_swing(self, net_import_kw: float) -> bool:
+        """Return whether net import swung enough to post immediately.
+
+        Args:
+            net_import_kw: Net import in kW.
+        """
+        return (
+            self._swing_threshold > 0
+            and self._last_net_import_kw is not None
+            and abs(net_import_kw - self._last_net_import_kw) >= self._swing_threshold
+        )
+
+    def record_post(
+        self, consumption_kw: float, net_import_kw: float, now: float
+    ) -> None:
+        """Remember the values of a posted sample.
+
+        Args:
+            consumption_kw: Total consumption in kW.
+            net_import_kw: Net import in kW.
+            now: Monotonic time in seconds.
+        """
+        self._last_consumption_kw = consumption_kw
+        self._last_net_import_kw = net_import_kw
+        self._last_post_time = now
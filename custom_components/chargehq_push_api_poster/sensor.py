@@ -1,21 +1,30 @@
 """Sensor platform for ChargeHQ Push API Poster."""
 from __future__ import annotations
 
+from collections.abc import Callable
+from datetime import timedelta
 import logging
 from typing import Any
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_time_interval
-from datetime import timedelta
 
 from .const import DOMAIN
 from .coordinator import EnergyPosterCoordinator
+from .metrics import LatencyHistogram
 
 _LOGGER = logging.getLogger(__name__)
 
+# How often the metric sensors are refreshed
+SCAN_INTERVAL = timedelta(seconds=60)
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -24,7 +33,59 @@ async def async_setup_entry(
 ) -> None:
     """Set up the sensor platform."""
     coordinator: EnergyPosterCoordinator = hass.data[DOMAIN][entry.entry_id]
-    async_add_entities([LastPostedDataSensor(coordinator, entry.entry_id)], True)
+    async_add_entities(
+        [
+            LastPostedDataSensor(coordinator, entry.entry_id),
+            EffectiveIntervalSensor(coordinator, entry.entry_id),
+            HistogramSensor(
+                coordinator,
+                entry.entry_id,
+                "post_latency",
+                "Post Latency",
+                lambda: coordinator.post_latency,
+            ),
+            HistogramSensor(
+                coordinator,
+                entry.entry_id,
+                "aggregation_time",
+                "Aggregation Time",
+                lambda: coordinator.aggregation_time,
+                enabled_default=False,
+            ),
+            HistogramSensor(
+                coordinator,
+                entry.entry_id,
+                "schedule_drift",
+                "Schedule Drift",
+                lambda: coordinator.schedule_drift,
+                enabled_default=False,
+            ),
+            CounterSensor(
+                coordinator,
+                entry.entry_id,
+                "successful_posts",
+                "Successful Posts",
+                lambda: sum(t.successful_posts for t in coordinator.targets),
+            ),
+            CounterSensor(
+                coordinator,
+                entry.entry_id,
+                "failed_posts",
+                "Failed Posts",
+                lambda: sum(t.failed_posts for t in coordinator.targets),
+            ),
+            CounterSensor(
+                coordinator,
+                entry.entry_id,
+                "timed_out_posts",
+                "Timed Out Posts",
+                lambda: sum(t.timed_out_posts for t in coordinator.targets),
+            ),
+            PayloadSizeSensor(coordinator, entry.entry_id),
+            StaleSensorsSensor(coordinator, entry.entry_id),
+        ],
+        True,
+    )
 
 
 class LastPostedDataSensor(SensorEntity):
@@ -33,6 +94,25 @@ class LastPostedDataSensor(SensorEntity):
     _attr_has_entity_name = True
     _attr_should_poll = False
 
+    # The posted values change with every post; keep them out of the
+    # recorder so each update only records the (rarely changing) state
+    _unrecorded_attributes = frozenset(
+        {
+            "timestamp_ms",
+            "consumption_kw",
+            "production_kw",
+            "net_import_kw",
+            "imported_kwh",
+            "exported_kwh",
+            "consumption_min_kw",
+            "consumption_max_kw",
+            "production_min_kw",
+            "production_max_kw",
+            "net_import_min_kw",
+            "net_import_max_kw",
+        }
+    )
+
     def __init__(
         self, coordinator: EnergyPosterCoordinator, entry_id: str
     ) -> None:
@@ -40,28 +120,14 @@ class LastPostedDataSensor(SensorEntity):
         self._coordinator = coordinator
         self._attr_name = "Last Posted Data"
         self._attr_unique_id = f"{entry_id}_last_posted_data"
-        self._unsub_refresh = None
 
     async def async_added_to_hass(self) -> None:
         """Handle entity added to Home Assistant."""
-        # Schedule periodic updates every second to refresh the display
-        self._unsub_refresh = async_track_time_interval(
-            self.hass,
-            self._async_refresh,
-            timedelta(seconds=1),
+        # Update only when a post completes
+        self.async_on_remove(
+            self._coordinator.async_add_listener(self.async_write_ha_state)
         )
 
-    async def async_will_remove_from_hass(self) -> None:
-        """Handle entity removal."""
-        if self._unsub_refresh:
-            self._unsub_refresh()
-            self._unsub_refresh = None
-
-    @callback
-    def _async_refresh(self, _: Any) -> None:
-        """Refresh the sensor state."""
-        self.async_write_ha_state()
-
     @property
     def state(self) -> str:
         """Return the state."""
@@ -83,3 +149,169 @@ class LastPostedDataSensor(SensorEntity):
         """Return the icon."""
         return "mdi:post"
 
+
+class EffectiveIntervalSensor(SensorEntity):
+    """Sensor showing the interval posts are currently made at."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_icon = "mdi:timer-sync-outline"
+
+    def __init__(
+        self, coordinator: EnergyPosterCoordinator, entry_id: str
+    ) -> None:
+        """Initialise the sensor."""
+        self._coordinator = coordinator
+        self._attr_name = "Effective Interval"
+        self._attr_unique_id = f"{entry_id}_effective_interval"
+
+    async def async_added_to_hass(self) -> None:
+        """Handle entity added to Home Assistant."""
+        # The adaptive interval only changes when a post is scheduled
+        self.async_on_remove(
+            self._coordinator.async_add_listener(self.async_write_ha_state)
+        )
+
+    @property
+    def native_value(self) -> float:
+        """Return the current interval in seconds."""
+        return self._coordinator.effective_interval
+
+
+class MetricSensor(SensorEntity):
+    """Base class for the performance metric sensors.
+
+    Metrics change with every post, so these sensors are polled at
+    SCAN_INTERVAL instead of being written on every update.
+    """
+
+    _attr_has_entity_name = True
+    _attr_should_poll = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(
+        self,
+        coordinator: EnergyPosterCoordinator,
+        entry_id: str,
+        key: str,
+        name: str,
+        enabled_default: bool = True,
+    ) -> None:
+        """Initialise the sensor."""
+        self._coordinator = coordinator
+        self._attr_name = name
+        self._attr_unique_id = f"{entry_id}_{key}"
+        self._attr_entity_registry_enabled_default = enabled_default
+
+
+class HistogramSensor(MetricSensor):
+    """Sensor showing the 95th percentile of a duration histogram."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_icon = "mdi:timer-outline"
+
+    # The summary changes with every post; only record the state
+    _unrecorded_attributes = frozenset(
+        {"count", "mean_ms", "min_ms", "max_ms", "p50_ms", "p95_ms", "p99_ms"}
+    )
+
+    def __init__(
+        self,
+        coordinator: EnergyPosterCoordinator,
+        entry_id: str,
+        key: str,
+        name: str,
+        histogram_fn: Callable[[], LatencyHistogram],
+        enabled_default: bool = True,
+    ) -> None:
+        """Initialise the sensor."""
+        super().__init__(coordinator, entry_id, key, name, enabled_default)
+        self._histogram_fn = histogram_fn
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the 95th percentile in milliseconds."""
+        return self._histogram_fn().as_dict()["p95_ms"]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the histogram summary."""
+        return self._histogram_fn().as_dict()
+
+
+class CounterSensor(MetricSensor):
+    """Sensor showing a post counter summed over all endpoints."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_icon = "mdi:counter"
+
+    def __init__(
+        self,
+        coordinator: EnergyPosterCoordinator,
+        entry_id: str,
+        key: str,
+        name: str,
+        value_fn: Callable[[], int],
+    ) -> None:
+        """Initialise the sensor."""
+        super().__init__(coordinator, entry_id, key, name)
+        self._value_fn = value_fn
+
+    @property
+    def native_value(self) -> int:
+        """Return the counter value."""
+        return self._value_fn()
+
+
+class PayloadSizeSensor(MetricSensor):
+    """Sensor showing the size of the last request body."""
+
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_icon = "mdi:file-outline"
+
+    def __init__(
+        self, coordinator: EnergyPosterCoordinator, entry_id: str
+    ) -> None:
+        """Initialise the sensor."""
+        super().__init__(
+            coordinator, entry_id, "payload_size", "Payload Size", False
+        )
+
+    @property
+    def native_value(self) -> int:
+        """Return the size of the last request body in bytes."""
+        return self._coordinator.targets[0].api_client.last_payload_bytes
+
+
+class StaleSensorsSensor(MetricSensor):
+    """Sensor showing how many configured sensors are stale."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:timer-alert-outline"
+
+    # The list changes whenever a sensor goes stale or recovers
+    _unrecorded_attributes = frozenset({"entity_ids"})
+
+    def __init__(
+        self, coordinator: EnergyPosterCoordinator, entry_id: str
+    ) -> None:
+        """Initialise the sensor."""
+        super().__init__(coordinator, entry_id, "stale_sensors", "Stale Sensors")
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of stale sensors at the last tick."""
+        return len(self._coordinator.stale_sensors)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the stale sensors."""
+        return {"entity_ids": self._coordinator.stale_sensors}
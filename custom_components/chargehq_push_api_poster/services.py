@@ -0,0 +1,63 @@
+"""Services for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+SERVICE_BACKFILL = "backfill"
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_START = "start"
+ATTR_END = "end"
+
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+    if hass.services.has_service(DOMAIN, SERVICE_BACKFILL):
+        return
+
+    async def async_backfill(call: ServiceCall) -> None:
+        """Post past samples of one or every entry from the recorder."""
+        if "recorder" not in hass.config.components:
+            raise HomeAssistantError("Backfilling needs the recorder integration")
+
+        # Times without a time zone are in Home Assistant's time zone
+        now = dt_util.utcnow()
+        start = dt_util.as_utc(call.data[ATTR_START])
+        end = min(dt_util.as_utc(call.data.get(ATTR_END, now)), now)
+        if start >= end:
+            raise HomeAssistantError("The backfill must start before it ends")
+
+        coordinators = hass.data[DOMAIN]
+        if (entry_id := call.data.get(ATTR_CONFIG_ENTRY_ID)) is not None:
+            if entry_id not in coordinators:
+                raise HomeAssistantError(f"Config entry {entry_id} is not loaded")
+            coordinators = {entry_id: coordinators[entry_id]}
+
+        for coordinator in coordinators.values():
+            coordinator.async_start_backfill(start, end)
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_BACKFILL, async_backfill, schema=BACKFILL_SCHEMA
+    )
+
+
+@callback
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Remove the services of the integration."""
+    hass.services.async_remove(DOMAIN, SERVICE_BACKFILL)
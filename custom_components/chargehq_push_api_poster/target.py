@@ -0,0 +1,236 @@
+"""Post targets for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import time
+from typing import Any
+
+from yarl import URL
+
+from homeassistant.core import HomeAssistant
+
+from .api import EnergyPosterApiClient, PostResult
+from .metrics import LatencyHistogram
+from .outbox import PostOutbox
+
+_LOGGER = logging.getLogger(__name__)
+
+# Delay in seconds between replaying queued samples from the outbox
+OUTBOX_DRAIN_DELAY = 2
+
+# A timestamp in milliseconds and the site meter values posted with it
+Sample = tuple[int, dict[str, Any]]
+
+
+def parse_additional_endpoints(text: str | None) -> list[tuple[str, str, int | None]]:
+    """Parse the additional endpoints option.
+
+    Each non-empty line holds an endpoint URL and API key separated by
+    whitespace, optionally followed by a post timeout in seconds.
+
+    Args:
+        text: The option value.
+
+    Returns:
+        A list of (api_url, api_key, post_timeout) tuples.
+
+    Raises:
+        ValueError: If a line is not in the expected format.
+    """
+    endpoints: list[tuple[str, str, int | None]] = []
+    for line in (text or "").splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) not in (2, 3) or not parts[0].startswith(
+            ("http://", "https://")
+        ):
+            raise ValueError(f"Invalid endpoint line: {line}")
+
+        post_timeout = None
+        if len(parts) == 3:
+            post_timeout = int(parts[2])
+            if post_timeout < 1:
+                raise ValueError(f"Invalid endpoint timeout: {line}")
+
+        endpoints.append((parts[0], parts[1], post_timeout))
+    return endpoints
+
+
+def outbox_id(entry_id: str, api_url: str | None = None) -> str:
+    """Return the outbox storage ID for an endpoint of a config entry.
+
+    Args:
+        entry_id: The config entry ID.
+        api_url: The URL of an additional endpoint, or None for the primary
+            endpoint.
+
+    Returns:
+        The ID to store the endpoint's outbox under.
+    """
+    if api_url is None:
+        return entry_id
+    return f"{entry_id}_{hashlib.sha1(api_url.encode()).hexdigest()[:8]}"
+
+
+class PostTarget:
+    """An endpoint the coordinator posts to.
+
+    Each target has its own API client (and so its own circuit breaker),
+    outbox, timeout, counters and live post in flight, so one slow or
+    failing endpoint does not hold up posts to the others.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api_client: EnergyPosterApiClient,
+        api_url: str,
+        post_timeout: float,
+        outbox: PostOutbox | None = None,
+    ) -> None:
+        """Initialise the target.
+
+        Args:
+            hass: The Home Assistant instance.
+            api_client: The API client to post with.
+            api_url: The endpoint URL (used for logging).
+            post_timeout: Deadline in seconds for a single post.
+            outbox: Optional outbox to queue samples that fail to post.
+        """
+        self._hass = hass
+        self.api_client = api_client
+        self.name = URL(api_url).host or api_url
+        self.post_timeout = post_timeout
+        self.outbox = outbox
+        self._drain_task: asyncio.Task[None] | None = None
+        # The live post in flight; each endpoint runs one at a time
+        self.post_task: asyncio.Task[None] | None = None
+        # Latest sample of the ticks merged while the live post ran
+        self.pending_sample: Sample | None = None
+        self.skipped_ticks = 0
+        self.successful_posts = 0
+        self.failed_posts = 0
+        self.timed_out_posts = 0
+        self.last_result: PostResult | None = None
+        self.last_duration_ms = 0.0
+        self.latency = LatencyHistogram()
+
+    def update_endpoint(self, api_url: str, api_key: str) -> None:
+        """Post to a new URL or with a new API key from the next post on.
+
+        Args:
+            api_url: The API endpoint URL.
+            api_key: The API key for authorisation.
+        """
+        self.name = URL(api_url).host or api_url
+        self.api_client.reconfigure(api_url=api_url, api_key=api_key)
+
+    async def async_start(self) -> None:
+        """Restore samples that were still queued when Home Assistant stopped."""
+        if self.outbox is not None:
+            await self.outbox.async_load()
+
+    async def async_stop(self) -> None:
+        """Stop replaying, persist the outbox and close the client."""
+        if self._drain_task is not None:
+            drain_task = self._drain_task
+            drain_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await drain_task
+
+        if self.outbox is not None:
+            await self.outbox.async_save()
+
+        await self.api_client.async_close()
+
+    async def async_post(
+        self, timestamp_ms: int, site_meters: dict[str, Any]
+    ) -> PostResult:
+        """Post a sample, queueing it in the outbox if that fails.
+
+        Args:
+            timestamp_ms: Timestamp in milliseconds.
+            site_meters: The site meter values.
+
+        Returns:
+            The outcome of the post.
+        """
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                self.api_client.post_site_meters(timestamp_ms, site_meters),
+                self.post_timeout,
+            )
+        except asyncio.TimeoutError:
+            self.timed_out_posts += 1
+            _LOGGER.warning(
+                "Posting energy data to %s took longer than %s seconds, giving up",
+                self.name,
+                self.post_timeout,
+            )
+            result = PostResult.FAILED
+
+        self.last_duration_ms = (time.perf_counter() - start) * 1000
+        self.last_result = result
+        if result is not PostResult.SKIPPED:
+            self.latency.record(self.last_duration_ms)
+        if result is PostResult.SUCCESS:
+            self.successful_posts += 1
+        elif result is not PostResult.SKIPPED:
+            self.failed_posts += 1
+
+        if self.outbox is None:
+            return result
+
+        if result in (PostResult.FAILED, PostResult.SKIPPED):
+            # Keep the sample so it can be replayed once the endpoint recovers
+            self.outbox.async_add(timestamp_ms, site_meters)
+        elif len(self.outbox) and self._drain_task is None:
+            # The endpoint is reachable again, replay queued samples in the
+            # background so live posts are not delayed
+            _LOGGER.info(
+                "Replaying %d queued samples to %s", len(self.outbox), self.name
+            )
+            self._drain_task = self._hass.async_create_task(
+                self._async_drain_outbox()
+            )
+
+        return result
+
+    async def _async_drain_outbox(self) -> None:
+        """Post queued samples oldest first at a limited rate."""
+        assert self.outbox is not None
+        try:
+            while (sample := self.outbox.peek()) is not None:
+                timestamp_ms, site_meters = sample
+                try:
+                    result = await asyncio.wait_for(
+                        self.api_client.post_site_meters(timestamp_ms, site_meters),
+                        self.post_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    result = PostResult.FAILED
+                if result in (PostResult.FAILED, PostResult.SKIPPED):
+                    # Leave the sample queued and retry after the next
+                    # successful live post
+                    _LOGGER.debug(
+                        "Replay to %s failed, %d samples left in the outbox",
+                        self.name,
+                        len(self.outbox),
+                    )
+                    return
+
+                # A live post that failed during the replay may have evicted
+                # the sample from a full outbox; only remove it if it is
+                # still the oldest, or an unsent sample would be dropped
+                if self.outbox.peek() is sample:
+                    self.outbox.async_pop()
+                await asyncio.sleep(OUTBOX_DRAIN_DELAY)
+
+            _LOGGER.info("Finished replaying queued samples to %s", self.name)
+        finally:
+            self._drain_task = None
@@ -0,0 +1,63 @@
+"""Dedicated HTTP transport for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+import logging
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+from homeassistant.const import __version__ as HA_VERSION
+from homeassistant.core import HomeAssistant
+from homeassistant.util.ssl import client_context
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds allowed to establish a connection, and between reads of a response
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 15
+
+# Seconds resolved addresses are cached for
+DNS_CACHE_TTL = 3600
+
+# Seconds an idle connection is kept open on top of the post interval, so the
+# connection used by one post is still open for the next one
+KEEPALIVE_MARGIN = 30
+
+# Connections kept per endpoint; one for live posts and one for outbox replay
+CONNECTION_LIMIT = 2
+
+DEFAULT_TIMEOUT = ClientTimeout(
+    total=None, connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+)
+
+
+async def async_create_session(hass: HomeAssistant, interval: int) -> ClientSession:
+    """Create a client session tuned for posting to a single endpoint.
+
+    Unlike Home Assistant's shared session, idle connections are kept open
+    longer than the post interval and DNS results are cached, so each post
+    reuses a warm connection instead of paying for DNS and TLS again.
+
+    Args:
+        hass: The Home Assistant instance.
+        interval: Interval in seconds between posts.
+
+    Returns:
+        The client session. The caller is responsible for closing it.
+    """
+    # Loading the certificate store does blocking I/O
+    ssl_context = await hass.async_add_executor_job(client_context)
+
+    connector = TCPConnector(
+        limit=CONNECTION_LIMIT,
+        keepalive_timeout=interval + KEEPALIVE_MARGIN,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        ssl=ssl_context,
+    )
+    return ClientSession(
+        connector=connector,
+        timeout=DEFAULT_TIMEOUT,
+        headers={"User-Agent": f"HomeAssistant/{HA_VERSION} {DOMAIN}"},
+    )
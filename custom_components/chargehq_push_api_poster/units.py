@@ -0,0 +1,151 @@
+"""Unit conversion for ChargeHQ Push API Poster."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.core import State
+
+from .issues import (
+    ISSUE_NON_NUMERIC,
+    ISSUE_NOT_FOUND,
+    ISSUE_UNKNOWN_UNIT,
+    SensorIssueRegistry,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_UNIT_OF_MEASUREMENT = "unit_of_measurement"
+
+# Factors to convert Home Assistant power units (UnitOfPower) to kW, plus the
+# spelled out aliases some integrations still report
+POWER_UNIT_FACTORS: dict[str, float] = {
+    "mW": 1e-6,
+    "W": 1e-3,
+    "kW": 1.0,
+    "MW": 1e3,
+    "GW": 1e6,
+    "TW": 1e9,
+    "BTU/h": 0.00029307107,
+    "watt": 1e-3,
+    "watts": 1e-3,
+    "kilowatt": 1.0,
+    "kilowatts": 1.0,
+}
+
+# Factors to convert Home Assistant energy units (UnitOfEnergy) to kWh, plus
+# the spelled out aliases some integrations still report
+ENERGY_UNIT_FACTORS: dict[str, float] = {
+    "mWh": 1e-6,
+    "Wh": 1e-3,
+    "kWh": 1.0,
+    "MWh": 1e3,
+    "GWh": 1e6,
+    "TWh": 1e9,
+    "J": 1 / 3.6e6,
+    "kJ": 1 / 3.6e3,
+    "MJ": 1 / 3.6,
+    "GJ": 1e3 / 3.6,
+    "cal": 4.184 / 3.6e6,
+    "kcal": 4.184 / 3.6e3,
+    "Mcal": 4.184 / 3.6,
+    "Gcal": 4.184e3 / 3.6,
+    "watthour": 1e-3,
+    "watthours": 1e-3,
+    "kilowatthour": 1.0,
+    "kilowatthours": 1.0,
+}
+
+
+class UnitConversionCache:
+    """Per-entity cache of resolved unit conversion factors.
+
+    The factor for an entity is resolved the first time it is seen and only
+    resolved again when the entity's unit of measurement changes, so
+    converting a state is a dictionary lookup and a multiply. An unknown unit
+    is cached too, and reported on every conversion that falls back to the
+    target unit.
+    """
+
+    def __init__(
+        self,
+        factors: dict[str, float],
+        target_unit: str,
+        issues: SensorIssueRegistry | None = None,
+    ) -> None:
+        """Initialise the cache.
+
+        Args:
+            factors: Mapping of unit of measurement to conversion factor.
+            target_unit: The unit values are converted to (used for logging).
+            issues: Registry that missing, non-numeric and unknown unit
+                sensors are reported to, or None for a private one.
+        """
+        self._factors = factors
+        self._target_unit = target_unit
+        self._issues = issues if issues is not None else SensorIssueRegistry()
+        # Unit and factor per entity; the factor is None for unknown units
+        self._entities: dict[str, tuple[str | None, float | None]] = {}
+
+    def factor(self, entity_id: str, unit: str | None) -> float:
+        """Return the conversion factor for an entity's current unit.
+
+        Args:
+            entity_id: The sensor entity ID.
+            unit: The sensor's current unit of measurement.
+
+        Returns:
+            The factor to multiply the sensor value by.
+        """
+        cached = self._entities.get(entity_id)
+        if cached is None or cached[0] != unit:
+            cached = (unit, self._resolve(entity_id, unit))
+            self._entities[entity_id] = cached
+
+        if cached[1] is None:
+            # Assume the target unit if no unit specified or unknown unit
+            self._issues.async_record(entity_id, ISSUE_UNKNOWN_UNIT, unit or "")
+            return 1.0
+        return cached[1]
+
+    def _resolve(self, entity_id: str, unit: str | None) -> float | None:
+        """Look up the factor for a unit an entity newly reports.
+
+        Returns:
+            The factor, or None if the unit is missing or unknown.
+        """
+        factor = self._factors.get(unit) if unit is not None else None
+        if factor is not None:
+            self._issues.async_resolve(entity_id, ISSUE_UNKNOWN_UNIT)
+            _LOGGER.debug(
+                "Sensor %s reports %s, converting to %s with factor %g",
+                entity_id,
+                unit,
+                self._target_unit,
+                factor,
+            )
+        return factor
+
+    def convert(self, entity_id: str, state: State | None) -> float | None:
+        """Convert a sensor state to the target unit.
+
+        Args:
+            entity_id: The sensor entity ID.
+            state: The current state of the sensor.
+
+        Returns:
+            The converted value or None if missing or non-numeric.
+        """
+        if state is None:
+            self._issues.async_record(entity_id, ISSUE_NOT_FOUND)
+            return None
+
+        try:
+            value = float(state.state)
+        except (ValueError, TypeError):
+            self._issues.async_record(entity_id, ISSUE_NON_NUMERIC, str(state.state))
+            return None
+
+        self._issues.async_resolve(entity_id, ISSUE_NOT_FOUND, ISSUE_NON_NUMERIC)
+        return value * self.factor(
+            entity_id, state.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+        )
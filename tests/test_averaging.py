@@ -0,0 +1,37 @@
+"""Tests for the averaging buffers."""
+from __future__ import annotations
+
+from custom_components.chargehq_push_api_poster.averaging import (
+    SAMPLE_STEP,
+    SampleRingBuffer,
+    buffer_size,
+)
+
+
+def test_updates_within_a_step_keep_the_window_start() -> None:
+    """A burst of updates must not overwrite the start of the window."""
+    buffer = SampleRingBuffer(4)
+    buffer.append(0.0, 1.0)
+    for index in range(100):
+        buffer.append(10.0 + index * SAMPLE_STEP / 200, 3.0)
+
+    stats = buffer.window_stats(0.0, 20.0)
+
+    assert stats is not None
+    assert stats.mean == 2.0
+
+
+def test_buffer_covers_the_longest_window() -> None:
+    """One sample per step over the whole window fits after growing."""
+    window = 1800.0
+    buffer = SampleRingBuffer(4)
+    buffer.append(0.0, 0.0)
+    buffer.grow(buffer_size(window))
+    for second in range(1, int(window)):
+        buffer.append(float(second), 1.0 if second < window / 2 else 3.0)
+
+    stats = buffer.window_stats(0.0, window)
+
+    assert stats is not None
+    assert stats.minimum == 0.0
+    assert round(stats.mean, 3) == round((899 + 900 * 3) / window, 3)
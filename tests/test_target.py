@@ -0,0 +1,75 @@
+"""Tests for the post targets."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from custom_components.chargehq_push_api_poster import target as target_module
+from custom_components.chargehq_push_api_poster.api import PostResult
+from custom_components.chargehq_push_api_poster.outbox import PostOutbox
+from custom_components.chargehq_push_api_poster.target import PostTarget
+from homeassistant.core import HomeAssistant
+
+
+class FakeApiClient:
+    """API client whose posts succeed unless told otherwise."""
+
+    def __init__(self) -> None:
+        """Initialise the client."""
+        self.delivered: list[int] = []
+        self.failing: set[int] = set()
+        self.held: dict[int, asyncio.Event] = {}
+
+    async def post_site_meters(
+        self, timestamp_ms: int, site_meters: dict[str, Any]
+    ) -> PostResult:
+        """Post a sample, waiting first if it is held."""
+        if (event := self.held.get(timestamp_ms)) is not None:
+            await event.wait()
+        if timestamp_ms in self.failing:
+            return PostResult.FAILED
+        self.delivered.append(timestamp_ms)
+        return PostResult.SUCCESS
+
+    async def async_close(self) -> None:
+        """Close the client."""
+
+
+def test_failed_live_post_during_replay_keeps_unsent_samples(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """A sample evicted mid replay must not take an unsent one with it."""
+    monkeypatch.setattr(target_module, "OUTBOX_DRAIN_DELAY", 0)
+
+    async def run() -> None:
+        hass = HomeAssistant(str(tmp_path))
+        client = FakeApiClient()
+        outbox = PostOutbox(hass, "test", 3)
+        post_target = PostTarget(
+            hass, client, "http://localhost/push", 20, outbox  # type: ignore[arg-type]
+        )
+        for timestamp_ms in (1, 2, 3):
+            outbox.async_add(timestamp_ms, {})
+
+        # A successful live post starts the replay, which hangs on sample 1
+        replay_held = asyncio.Event()
+        client.held[1] = replay_held
+        assert await post_target.async_post(10, {}) is PostResult.SUCCESS
+        await asyncio.sleep(0)
+
+        # A live post fails while the outbox is full, evicting sample 1
+        client.failing.add(4)
+        assert await post_target.async_post(4, {}) is PostResult.FAILED
+        client.failing.clear()
+
+        replay_held.set()
+        while post_target._drain_task is not None:
+            await asyncio.sleep(0)
+
+        assert client.delivered == [10, 1, 2, 3, 4]
+        assert len(outbox) == 0
+        await hass.async_stop(force=True)
+
+    asyncio.run(run())